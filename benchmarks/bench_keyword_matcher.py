@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+Benchmark: compiled keyword matcher vs. per-keyword substring scans
+
+Compares the baseline keyword scans in TicketProcessor.extract_ticket_info (one Python-level
+`in` search per keyword) against the compiled KeywordMatcher. Results must be identical; the
+benchmark reports throughput for both. LegacyRulesAgent keeps the agent's original substring
+scans as the baseline for bench_category_index.py and bench_priority_engine.py.
+
+Usage:
+    python benchmarks/bench_keyword_matcher.py [--tickets 100000] [--seed 42]
+"""
+
+import argparse
+import copy
+import json
+import os
+import random
+import re
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from ai_agent import EnhancedGISTicketAgent
+from utils.ruleset import CompiledRuleset, RulesetManager
+from utils.ticket_processor import TicketProcessor
+
+
+class LegacyRulesAgent(EnhancedGISTicketAgent):
+    """Agent with the pre-matcher keyword scanning, kept as the benchmark baseline"""
+
+    def analyze_with_rules(self, ticket_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Baseline analyze_with_rules: per-keyword substring scans over a tagged content string"""
+        # Build content string with XML JSON key values absolute maximum priority
+        content_parts = []
+        
+        # ABSOLUTE MAX: Add highest-priority XML JSON fields first (weight 10)
+        absolute_max_xml_fields = ['additional_info', 'description', 'description_no_html', 'subject']
+        for field in absolute_max_xml_fields:
+            if field in ticket_data and ticket_data[field]:
+                content_parts.append(f"[ABSOLUTE-MAX-XML-JSON-W10] {ticket_data[field]}")
+        
+        # MAXIMUM PRIORITY: Add core XML JSON fields (weight 9)
+        maximum_priority_xml_fields = ['priority', 'status', 'category', 'subcategory', 'group', 'state', 'name']
+        for field in maximum_priority_xml_fields:
+            if field in ticket_data and ticket_data[field]:
+                content_parts.append(f"[MAXIMUM-XML-JSON-W9] {ticket_data[field]}")
+        
+        # HIGHEST: Add identifying XML JSON fields (weight 8)
+        highest_xml_fields = ['requester', 'assigned_to', 'number', 'id']
+        for field in highest_xml_fields:
+            if field in ticket_data and ticket_data[field]:
+                content_parts.append(f"[HIGHEST-XML-JSON-W8] {ticket_data[field]}")
+        
+        # HIGH: Add temporal XML JSON fields (weight 6)
+        high_xml_fields = ['created_date', 'updated_date', 'due_date', 'created_at', 'updated_at', 'due_at']
+        for field in high_xml_fields:
+            if field in ticket_data and ticket_data[field]:
+                content_parts.append(f"[HIGH-XML-JSON-W6] {ticket_data[field]}")
+        
+        # MEDIUM: Add contact XML JSON fields (weight 3)
+        medium_xml_fields = ['requester_email', 'assigned_to_email']
+        for field in medium_xml_fields:
+            if field in ticket_data and ticket_data[field]:
+                content_parts.append(f"[MEDIUM-XML-JSON-W3] {ticket_data[field]}")
+        
+        # FALLBACK: Add any manual form content (lowest priority - weight 1-2)
+        manual_content = [
+            ticket_data.get('manual_description', ''),
+            ticket_data.get('manual_subject', ''),
+            ticket_data.get('manual_category', '')
+        ]
+        content_parts.extend([f"[MANUAL-W1] {c}" for c in manual_content if c])
+        
+        # Combine all content for analysis with XML JSON data having absolute maximum weight
+        content = ' '.join(content_parts).lower()
+        
+        # Category detection with ABSOLUTE MAXIMUM XML JSON priority
+        category = 'general'
+        confidence = 0.5
+        
+        # FIRST: Check XML JSON category fields (absolute highest confidence)
+        xml_category = ticket_data.get('category', '').lower()
+        xml_subcategory = ticket_data.get('subcategory', '').lower()
+        xml_state = ticket_data.get('state', '').lower()
+        xml_name = ticket_data.get('name', '').lower()
+        
+        # Try multiple XML JSON fields for category mapping
+        xml_category_sources = [xml_category, xml_subcategory, xml_state, xml_name]
+        mapped_category = None
+        
+        for xml_source in xml_category_sources:
+            if xml_source:
+                mapped_category = self._map_xml_category_to_gis(xml_source, xml_subcategory)
+                if mapped_category:
+                    category = mapped_category
+                    confidence = 0.98  # Near-perfect confidence for XML JSON provided categories
+                    break
+        
+        # SECOND: Enhanced keyword detection if no XML JSON category found
+        if not mapped_category:
+            for cat, keywords in self.rules.categories.items():
+                # Weight XML JSON content matches with absolute maximum priority
+                xml_json_max_matches = sum(10 for keyword in keywords if f"[absolute-max-xml-json-w10] {keyword}" in content)
+                xml_json_high_matches = sum(9 for keyword in keywords if f"[maximum-xml-json-w9] {keyword}" in content)
+                xml_json_medium_matches = sum(5 for keyword in keywords if f"[highest-xml-json-w8] {keyword}" in content)
+                manual_matches = sum(1 for keyword in keywords if f"[manual-w1] {keyword}" in content)
+                total_matches = xml_json_max_matches + xml_json_high_matches + xml_json_medium_matches + manual_matches
+                
+                if total_matches > 0:
+                    category = cat
+                    # Much higher confidence for XML JSON matches with weighted scoring
+                    xml_score = (xml_json_max_matches * 0.25) + (xml_json_high_matches * 0.20) + (xml_json_medium_matches * 0.10)
+                    manual_score = manual_matches * 0.02
+                    confidence = min(0.98, 0.5 + xml_score + manual_score)
+                    break
+        
+        # Priority detection with ABSOLUTE MAXIMUM XML JSON priority
+        priority = 'medium'
+        xml_priority = ticket_data.get('priority', '').lower()
+        xml_status = ticket_data.get('status', '').lower()
+        xml_state = ticket_data.get('state', '').lower()
+        
+        # Check multiple XML JSON priority sources with absolute maximum weighting
+        xml_priority_sources = [xml_priority, xml_status, xml_state]
+        
+        for xml_source in xml_priority_sources:
+            if xml_source in ['high', 'urgent', 'critical', '1', 'emergency', 'p1']:
+                priority = 'high'
+                break
+            elif xml_source in ['low', '3', 'planning', 'p3', 'minor']:
+                priority = 'low'
+                break
+            elif xml_source in ['medium', '2', 'p2', 'normal']:
+                priority = 'medium'
+                break
+        
+        # FALLBACK: keyword-based detection only if no XML JSON priority found (much lower confidence)
+        if priority == 'medium' and not any(xml_priority_sources):
+            high_priority_keywords = ['urgent', 'critical', 'down', 'error', 'failed', 'corrupted']
+            low_priority_keywords = ['question', 'how to', 'training', 'enhancement']
+            
+            # Even manual keyword detection gives preference to XML JSON context
+            xml_json_high_context = any(keyword in f"[absolute-max-xml-json-w10] {ticket_data.get('additional_info', '')} {ticket_data.get('description', '')}" for keyword in high_priority_keywords)
+            xml_json_low_context = any(keyword in f"[absolute-max-xml-json-w10] {ticket_data.get('additional_info', '')} {ticket_data.get('description', '')}" for keyword in low_priority_keywords)
+            
+            if xml_json_high_context or any(keyword in content for keyword in high_priority_keywords):
+                priority = 'high'
+            elif xml_json_low_context or any(keyword in content for keyword in low_priority_keywords):
+                priority = 'low'
+        
+        # Generate response based on category and XML JSON context
+        suggested_response = self._generate_contextual_response(category, ticket_data)
+        
+        # Calculate XML JSON data usage metrics with absolute maximum priority tracking
+        xml_json_fields_used = [field for field in ticket_data.keys() if field and ticket_data[field]]
+        xml_json_weighted_fields = [field for field in xml_json_fields_used if field in ['additional_info', 'description', 'description_no_html', 'subject', 'priority', 'status', 'category', 'subcategory', 'group', 'state', 'name', 'requester', 'assigned_to', 'number', 'id']]
+        
+        return {
+            'category': category,
+            'priority': priority,
+            'confidence': confidence,
+            'suggested_response': suggested_response,
+            'analysis_timestamp': datetime.now().isoformat(),
+            'analysis_method': 'rule_based_absolute_maximum_xml_json_priority',
+            'action_plan': self._generate_action_plan(category, priority),
+            'estimated_resolution_time': self._estimate_resolution_time(priority),
+            'required_skills': self._get_required_skills(category),
+            'xml_json_data_used': True,
+            'xml_json_fields_processed': xml_json_fields_used,
+            'xml_json_weighted_fields_used': xml_json_weighted_fields,
+            'xml_json_absolute_priority_applied': True,
+            'xml_json_vs_manual_ratio': f"{len(xml_json_weighted_fields)}:{len([f for f in ticket_data.keys() if f.startswith('manual_')])}",
+            'xml_json_priority_weights': {
+                'absolute_max_weight_10': [f for f in xml_json_weighted_fields if f in ['additional_info', 'description', 'description_no_html', 'subject']],
+                'maximum_weight_9': [f for f in xml_json_weighted_fields if f in ['priority', 'status', 'category', 'subcategory', 'group', 'state', 'name']],
+                'highest_weight_8': [f for f in xml_json_weighted_fields if f in ['requester', 'assigned_to', 'number', 'id']]
+            }
+        }
+
+    def determine_priority(self, content: str) -> str:
+        """Baseline determine_priority: one substring scan per keyword"""
+        content_lower = content.lower()
+        
+        # High priority indicators
+        high_priority_keywords = [
+            'urgent', 'critical', 'emergency', 'down', 'broken', 'failed', 'error', 
+            'corrupted', 'cannot access', 'system down', 'production', 'outage'
+        ]
+        
+        # Low priority indicators  
+        low_priority_keywords = [
+            'question', 'how to', 'training', 'enhancement', 'feature request',
+            'nice to have', 'when you have time', 'documentation', 'tutorial'
+        ]
+        
+        # Check for high priority
+        if any(keyword in content_lower for keyword in high_priority_keywords):
+            return 'high'
+        
+        # Check for low priority
+        if any(keyword in content_lower for keyword in low_priority_keywords):
+            return 'low'
+        
+        # Default to medium priority
+        return 'medium'
+
+
+class LegacyTicketProcessor(TicketProcessor):
+    """TicketProcessor with the pre-matcher keyword scanning"""
+
+    def extract_ticket_info(self, raw_text: str) -> Dict[str, Any]:
+        """Baseline extract_ticket_info: one substring scan per keyword"""
+        info = {
+            'software_mentioned': [],
+            'data_formats': [],
+            'operations': [],
+            'error_indicators': [],
+            'urgency_level': 'normal',
+            'email_addresses': [],
+            'phone_numbers': [],
+            'file_paths': [],
+            'coordinates': []
+        }
+        
+        text_lower = raw_text.lower()
+        
+        # Extract software mentions
+        for software in self.gis_keywords['software']:
+            if software in text_lower:
+                info['software_mentioned'].append(software)
+        
+        # Extract data formats
+        for format_type in self.gis_keywords['data_formats']:
+            if format_type in text_lower:
+                info['data_formats'].append(format_type)
+        
+        # Extract operations
+        for operation in self.gis_keywords['operations']:
+            if operation in text_lower:
+                info['operations'].append(operation)
+        
+        # Check for error indicators
+        for error in self.gis_keywords['errors']:
+            if error in text_lower:
+                info['error_indicators'].append(error)
+        
+        # Determine urgency
+        for urgent_word in self.gis_keywords['urgency']:
+            if urgent_word in text_lower:
+                info['urgency_level'] = 'high'
+                break
+        
+        # Extract email addresses
+        email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
+        info['email_addresses'] = re.findall(email_pattern, raw_text)
+        
+        # Extract phone numbers
+        phone_pattern = r'\b\d{3}[-.]?\d{3}[-.]?\d{4}\b'
+        info['phone_numbers'] = re.findall(phone_pattern, raw_text)
+        
+        # Extract file paths
+        path_pattern = r'[A-Za-z]:\\[^<>:"|?*\n\r]+|/[^<>:"|?*\n\r]+'
+        info['file_paths'] = re.findall(path_pattern, raw_text)
+        
+        # Extract coordinates (basic pattern)
+        coord_pattern = r'-?\d{1,3}\.\d+,\s*-?\d{1,3}\.\d+'
+        info['coordinates'] = re.findall(coord_pattern, raw_text)
+        
+        return info
+
+
+KEYWORD_INFO_FIELDS = ['software_mentioned', 'data_formats', 'operations', 'error_indicators', 'urgency_level',
+                       'email_addresses', 'phone_numbers', 'file_paths', 'coordinates']
+
+XML_VARIANTS = [
+    {},
+    {'priority': 'High', 'status': 'Open'},
+    {'priority': 'Low', 'category': 'SR_GIS', 'subcategory': 'Add / Change GIS Data'},
+    {'category': 'Printing', 'group': 'GIS', 'requester': 'Pat Lee'},
+    {'subcategory': 'Portal access', 'state': 'In progress'},
+    {'additional_info': 'Request Type (GIS): Map Request; Department: Utilities'},
+    {'manual_description': 'how to export a layout', 'manual_category': 'printing'}
+]
+
+
+def load_seed_texts() -> List[Dict[str, str]]:
+    """Subjects and descriptions from the sample ticket files"""
+    with open(os.path.join(ROOT, 'test_tickets.json'), 'r', encoding='utf-8') as f:
+        return [{'subject': t['subject'], 'description': t['description']} for t in json.load(f)]
+
+
+def generate_tickets(count: int, seed: int) -> List[Dict[str, Any]]:
+    """Synthetic tickets mixing sample subjects/descriptions with XML field variants"""
+    rng = random.Random(seed)
+    seeds = load_seed_texts()
+    sentences = [s.strip() for t in seeds for s in t['description'].split('.') if s.strip()]
+    tickets = []
+    for index in range(count):
+        base = rng.choice(seeds)
+        description = '. '.join(rng.sample(sentences, rng.randint(1, 4)))
+        ticket = {'id': f'SYN-{index}', 'subject': base['subject'], 'description': description}
+        ticket.update(rng.choice(XML_VARIANTS))
+        tickets.append(ticket)
+    return tickets
+
+
+def extend_vocabulary(processor: TicketProcessor, extra: int, seed: int):
+    """Add synthetic keywords to every keyword group and swap in the recompiled ruleset"""
+    rng = random.Random(seed)
+    rules = processor.ruleset_manager.current()
+    data = copy.deepcopy(rules.data)
+    for keywords in data['ticket_keywords'].values():
+        keywords.extend(f"kw{rng.randint(0, 10 ** 6)}x{index}" for index in range(extra))
+    processor.ruleset_manager = RulesetManager(rules.source, reload_interval=-1)
+    processor.ruleset_manager.swap(CompiledRuleset(data, source=rules.source))
+
+
+def run(label: str, processor: TicketProcessor, tickets: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Time the keyword-scanning call site over all tickets"""
+    texts = [f"{ticket['description']} {ticket['subject']}" for ticket in tickets]
+    call_sites = {
+        'extract_ticket_info': lambda: [
+            tuple(str(info[field]) for field in KEYWORD_INFO_FIELDS)
+            for info in map(processor.extract_ticket_info, texts)
+        ]
+    }
+
+    timings = {}
+    outputs = {}
+    print(label)
+    for name, call in call_sites.items():
+        started = time.perf_counter()
+        outputs[name] = call()
+        timings[name] = time.perf_counter() - started
+        print(f"  {name:<22} {timings[name]:8.2f}s  {len(tickets) / timings[name]:10,.0f} tickets/sec")
+    return {'timings': timings, 'outputs': outputs}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the compiled keyword matcher')
+    parser.add_argument('--tickets', type=int, default=100000, help='Number of synthetic tickets')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for ticket generation')
+    parser.add_argument('--extra-keywords', type=int, default=0,
+                        help='Synthetic keywords added to every keyword group (vocabulary scaling)')
+    args = parser.parse_args()
+
+    tickets = generate_tickets(args.tickets, args.seed)
+    runs = []
+    for label, processor in [('baseline (substring scans)', LegacyTicketProcessor()),
+                             ('compiled keyword matcher', TicketProcessor())]:
+        if args.extra_keywords:
+            extend_vocabulary(processor, args.extra_keywords, args.seed)
+        runs.append((label, processor))
+
+    print(f"Benchmarking {len(tickets):,} synthetic tickets "
+          f"(+{args.extra_keywords} keywords per group, matcher backend: {runs[1][1].keyword_matcher.backend})")
+    baseline = run(*runs[0], tickets)
+    compiled = run(*runs[1], tickets)
+
+    total_mismatches = 0
+    print("Summary")
+    for name, elapsed in baseline['timings'].items():
+        mismatches = sum(1 for a, b in zip(baseline['outputs'][name], compiled['outputs'][name]) if a != b)
+        total_mismatches += mismatches
+        speedup = elapsed / compiled['timings'][name]
+        print(f"  {name:<22} speedup {speedup:5.2f}x   output mismatches: {mismatches}")
+    return 0 if total_mismatches == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Benchmark: compiled word-boundary priority engine vs. per-keyword substring checks
+
+Runs determine_priority and the analyze_with_rules priority fallback over a large synthetic
+corpus, once with the baseline substring checks (LegacyRulesAgent) and once with the
+PriorityEngine. Also times a per-keyword word-boundary regex loop, the straightforward way to
+get the engine's whole-word results. Reports throughput and every disagreement with the
+baseline, grouped by the baseline keyword that only matched inside a longer word ("down" in
+"download") and so was a misfire.
+
+Usage:
+    python benchmarks/bench_priority_engine.py [--tickets 100000] [--seed 42]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from collections import Counter
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from ai_agent import EnhancedGISTicketAgent
+from bench_keyword_matcher import LegacyRulesAgent, generate_tickets
+
+# Ordinary ticket words that contain a priority keyword without meaning it
+SUBSTRING_TRAPS = ['download', 'dropdown', 'countdown', 'breakdown', 'markdown', 'unbroken',
+                   'questionnaire', 'reproduction', 'criticality']
+# Legitimate variants the baseline already matched and the engine must keep matching
+TRUE_VARIANTS = ['errors', 'System  down', 'URGENT', 'failed', 'how to']
+
+
+def build_corpus(count: int, seed: int):
+    """Synthetic tickets with trap words and true keyword variants mixed into the descriptions"""
+    rng = random.Random(seed)
+    tickets = generate_tickets(count, seed)
+    for ticket in tickets:
+        roll = rng.random()
+        if roll < 0.25:
+            ticket['description'] += f" The {rng.choice(SUBSTRING_TRAPS)} option is greyed out."
+        elif roll < 0.35:
+            ticket['description'] += f" Note: {rng.choice(TRUE_VARIANTS)} reported."
+    return tickets
+
+
+def word_pattern(keyword: str) -> re.Pattern:
+    """Whole-word pattern for one keyword, with the engine's accepted suffixes"""
+    phrase = r'\s+'.join(re.escape(word) for word in keyword.split())
+    return re.compile(rf'\b{phrase}(?:s|ly)?\b')
+
+
+def baseline_misfires(text: str, keywords):
+    """Baseline keywords present only as part of a longer word"""
+    lowered = text.lower()
+    return [keyword for keyword in keywords if keyword in lowered and not word_pattern(keyword).search(lowered)]
+
+
+class PerKeywordRegexAgent(EnhancedGISTicketAgent):
+    """determine_priority with one precompiled whole-word regex search per keyword"""
+
+    def __init__(self):
+        super().__init__()
+        self.keyword_patterns = {group: [word_pattern(keyword) for keyword in keywords]
+                                 for group, keywords in self.rules.priority_keywords.items()}
+
+    def determine_priority(self, content: str) -> str:
+        content_lower = content.lower()
+        for group in ('high', 'low'):
+            if any(pattern.search(content_lower) for pattern in self.keyword_patterns[group]):
+                return group
+        return 'medium'
+
+
+def timed(label: str, count: int, call):
+    """Run call once and print its throughput"""
+    started = time.perf_counter()
+    result = call()
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<44} {elapsed:7.2f}s  {count / elapsed:10,.0f} tickets/sec")
+    return result, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the compiled priority engine')
+    parser.add_argument('--tickets', type=int, default=100000, help='Number of synthetic tickets')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for corpus generation')
+    args = parser.parse_args()
+
+    legacy = LegacyRulesAgent()
+    agent = EnhancedGISTicketAgent()
+    tickets = build_corpus(args.tickets, args.seed)
+    # Tickets without XML priority fields exercise the analyze_with_rules keyword fallback
+    fallback_tickets = [{'id': t['id'], 'subject': t['subject'], 'description': t['description']} for t in tickets]
+    texts = [f"{ticket['description']} {ticket['subject']}" for ticket in tickets]
+    count = len(tickets)
+    print(f"Benchmarking {count:,} synthetic tickets")
+
+    print("determine_priority")
+    old_priorities, old_time = timed('substring checks', count, lambda: list(map(legacy.determine_priority, texts)))
+    new_priorities, new_time = timed('priority engine', count, lambda: list(map(agent.determine_priority, texts)))
+    per_keyword = PerKeywordRegexAgent()
+    regex_priorities, regex_time = timed('per-keyword word-boundary regex', count,
+                                         lambda: list(map(per_keyword.determine_priority, texts)))
+    print("priority engine only (no analysis overhead)")
+    timed('PriorityEngine.classify', count, lambda: list(map(agent.rules.priority_engine.classify, texts)))
+    print("analyze_with_rules priority fallback")
+    old_rules, _ = timed('substring checks', count,
+                         lambda: [legacy.analyze_with_rules(t)['priority'] for t in fallback_tickets])
+    new_rules, _ = timed('priority engine', count,
+                         lambda: [agent.analyze_with_rules(t)['priority'] for t in fallback_tickets])
+
+    all_keywords = agent.rules.priority_keywords['high'] + agent.rules.priority_keywords['low']
+    changes = Counter()
+    unexplained = 0
+    for text, old, new in zip(texts, old_priorities, new_priorities):
+        if old != new:
+            misfires = baseline_misfires(text, all_keywords)
+            changes[(old, new, ', '.join(misfires) or '?')] += 1
+            unexplained += not misfires
+
+    print("Summary")
+    print(f"  determine_priority vs substring checks {old_time / new_time:5.2f}x, "
+          f"vs per-keyword regex {regex_time / new_time:5.2f}x "
+          f"(same results: {regex_priorities == new_priorities})")
+    print(f"  determine_priority changed: {sum(changes.values()):,}   "
+          f"rules fallback changed: {sum(a != b for a, b in zip(old_rules, new_rules)):,}")
+    for (old, new, misfires), changed in changes.most_common(10):
+        print(f"    {old:>6} -> {new:<6} {changed:8,}  baseline substring misfire: {misfires}")
+    print(f"  changes not explained by a substring misfire: {unexplained}")
+    return 0 if unexplained == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
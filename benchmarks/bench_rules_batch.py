@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark: vectorized batch rules classifier vs. per-ticket analyze_with_rules
+
+Runs the same synthetic tickets through analyze_with_rules one at a time and through
+analyze_with_rules_batch, checks that every result dict is identical (apart from the
+analysis timestamp) and reports throughput for each, split into keyword scoring alone
+and the complete analysis.
+
+Usage:
+    python benchmarks/bench_rules_batch.py [--tickets 50000] [--seed 42]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from ai_agent import EnhancedGISTicketAgent
+from bench_keyword_matcher import generate_tickets
+from utils.category_index import SPARSE_SCORING_AVAILABLE
+
+
+def timed(label: str, count: int, call):
+    """Run call once, print its throughput and return (result, seconds)"""
+    started = time.perf_counter()
+    result = call()
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<34} {elapsed:8.2f}s  {count / elapsed:10,.0f} tickets/sec")
+    return result, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the vectorized batch rules classifier')
+    parser.add_argument('--tickets', type=int, default=50000, help='Number of synthetic tickets')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for ticket generation')
+    args = parser.parse_args()
+
+    agent = EnhancedGISTicketAgent()
+    tickets = generate_tickets(args.tickets, args.seed)
+    tier_values_list = [agent._rule_tier_values(ticket) for ticket in tickets]
+    count = len(tickets)
+    print(f"Benchmarking {count:,} synthetic tickets (sparse scoring available: {SPARSE_SCORING_AVAILABLE})")
+
+    print("keyword scoring only")
+    single_rankings, single_scoring = timed('category_index.rank (per ticket)', count,
+                                            lambda: [agent.rules.category_index.rank(tv) for tv in tier_values_list])
+    batch_rankings, batch_scoring = timed('category_index.rank_many (batch)', count,
+                                          lambda: agent.rules.category_index.rank_many(tier_values_list))
+
+    print("complete analysis")
+    single_results, single_total = timed('analyze_with_rules (per ticket)', count,
+                                         lambda: [agent.analyze_with_rules(ticket) for ticket in tickets])
+    batch_results, batch_total = timed('analyze_with_rules_batch', count,
+                                       lambda: agent.analyze_with_rules_batch(tickets))
+
+    mismatches = sum(1 for a, b in zip(single_rankings, batch_rankings) if a != b)
+    for single, batch in zip(single_results, batch_results):
+        single.pop('analysis_timestamp')
+        batch.pop('analysis_timestamp')
+        mismatches += single != batch
+
+    print("Summary")
+    print(f"  keyword scoring speedup  {single_scoring / batch_scoring:5.2f}x")
+    print(f"  complete analysis speedup {single_total / batch_total:5.2f}x")
+    print(f"  result mismatches: {mismatches}")
+    return 0 if mismatches == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
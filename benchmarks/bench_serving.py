@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Load test: gunicorn production serving vs. the Flask development server
+
+Starts each server on a free local port, with AI disabled (rule-based analysis) and prompt exports
+off, and drives it with --clients concurrent keep-alive clients for --duration seconds of
+POST /api/analyze_ticket requests built from test_tickets.json. Reports requests/sec and
+latency percentiles.
+
+- dev: app.run(debug=True), as `python src/app.py` starts it (without the reloader)
+- gunicorn: gunicorn -c gunicorn.conf.py with --workers worker processes of --threads threads
+
+Usage:
+    python benchmarks/bench_serving.py [--duration 10] [--clients 16] [--workers 4] [--threads 8]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List
+
+import requests
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+SRC = os.path.join(ROOT, 'src')
+
+
+def free_port() -> int:
+    """Unused local TCP port"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(kind: str, port: int, workdir: str, args) -> subprocess.Popen:
+    """Launch a server variant and wait until it answers /api/health"""
+    env = dict(os.environ, AI_ENABLED='false', EXPORT_PROMPTS='false', OPENAI_API_KEY='',
+               PYTHONPATH=SRC, PYTHONUNBUFFERED='1')
+    if kind == 'dev':
+        command = [sys.executable, '-c',
+                   f"import app; app.warm_up(); app.app.run(host='127.0.0.1', port={port}, debug=True, use_reloader=False)"]
+    else:
+        command = ['gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py'), '--bind', f'127.0.0.1:{port}',
+                   '--workers', str(args.workers), '--threads', str(args.threads)]
+    process = subprocess.Popen(command, cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f'http://127.0.0.1:{port}/api/health', timeout=1).ok:
+                return process
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f'{kind} server did not start')
+
+
+def run_load(port: int, tickets: List[Dict[str, Any]], clients: int, duration: float) -> Dict[str, Any]:
+    """Requests/sec and latency percentiles of clients concurrent keep-alive clients"""
+    url = f'http://127.0.0.1:{port}/api/analyze_ticket'
+    latencies: List[float] = []
+    errors = [0]
+    lock = threading.Lock()
+    start = threading.Event()
+    stop_at = [0.0]
+
+    def client(number: int):
+        session = requests.Session()
+        mine, failed = [], 0
+        start.wait()
+        i = number
+        while time.perf_counter() < stop_at[0]:
+            ticket = tickets[i % len(tickets)]
+            i += clients
+            began = time.perf_counter()
+            try:
+                ok = session.post(url, json=ticket, timeout=30).status_code == 200
+            except requests.RequestException:
+                ok = False
+            mine.append(time.perf_counter() - began)
+            failed += not ok
+        with lock:
+            latencies.extend(mine)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client, args=(number,)) for number in range(clients)]
+    for thread in threads:
+        thread.start()
+    began = time.perf_counter()
+    stop_at[0] = began + duration
+    start.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+    latencies.sort()
+    percentile = lambda p: latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000 if latencies else 0.0
+    return {'requests': len(latencies), 'errors': errors[0], 'rps': len(latencies) / elapsed,
+            'p50_ms': percentile(0.50), 'p99_ms': percentile(0.99)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test gunicorn vs. the Flask development server')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds of load per server')
+    parser.add_argument('--clients', type=int, default=16, help='Concurrent keep-alive clients')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=8, help='Threads per gunicorn worker')
+    args = parser.parse_args()
+
+    with open(os.path.join(ROOT, 'test_tickets.json'), encoding='utf-8') as f:
+        tickets = json.load(f)
+    tickets = tickets.get('tickets', tickets) if isinstance(tickets, dict) else tickets
+
+    kinds = ['dev']
+    if shutil.which('gunicorn'):
+        kinds.append('gunicorn')
+    else:
+        print('gunicorn is not installed (pip install -r requirements.txt); measuring the dev server only')
+
+    print(f'{len(tickets)} sample tickets, {args.clients} clients, {args.duration:g}s per server, cpus={os.cpu_count()}')
+    for kind in kinds:
+        workdir = tempfile.mkdtemp()
+        port = free_port()
+        process = start_server(kind, port, workdir, args)
+        try:
+            run_load(port, tickets, args.clients, min(args.duration, 2))  # Warm connections and caches
+            result = run_load(port, tickets, args.clients, args.duration)
+        finally:
+            process.terminate()
+            process.wait(30)
+            shutil.rmtree(workdir, True)
+        label = kind if kind == 'dev' else f'gunicorn {args.workers}x{args.threads}'
+        print(f"{label:<16} {result['rps']:8.1f} req/s   p50 {result['p50_ms']:6.1f}ms   p99 {result['p99_ms']:7.1f}ms"
+              f"   {result['requests']} requests, {result['errors']} errors")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,49 @@
+"""
+Gunicorn settings for serving the GIS ticket agent in production
+
+Runs several worker processes, each with a pool of request threads. Every worker imports the
+app itself (no preloading), so it builds its own agent, ruleset, OpenAI HTTP pool and SQLite
+connections, and warms them up before taking requests. Workers drain on the way out: in-flight
+requests get GUNICORN_GRACEFUL_TIMEOUT seconds to finish, running jobs go back to the queue and
+queued prompt exports are written.
+
+Usage (from the repository root):
+    gunicorn -c gunicorn.conf.py
+    kill -HUP <master pid>     # graceful reload: new workers start on the current code, rules and .env; old ones drain
+    kill -TERM <master pid>    # graceful shutdown
+"""
+
+import multiprocessing
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+wsgi_app = 'app:app'
+pythonpath = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src')
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+# Threads keep a worker serving while its requests wait on the LLM provider
+worker_class = 'gthread'
+workers = int(os.getenv('GUNICORN_WORKERS', str(min(multiprocessing.cpu_count() * 2 + 1, 8))))
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '60'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+# Recycle a worker after this many requests (0 never does)
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '0'))
+max_requests_jitter = max_requests // 10
+accesslog = os.getenv('GUNICORN_ACCESS_LOG') or None
+
+
+def post_worker_init(worker):
+    """Warm up the worker's agent before it accepts requests"""
+    from app import warm_up
+    warm_up()
+
+
+def worker_exit(server, worker):
+    """Drain the worker's jobs and prompt exports once it has stopped serving"""
+    from app import shutdown
+    shutdown(timeout=max(graceful_timeout - 5, 1))
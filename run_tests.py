@@ -30,7 +30,7 @@ import json
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 # Import test modules
-from tests.test_unit import TestEnhancedGISTicketAgent, TestXMLTicketParser, TestFlaskApp
+from tests.test_unit import TestEnhancedGISTicketAgent, TestRequestCoalescing, TestStructuredOutput, TestPromptPrefixLayout, TestCascadeAnalysis, TestKeywordMatcher, TestCategoryScoringIndex, TestLocalClassifier, TestXMLCategoryMemo, TestPriorityEngine, TestRuleset, TestBatchAnalysis, TestResponseGeneration, TestPromptExportWriter, TestPromptStore, TestPromptRetention, TestJobQueue, TestXMLTicketParser, TestFlaskApp
 from tests.test_security import TestSecurityValidation, TestAuthenticationSecurity
 from tests.test_functional import TestFunctionalWorkflows
 
@@ -57,6 +57,22 @@ class TestRunner:
         
         # Add unit test classes
         suite.addTests(loader.loadTestsFromTestCase(TestEnhancedGISTicketAgent))
+        suite.addTests(loader.loadTestsFromTestCase(TestRequestCoalescing))
+        suite.addTests(loader.loadTestsFromTestCase(TestStructuredOutput))
+        suite.addTests(loader.loadTestsFromTestCase(TestPromptPrefixLayout))
+        suite.addTests(loader.loadTestsFromTestCase(TestCascadeAnalysis))
+        suite.addTests(loader.loadTestsFromTestCase(TestKeywordMatcher))
+        suite.addTests(loader.loadTestsFromTestCase(TestCategoryScoringIndex))
+        suite.addTests(loader.loadTestsFromTestCase(TestLocalClassifier))
+        suite.addTests(loader.loadTestsFromTestCase(TestXMLCategoryMemo))
+        suite.addTests(loader.loadTestsFromTestCase(TestPriorityEngine))
+        suite.addTests(loader.loadTestsFromTestCase(TestRuleset))
+        suite.addTests(loader.loadTestsFromTestCase(TestBatchAnalysis))
+        suite.addTests(loader.loadTestsFromTestCase(TestResponseGeneration))
+        suite.addTests(loader.loadTestsFromTestCase(TestPromptExportWriter))
+        suite.addTests(loader.loadTestsFromTestCase(TestPromptStore))
+        suite.addTests(loader.loadTestsFromTestCase(TestPromptRetention))
+        suite.addTests(loader.loadTestsFromTestCase(TestJobQueue))
         suite.addTests(loader.loadTestsFromTestCase(TestXMLTicketParser))
         suite.addTests(loader.loadTestsFromTestCase(TestFlaskApp))
         
@@ -1,209 +1,38 @@
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, Response, render_template, request, jsonify, session
 import json
 import os
+import zlib
+import time
 from datetime import datetime
 import re
-from typing import Dict, List, Any
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from ai_agent import EnhancedGISTicketAgent
+from utils.job_queue import JobQueue
+from utils.prompt_archive import ARCHIVE_FORMATS, stream_prompt_archive
+from utils.xml_ticket_parser import XMLTicketParser
 
 app = Flask(__name__, template_folder='../templates')
 app.secret_key = 'your-secret-key-here'
 
+# Initialize the enhanced AI agent
+gis_agent = EnhancedGISTicketAgent()
 
-class XMLTicketParser:
-    """Parse ticket information from XML files"""
-    
-    @staticmethod
-    def parse_xml_file(xml_content: str) -> List[Dict[str, Any]]:
-        """Parse XML content and extract ticket information"""
-        try:
-            root = ET.fromstring(xml_content)
-            tickets = []
-            
-            # Handle different XML structures
-            # Structure 1: <tickets><ticket>...</ticket></tickets>
-            if root.tag == 'tickets':
-                for ticket_elem in root.findall('ticket'):
-                    ticket = XMLTicketParser._extract_ticket_data(ticket_elem)
-                    if ticket:
-                        tickets.append(ticket)
-            
-            # Structure 2: <incidents><incident>...</incident></incidents>
-            elif root.tag == 'incidents':
-                for ticket_elem in root.findall('incident'):
-                    ticket = XMLTicketParser._extract_incident_data(ticket_elem)
-                    if ticket:
-                        tickets.append(ticket)
-            
-            # Structure 3: <ticket>...</ticket> (single ticket)
-            elif root.tag == 'ticket':
-                ticket = XMLTicketParser._extract_ticket_data(root)
-                if ticket:
-                    tickets.append(ticket)
-            
-            # Structure 4: <incident>...</incident> (single incident)
-            elif root.tag == 'incident':
-                ticket = XMLTicketParser._extract_incident_data(root)
-                if ticket:
-                    tickets.append(ticket)
-            
-            # Structure 5: Custom root with ticket/incident elements
-            else:
-                for ticket_elem in root.iter('ticket'):
-                    ticket = XMLTicketParser._extract_ticket_data(ticket_elem)
-                    if ticket:
-                        tickets.append(ticket)
-                for ticket_elem in root.iter('incident'):
-                    ticket = XMLTicketParser._extract_incident_data(ticket_elem)
-                    if ticket:
-                        tickets.append(ticket)
-            
-            return tickets
-            
-        except ET.ParseError as e:
-            raise ValueError(f"Invalid XML format: {str(e)}")
-        except Exception as e:
-            raise ValueError(f"Error parsing XML: {str(e)}")
-    
-    @staticmethod
-    def _extract_ticket_data(ticket_elem) -> Dict[str, Any]:
-        """Extract ticket data from XML element"""
-        ticket = {}
-        
-        # Common field mappings
-        field_mappings = {
-            'id': ['id', 'ticket_id', 'ticketId'],
-            'number': ['number', 'ticket_number'],
-            'subject': ['subject', 'title', 'summary'],
-            'description': ['description', 'details', 'body', 'content'],
-            'priority': ['priority', 'urgency', 'severity'],
-            'category': ['category', 'type', 'classification'],
-            'requester': ['requester', 'user', 'customer', 'reporter'],
-            'status': ['status', 'state'],
-            'created_date': ['created', 'date_created', 'timestamp', 'submitted'],
-            'assigned_to': ['assigned_to', 'assignee', 'owner']
-        }
-        
-        # Extract data using multiple possible field names
-        for field, possible_names in field_mappings.items():
-            for name in possible_names:
-                elem = ticket_elem.find(name)
-                if elem is not None and elem.text:
-                    ticket[field] = elem.text.strip()
-                    break
-                # Try as attribute
-                if ticket_elem.get(name):
-                    ticket[field] = ticket_elem.get(name).strip()
-                    break
-        
-        # Ensure required fields
-        if not ticket.get('id'):
-            ticket['id'] = f"XML-{datetime.now().strftime('%Y%m%d%H%M%S')}"
-        
-        # If no number field found, use id as fallback for display
-        if not ticket.get('number') and ticket.get('id'):
-            ticket['number'] = ticket['id']
-        
-        if not ticket.get('subject') and not ticket.get('description'):
-            return None  # Skip invalid tickets
-        
-        return ticket
+# Background jobs for large imports (/api/process_tickets with "async": true), persisted so they survive a restart.
+# Workers start in warm_up (gunicorn workers, the dev server) or with the first submitted job, not on import
+job_queue = JobQueue(
+    os.getenv('JOB_DB_PATH', 'jobs/jobs.db'),
+    {'process_tickets': lambda tickets, options: process_ticket_batch(tickets, options)},
+    workers=int(os.getenv('JOB_WORKERS', '2')),
+    chunk_size=int(os.getenv('JOB_CHUNK_SIZE', '25')),
+    lease=float(os.getenv('JOB_LEASE_SECONDS', '300'))
+)
 
-    @staticmethod
-    def _extract_incident_data(incident_elem) -> Dict[str, Any]:
-        """Extract incident data from XML element (ServiceNow/Samanage format)"""
-        ticket = {}
-        
-        # Direct field mappings for incident XML structure
-        field_mappings = {
-            'id': 'id',
-            'number': 'number', 
-            'subject': 'name',
-            'description': 'description_no_html',
-            'priority': 'priority',
-            'status': 'state',
-            'created_date': 'created_at',
-            'updated_date': 'updated_at',
-            'due_date': 'due_at'
-        }
-        
-        # Extract basic fields
-        for field, xml_tag in field_mappings.items():
-            elem = incident_elem.find(xml_tag)
-            if elem is not None and elem.text:
-                ticket[field] = elem.text.strip()
-        
-        # Extract requester information
-        requester_elem = incident_elem.find('requester')
-        if requester_elem is not None:
-            name_elem = requester_elem.find('name')
-            email_elem = requester_elem.find('email')
-            if name_elem is not None and name_elem.text:
-                ticket['requester'] = name_elem.text.strip()
-            if email_elem is not None and email_elem.text:
-                ticket['requester_email'] = email_elem.text.strip()
-        
-        # Extract assignee information  
-        assignee_elem = incident_elem.find('assignee')
-        if assignee_elem is not None:
-            name_elem = assignee_elem.find('name')
-            email_elem = assignee_elem.find('email')
-            if name_elem is not None and name_elem.text:
-                ticket['assigned_to'] = name_elem.text.strip()
-            if email_elem is not None and email_elem.text:
-                ticket['assigned_to_email'] = email_elem.text.strip()
-        
-        # Extract category information
-        category_elem = incident_elem.find('category')
-        if category_elem is not None:
-            name_elem = category_elem.find('name')
-            if name_elem is not None and name_elem.text:
-                ticket['category'] = name_elem.text.strip()
-        
-        # Extract subcategory information
-        subcategory_elem = incident_elem.find('subcategory')
-        if subcategory_elem is not None:
-            name_elem = subcategory_elem.find('name')
-            if name_elem is not None and name_elem.text:
-                ticket['subcategory'] = name_elem.text.strip()
-        
-        # Extract group assignee
-        group_elem = incident_elem.find('group_assignee')
-        if group_elem is not None:
-            name_elem = group_elem.find('name')
-            if name_elem is not None and name_elem.text:
-                ticket['group'] = name_elem.text.strip()
-        
-        # Extract custom fields for additional information
-        custom_fields_elem = incident_elem.find('custom_fields_values')
-        if custom_fields_elem is not None:
-            additional_info = []
-            for custom_field in custom_fields_elem.findall('custom_fields_value'):
-                name_elem = custom_field.find('name')
-                value_elem = custom_field.find('value')
-                if name_elem is not None and value_elem is not None:
-                    if name_elem.text and value_elem.text:
-                        additional_info.append(f"{name_elem.text.strip()}: {value_elem.text.strip()}")
-            if additional_info:
-                ticket['additional_info'] = '; '.join(additional_info)
-        
-        # Ensure required fields
-        if not ticket.get('id'):
-            ticket['id'] = f"INC-{datetime.now().strftime('%Y%m%d%H%M%S')}"
-        
-        if not ticket.get('subject') and not ticket.get('description'):
-            return None  # Skip invalid incidents
-        
-        # Set default values for missing fields
-        if not ticket.get('priority'):
-            ticket['priority'] = 'Medium'
-        if not ticket.get('status'):
-            ticket['status'] = 'Open'
-            
-        return ticket
+# Per-process serving state (see warm_up and shutdown, called by gunicorn.conf.py for each worker)
+worker_state = {'warmed_up': False, 'warm_up_ms': None}
 
-# Initialize the enhanced AI agent
-gis_agent = EnhancedGISTicketAgent()
+# Streaming responses of the bulk endpoints (?stream=ndjson|sse): the whole request is analyzed as one batch and
+# each ticket's result is sent as soon as it is done
+STREAM_FORMATS = {'ndjson': 'application/x-ndjson', 'sse': 'text/event-stream'}
 
 @app.route('/')
 def index():
@@ -231,26 +60,32 @@ def analyze_ticket():
 
 @app.route('/api/bulk_analyze', methods=['POST'])
 def bulk_analyze():
-    """Analyze multiple tickets at once"""
+    """Analyze multiple tickets at once (streamed a result at a time with ?stream=ndjson or sse)"""
     try:
         tickets = request.json.get('tickets', [])
         if not tickets:
             return jsonify({'error': 'No tickets provided'}), 400
         
-        results = []
-        for ticket in tickets:
-            analysis = gis_agent.analyze_ticket(ticket)
-            results.append({
-                'ticket_id': ticket.get('id', 'unknown'),
-                'analysis': analysis
-            })
+        stream_format = requested_stream_format()
+        if stream_format:
+            mode = gis_agent.batch_mode(request.json.get('mode'))
+            return stream_results(gis_agent.iter_analyze_tickets(tickets, mode=mode), stream_format)
+        
+        # One batch: duplicates analyzed once, LLM calls on the shared pool with a per-ticket timeout,
+        # failures and latency reported per ticket, results in input order
+        started = time.perf_counter()
+        results = gis_agent.analyze_tickets(tickets, mode=request.json.get('mode'))
         
         return jsonify({
             'status': 'success',
             'results': results,
-            'total_processed': len(results)
+            'total_processed': len(results),
+            'total_failed': sum(1 for result in results if 'error' in result),
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)
         })
     
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -261,13 +96,16 @@ def generate_response():
         data = request.json
         ticket_content = data.get('content', '')
         category = data.get('category', 'general')
+        tailored = bool(data.get('tailored', False))
         
-        response = gis_agent.generate_response(category, ticket_content)
+        # Precompiled category template unless a tailored (LLM) response is requested
+        response = gis_agent.generate_response(category, ticket_content, tailored=tailored)
         
         return jsonify({
             'status': 'success',
             'response': response,
-            'category': category
+            'category': category,
+            'tailored': tailored
         })
     
     except Exception as e:
@@ -292,9 +130,32 @@ def get_stats():
         }
     })
 
+@app.route('/api/health', methods=['GET'])
+def health():
+    """Readiness of this worker process (for load balancers and deploy checks)"""
+    return jsonify({
+        'status': 'ok',
+        'pid': os.getpid(),
+        'warmed_up': worker_state['warmed_up'],
+        'ruleset_version': gis_agent.rules.version
+    })
+
+@app.route('/api/metrics', methods=['GET'])
+def get_agent_metrics():
+    """Get runtime metrics from the AI agent"""
+    return jsonify({
+        'status': 'success',
+        'metrics': gis_agent.get_metrics()
+    })
+
 @app.route('/api/process_tickets', methods=['POST'])
 def process_tickets():
-    """Process imported tickets with enhanced AI functionality"""
+    """Process imported tickets with enhanced AI functionality
+
+    With "async": true the tickets are queued as a background job instead, and the response
+    (202) carries the job id to poll at /api/jobs/<job_id>. With ?stream=ndjson or sse each
+    ticket's result is streamed as soon as it is done.
+    """
     try:
         data = request.json
         tickets = data.get('tickets', [])
@@ -303,217 +164,303 @@ def process_tickets():
         if not tickets:
             return jsonify({'error': 'No tickets provided for processing'}), 400
         
-        processed_tickets = []
-        start_time = datetime.now()
-        responses_generated = 0
-        action_plans_created = 0
+        stream_format = requested_stream_format()
+        if stream_format:
+            return stream_results(iter_process_tickets(tickets, processing_options), stream_format)
         
-        for ticket_data in tickets:
-            ticket = ticket_data.get('ticket_data', {})
-            existing_analysis = ticket_data.get('analysis', {})
-            
-            # Enhanced processing for each ticket
-            processing_result = {
-                'ticket_id': ticket.get('id'),
-                'original_analysis': existing_analysis,
-                'enhanced_analysis': {},
-                'response': '',
-                'action_plan': [],
-                'processing_timestamp': datetime.now().isoformat()
-            }
-            
-            # Re-analyze with enhanced context
-            if processing_options.get('categorize', True):
-                enhanced_analysis = gis_agent.analyze_ticket(ticket)
-                processing_result['enhanced_analysis'] = enhanced_analysis
-            
-            # Generate detailed response
-            if processing_options.get('generate_responses', True):
-                category = existing_analysis.get('category', 'general')
-                content = ticket.get('description', '') + ' ' + ticket.get('subject', '')
-                response = gis_agent.generate_response(category, content)
-                processing_result['response'] = response
-                responses_generated += 1
-            
-            # Create action plan
-            if processing_options.get('create_action_plan', True):
-                action_plan = create_action_plan(ticket, existing_analysis)
-                processing_result['action_plan'] = action_plan
-                action_plans_created += 1
-            
-            # Assign priority if requested
-            if processing_options.get('assign_priority', True):
-                content = ticket.get('description', '') + ' ' + ticket.get('subject', '')
-                priority = gis_agent.determine_priority(content)
-                processing_result['assigned_priority'] = priority
-            
-            processed_tickets.append(processing_result)
+        if data.get('async'):
+            job_id = job_queue.submit('process_tickets', tickets, processing_options)
+            return jsonify({
+                'status': 'queued',
+                'job_id': job_id,
+                'total': len(tickets),
+                'status_url': f'/api/jobs/{job_id}'
+            }), 202
         
+        start_time = datetime.now()
+        processed_tickets = process_ticket_batch(tickets, processing_options)
         end_time = datetime.now()
         processing_time = (end_time - start_time).total_seconds() * 1000  # Convert to milliseconds
         avg_processing_time = processing_time / len(tickets) if tickets else 0
+        succeeded = sum(1 for result in processed_tickets if 'error' not in result)
         
         return jsonify({
             'status': 'success',
             'message': f'Successfully processed {len(tickets)} tickets',
             'total_processed': len(tickets),
             'processed_tickets': processed_tickets,
-            'responses_generated': responses_generated,
-            'action_plans_created': action_plans_created,
+            'responses_generated': succeeded if processing_options.get('generate_responses', True) else 0,
+            'action_plans_created': succeeded if processing_options.get('create_action_plan', True) else 0,
             'total_processing_time_ms': processing_time,
             'avg_processing_time': round(avg_processing_time, 2),
             'processing_options': processing_options
         })
     
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'Failed to process tickets: {str(e)}'}), 500
 
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Job progress, ETA and the results finished so far
+
+    Query parameters: offset (item position to return results from, default 0; pass next_offset
+    to get only new results) and limit (default 100, at most 1000).
+    """
+    try:
+        offset = max(int(request.args.get('offset', 0)), 0)
+        limit = min(max(int(request.args.get('limit', 100)), 1), 1000)
+    except ValueError:
+        return jsonify({'error': 'offset and limit must be integers'}), 400
+    job = job_queue.get(job_id, offset=offset, limit=limit)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a job; a running job stops after the tickets it is working on"""
+    status = job_queue.cancel(job_id)
+    if status is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if status in ('completed', 'failed'):
+        return jsonify({'error': f'Job already {status}', 'job_id': job_id, 'status': status}), 409
+    return jsonify({'job_id': job_id, 'status': status, 'cancel_requested': True})
+
+def process_ticket_batch(tickets: List[Dict[str, Any]], processing_options: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Processing result per imported ticket, in order, from one batched analysis"""
+    processed_tickets: List[Dict[str, Any]] = [{} for _ in tickets]
+    for index, processing_result in iter_process_tickets(tickets, processing_options):
+        processed_tickets[index] = processing_result
+    return processed_tickets
+
+def iter_process_tickets(tickets: List[Dict[str, Any]],
+                         processing_options: Dict[str, Any]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """(index, processing result) per imported ticket as soon as its analysis is done, from one batched analysis"""
+    # Each processing option only switches an output on or off; all of them read the same single analysis
+    options = {option: processing_options.get(option, True)
+               for option in ('categorize', 'generate_responses', 'create_action_plan', 'assign_priority')}
+    
+    # One analysis per ticket, for the whole import as one batch
+    if any(options.values()):
+        batch_results = gis_agent.iter_analyze_tickets([ticket_data.get('ticket_data', {}) for ticket_data in tickets])
+    else:
+        batch_results = enumerate({} for _ in tickets)
+    
+    for index, batch_result in batch_results:
+        yield index, process_ticket_result(tickets[index], batch_result, options)
+
+def process_ticket_result(ticket_data: Dict[str, Any], batch_result: Dict[str, Any],
+                          options: Dict[str, bool]) -> Dict[str, Any]:
+    """Processing result of one imported ticket from its batch analysis entry"""
+    ticket = ticket_data.get('ticket_data', {})
+    existing_analysis = ticket_data.get('analysis', {})
+    analysis = batch_result.get('analysis', {})
+    
+    # Enhanced processing for each ticket
+    processing_result = {
+        'ticket_id': ticket.get('id'),
+        'original_analysis': existing_analysis,
+        'enhanced_analysis': {},
+        'response': '',
+        'action_plan': [],
+        'processing_timestamp': datetime.now().isoformat()
+    }
+    
+    if 'error' in batch_result:
+        processing_result['error'] = batch_result['error']
+        return processing_result
+    
+    # Re-analyzed with enhanced context
+    if options['categorize']:
+        processing_result['enhanced_analysis'] = analysis
+    
+    # Detailed response from the analysis
+    if options['generate_responses']:
+        processing_result['response'] = analysis.get('suggested_response') or \
+            gis_agent.rules.response_template(analysis.get('category', 'general'))
+    
+    # Action plan for the analyzed category and priority
+    if options['create_action_plan']:
+        processing_result['action_plan'] = create_action_plan(ticket, analysis)
+    
+    # Priority from the analysis
+    if options['assign_priority']:
+        processing_result['assigned_priority'] = analysis.get('priority', 'medium')
+    
+    return processing_result
+
 @app.route('/api/prompts')
 def list_exported_prompts():
-    """List all exported prompt files"""
+    """List exported prompts, newest first, one page at a time
+
+    Query parameters: limit (default 50, at most 500), cursor (next_cursor of the previous page),
+    ticket (ticket id or number), since/until (YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS) and analysis_type.
+    """
     try:
-        prompts_dir = 'prompts_export'
-        if not os.path.exists(prompts_dir):
-            return jsonify({'status': 'success', 'prompts': []})
-        
-        prompt_files = []
-        for filename in os.listdir(prompts_dir):
-            if filename.endswith('_prompt.json'):
-                filepath = os.path.join(prompts_dir, filename)
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                
-                prompt_files.append({
-                    'filename': filename,
-                    'ticket_id': data['metadata']['ticket_id'],
-                    'ticket_number': data['metadata'].get('ticket_number', data['metadata']['ticket_id']),
-                    'timestamp': data['metadata']['timestamp'],
-                    'analysis_type': data['metadata']['analysis_type']
-                })
-        
-        prompt_files.sort(key=lambda x: x['timestamp'], reverse=True)
+        # Exports still queued by the background writer appear once written; listing never waits for them
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+        filters = {key: request.args.get(key) for key in ('ticket', 'since', 'until', 'analysis_type')}
+        # Served from the prompt catalog; no export is read
+        store = gis_agent.prompt_store
+        entries, next_cursor = store.page(limit=limit, cursor=request.args.get('cursor'), **filters)
+        prompt_files = [{
+            'filename': entry['name'],
+            'ticket_id': entry['ticket_id'],
+            'ticket_number': entry['ticket_number'] if entry['ticket_number'] is not None else entry['ticket_id'],
+            'timestamp': entry['timestamp'],
+            'analysis_type': entry['analysis_type'],
+            'size': entry['size']
+        } for entry in entries]
         
         return jsonify({
             'status': 'success',
             'prompts': prompt_files,
-            'total_count': len(prompt_files)
+            'total_count': store.count(**filters),
+            'next_cursor': next_cursor
         })
     
+    except ValueError as e:
+        return jsonify({'status': 'error', 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'status': 'error', 'error': str(e)})
+
+@app.route('/api/prompts/archive')
+def download_prompt_archive():
+    """Stream a tar, tar.gz or zip archive of the exported prompts matching the filters
+
+    Query parameters: format (tar, tar.gz or zip; default tar), ticket (repeatable or comma-separated
+    ticket ids/numbers), since/until (YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS) and analysis_type. Exports
+    still queued by the background writer are included once written.
+    """
+    try:
+        archive_format = request.args.get('format', 'tar')
+        tickets = [ticket.strip() for value in request.args.getlist('ticket') for ticket in value.split(',')]
+        chunks = stream_prompt_archive(
+            gis_agent.prompt_store, archive_format,
+            ticket=[ticket for ticket in tickets if ticket],
+            since=request.args.get('since'),
+            until=request.args.get('until'),
+            analysis_type=request.args.get('analysis_type')
+        )
+        filename = f"prompts_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{archive_format}"
+        # No Content-Length: the archive is built while it is sent, using chunked transfer
+        return Response(chunks, mimetype=ARCHIVE_FORMATS[archive_format],
+                        headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+    
+    except ValueError as e:
+        return jsonify({'status': 'error', 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'status': 'error', 'error': str(e)})
 
 @app.route('/api/prompts/<filename>')
 def get_prompt_file(filename):
-    """Get specific prompt file content"""
+    """Get specific prompt export content, streamed (gzip-encoded when the client accepts it)"""
     try:
-        filepath = os.path.join('prompts_export', filename)
-        if not os.path.exists(filepath):
+        # Waits only if this export is still queued by the background writer
+        data = gis_agent.read_prompt_export(filename)
+        if data is None:
             return jsonify({'status': 'error', 'error': 'File not found'})
         
-        with open(filepath, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        return jsonify({
-            'status': 'success',
-            'prompt_data': data
-        })
+        compress = request.accept_encodings.quality('gzip') > 0
+        response = Response(stream_json({'status': 'success', 'prompt_data': data}, compress),
+                            mimetype='application/json')
+        response.vary.add('Accept-Encoding')
+        if compress:
+            response.headers['Content-Encoding'] = 'gzip'
+        return response
     
     except Exception as e:
         return jsonify({'status': 'error', 'error': str(e)})
 
+def stream_json(payload: Any, compress: bool = False, chunk_size: int = 16384):
+    """Yield payload as JSON in chunks of about chunk_size bytes, gzip-compressed on the fly if compress is set"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buffer, buffered = [], 0
+    for piece in json.JSONEncoder(ensure_ascii=False).iterencode(payload):
+        buffer.append(piece)
+        buffered += len(piece)
+        if buffered >= chunk_size:
+            chunk = ''.join(buffer).encode('utf-8')
+            buffer, buffered = [], 0
+            chunk = compressor.compress(chunk) if compressor else chunk
+            if chunk:
+                yield chunk
+    chunk = ''.join(buffer).encode('utf-8')
+    yield compressor.compress(chunk) + compressor.flush() if compressor else chunk
+
+def requested_stream_format() -> Optional[str]:
+    """Streaming format asked for with ?stream=, a "stream" field or the Accept header; None for one JSON body"""
+    stream_format = request.args.get('stream') or (request.get_json(silent=True) or {}).get('stream')
+    if not stream_format:
+        accepted = request.accept_mimetypes
+        stream_format = next((name for name, mimetype in STREAM_FORMATS.items()
+                              if accepted[mimetype] > accepted['application/json']), None)
+    if stream_format and stream_format not in STREAM_FORMATS:
+        raise ValueError(f"Unknown stream format '{stream_format}' (use ndjson or sse)")
+    return stream_format
+
+def stream_results(results: Iterator[Tuple[int, Dict[str, Any]]], stream_format: str) -> Response:
+    """Streamed response with one 'result' event per (index, result) pair, in the order results is produced,
+    then a 'summary' event; a failure ends the stream with an 'error' event"""
+
+    def event(name: str, payload: Dict[str, Any]) -> str:
+        if stream_format == 'sse':
+            return f"event: {name}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+        return json.dumps({'type': name, **payload}, ensure_ascii=False) + '\n'
+
+    def generate():
+        started = time.perf_counter()
+        processed = failed = 0
+        try:
+            for index, result in results:
+                processed += 1
+                failed += 'error' in result
+                yield event('result', dict(result, index=index))
+        except Exception as e:
+            yield event('error', {'error': str(e), 'total_processed': processed})
+            return
+        yield event('summary', {
+            'status': 'success',
+            'total_processed': processed,
+            'total_failed': failed,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)
+        })
+
+    # No-cache and no proxy buffering, so each event reaches the client when it is sent
+    return Response(generate(), mimetype=STREAM_FORMATS[stream_format],
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def warm_up() -> Dict[str, float]:
+    """Prepare this process before it serves requests: agent warm-up, dashboard template and job workers"""
+    started = time.perf_counter()
+    timings = gis_agent.warm_up(connect=os.getenv('PREWARM_LLM_CONNECTION', 'false').lower() == 'true')
+    app.jinja_env.get_template('index.html')
+    job_queue.start()
+    worker_state['warmed_up'] = True
+    worker_state['warm_up_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    print(f"🔥 Worker {os.getpid()} warmed up in {worker_state['warm_up_ms']}ms "
+          f"({', '.join(f'{name} {ms}ms' for name, ms in timings.items())})")
+    return timings
+
+def shutdown(timeout: float = 10.0):
+    """Drain this process: running jobs go back to the queue after their current chunk, queued exports are written"""
+    job_queue.stop(timeout)
+    gis_agent.shutdown(timeout)
+
 def create_action_plan(ticket: Dict[str, Any], analysis: Dict[str, Any]) -> List[str]:
-    """Create an action plan based on ticket content and analysis"""
+    """Create an action plan based on ticket content and analysis (steps come from the active ruleset)"""
     category = analysis.get('category', 'general')
     priority = analysis.get('priority', 'medium')
-    
-    # Base action items
-    action_plan = [
-        "Acknowledge receipt of ticket",
-        "Review ticket details and requirements"
-    ]
-    
-    # Category-specific action items
-    if category == 'gis_data':
-        action_plan.extend([
-            "Verify data source and format requirements",
-            "Check geodatabase compatibility",
-            "Validate coordinate system and projections",
-            "Process geocoding request",
-            "Update enterprise geodatabase",
-            "Notify requester of completion"
-        ])
-    elif category == 'gis_application':
-        action_plan.extend([
-            "Review application requirements",
-            "Check map service URLs and data sources",
-            "Test application functionality",
-            "Update application configuration",
-            "Deploy changes to production",
-            "Provide user training if needed"
-        ])
-    elif category == 'service_request':
-        action_plan.extend([
-            "Assess project scope and requirements",
-            "Coordinate with stakeholders",
-            "Develop project timeline",
-            "Create detailed project plan",
-            "Begin project execution",
-            "Provide regular progress updates"
-        ])
-    elif category == 'arcgis_pro':
-        action_plan.extend([
-            "Reproduce the reported issue",
-            "Check system requirements and compatibility",
-            "Apply relevant software updates",
-            "Test with clean user profile",
-            "Escalate to vendor support if needed"
-        ])
-    elif category == 'web_mapping':
-        action_plan.extend([
-            "Check web map configuration",
-            "Verify map service status",
-            "Test in multiple browsers",
-            "Review user permissions",
-            "Apply necessary fixes"
-        ])
-    elif category == 'data_issues':
-        action_plan.extend([
-            "Investigate data source integrity",
-            "Check data permissions and access",
-            "Verify data format and structure",
-            "Repair or restore data if needed",
-            "Update data documentation"
-        ])
-    elif category == 'permissions':
-        action_plan.extend([
-            "Verify user account status",
-            "Check group memberships and roles",
-            "Review permission settings",
-            "Update user access as needed",
-            "Test access restoration"
-        ])
-    else:
-        action_plan.extend([
-            "Investigate reported issue",
-            "Research potential solutions",
-            "Implement appropriate fix",
-            "Test resolution",
-            "Follow up with requester"
-        ])
-    
-    # Priority-based timeline adjustments
-    if priority == 'high':
-        action_plan.append("URGENT: Complete within 4 hours")
-    elif priority == 'medium':
-        action_plan.append("Standard: Complete within 24 hours")
-    else:
-        action_plan.append("Low priority: Complete within 72 hours")
-    
-    return action_plan
+    return gis_agent.rules.ticket_action_plan(category, priority)
 
-# Flask server startup
+# Flask server startup (development; for production run: gunicorn -c gunicorn.conf.py)
 if __name__ == '__main__':
     print("Starting GIS Ticket Management AI Agent...")
     print("Server will be available at: http://127.0.0.1:5000")
     print("Press Ctrl+C to stop the server")
+    # With debug=True the reloader's parent process only watches files; the child it starts serves and runs jobs
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        warm_up()
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Migrate one-file-per-export prompt exports into the segmented prompt store
+
+Imports every *_prompt.json file in the source directory into the prompt store under the
+same name, so /api/prompts keeps listing and serving them. Exports already in the store are
+skipped, so the migration can be re-run safely.
+
+Usage:
+    python src/migrate_prompt_exports.py [--source prompts_export] [--store prompts_export] [--delete]
+"""
+
+import argparse
+import os
+import sys
+
+from dotenv import load_dotenv
+
+from utils.prompt_store import migrate_legacy_exports, open_prompt_store
+
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Migrate prompt export files into the segmented prompt store')
+    parser.add_argument('--source', default='prompts_export', help='Directory holding the *_prompt.json files')
+    parser.add_argument('--store', default='prompts_export', help='Prompt store directory (the agent uses prompts_export)')
+    parser.add_argument('--delete', action='store_true', help='Remove each file once it is in the store')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.source):
+        print(f"❌ Source directory not found: {args.source}")
+        return 1
+
+    store = open_prompt_store(args.store)
+    imported, skipped = migrate_legacy_exports(store, args.source, delete=args.delete)
+    store.close()
+    print(f"✅ Imported {imported} prompt exports into {args.store} ({skipped} already present)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Apply the prompt export retention policy once
+
+Deletes closed segments from days older than --max-age-days, compacts each closed past day into
+a single gzip segment (--compact), then deletes the oldest closed segments until the store fits in
+--max-size-mb. Limits default to PROMPT_RETENTION_DAYS, PROMPT_RETENTION_MAX_BYTES and
+PROMPT_COMPACTION, the settings the agent applies in the background. Safe to run from cron while
+the app is serving: only closed segments are touched, and concurrent runs skip.
+
+Usage:
+    python src/prompt_retention.py [--store prompts_export] [--max-age-days 30] [--max-size-mb 500] [--compact]
+"""
+
+import argparse
+import os
+import sys
+
+from dotenv import load_dotenv
+
+from utils.prompt_retention import apply_retention
+from utils.prompt_store import open_prompt_store
+
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Evict and compact prompt export segments')
+    parser.add_argument('--store', default='prompts_export', help='Prompt store directory (the agent uses prompts_export)')
+    parser.add_argument('--max-age-days', type=int, default=int(os.getenv('PROMPT_RETENTION_DAYS', '0')),
+                        help='Delete segments from days older than this (0 keeps everything)')
+    parser.add_argument('--max-size-mb', type=float,
+                        default=int(os.getenv('PROMPT_RETENTION_MAX_BYTES', '0')) / (1024 * 1024),
+                        help='Delete the oldest segments until the store fits (0 for no cap)')
+    parser.add_argument('--compact', action='store_true',
+                        default=os.getenv('PROMPT_COMPACTION', 'false').lower() == 'true',
+                        help='Merge each past day into one gzip segment')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.store):
+        print(f"❌ Prompt store not found: {args.store}")
+        return 1
+
+    store = open_prompt_store(args.store)
+    stats = apply_retention(store, args.max_age_days, int(args.max_size_mb * 1024 * 1024), args.compact)
+    store.close()
+    if stats['skipped']:
+        print("⚠️  Retention is already running for this store; nothing done")
+        return 0
+    print(f"✅ Evicted {stats['evicted_segments']} segments ({stats['evicted_bytes'] / (1024 * 1024):.1f} MB), "
+          f"compacted {stats['compacted_days']} days ({stats['compacted_bytes_saved'] / (1024 * 1024):.1f} MB saved)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
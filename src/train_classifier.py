@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Train the local ticket classifier used as the agent's network-free analysis tier
+
+Fits TF-IDF + logistic regression models for category and priority from historical
+tickets (JSON or XML exports), the final labels recorded in ProductivityTracker's
+ticket_actions table and the user ratings in automation_feedback, then saves the
+model to LOCAL_MODEL_PATH (default models/local_classifier.joblib).
+
+Usage:
+    python src/train_classifier.py --tickets tickets.json [--tickets incidents.xml] [--db productivity.db]
+"""
+
+import argparse
+import os
+import random
+import sys
+
+from dotenv import load_dotenv
+
+from utils.local_classifier import LocalTicketClassifier, build_training_set, load_tickets
+from utils.ruleset import DEFAULT_RULESET_PATH, load_ruleset
+
+load_dotenv()
+
+
+def holdout_accuracy(examples, fraction: float, seed: int):
+    """Category/priority accuracy of a model trained without a random holdout slice"""
+    shuffled = list(examples)
+    random.Random(seed).shuffle(shuffled)
+    cut = max(1, int(len(shuffled) * fraction))
+    holdout, train = shuffled[:cut], shuffled[cut:]
+    model = LocalTicketClassifier.train(train)
+    accuracy = {}
+    for target in ('category', 'priority'):
+        rows = [example for example in holdout if example.get(target)]
+        correct = sum(1 for example in rows if model.predict(example['ticket'])[target] == example[target])
+        accuracy[target] = correct / len(rows) if rows else None
+    return accuracy
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the local ticket classifier')
+    parser.add_argument('--tickets', action='append', required=True,
+                        help='Historical tickets file (JSON list or XML); may be repeated')
+    parser.add_argument('--db', default='productivity.db', help='ProductivityTracker SQLite database')
+    parser.add_argument('--output', default=os.getenv('LOCAL_MODEL_PATH', 'models/local_classifier.joblib'),
+                        help='Where to write the trained model')
+    parser.add_argument('--ruleset', default=os.getenv('RULESET_PATH') or DEFAULT_RULESET_PATH,
+                        help='Ruleset whose categories are the allowed category labels')
+    parser.add_argument('--min-rating', type=int, default=3,
+                        help='Lowest average automation_feedback rating whose AI suggestion is used as a label')
+    parser.add_argument('--holdout', type=float, default=0.2,
+                        help='Fraction of examples held out to report accuracy (0 to skip)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for the holdout split')
+    args = parser.parse_args()
+
+    tickets = [ticket for path in args.tickets for ticket in load_tickets(path)]
+    categories = list(load_ruleset(args.ruleset).categories)
+    examples = build_training_set(tickets, args.db, args.min_rating, categories)
+    print(f"📚 {len(examples)} labelled examples from {len(tickets)} tickets")
+
+    try:
+        if args.holdout > 0 and len(examples) >= 10:
+            accuracy = holdout_accuracy(examples, args.holdout, args.seed)
+            for target, value in accuracy.items():
+                print(f"   holdout {target} accuracy: {'n/a' if value is None else f'{value:.1%}'}")
+        model = LocalTicketClassifier.train(examples)
+    except ValueError as e:
+        print(f"❌ Training failed: {e}")
+        return 1
+
+    model.save(args.output)
+    print(f"✅ Local classifier saved to {args.output}")
+    for target, counts in model.metadata['label_counts'].items():
+        print(f"   {target}: {counts}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,184 @@
+
+import re
+from itertools import repeat
+from typing import Dict, Iterable, List, Set, Tuple
+
+# Optional sparse-matrix batch scoring (numpy/scipy); rank_many scores ticket by ticket without them
+try:
+    import numpy as np
+    from scipy import sparse
+    SPARSE_SCORING_AVAILABLE = True
+except ImportError:
+    np = sparse = None
+    SPARSE_SCORING_AVAILABLE = False
+
+_TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+# Batch tokenizer: the NUL separator between field values is kept as its own token so rows can be recovered
+_BATCH_SEPARATOR = '\x00'
+_BATCH_TOKEN_PATTERN = re.compile(r'[a-z0-9]+|\x00')
+
+# Simple plural forms indexed alongside each keyword ("layer" also matches "layers", "address" "addresses")
+_PLURAL_SUFFIXES = ('s', 'es')
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased alphanumeric tokens of text"""
+    return _TOKEN_PATTERN.findall(text.lower()) if text else []
+
+
+def _surface_forms(tokens: List[str]) -> List[str]:
+    """Index keys for a keyword: the token n-gram plus its simple plural forms"""
+    phrase = ' '.join(tokens)
+    return [phrase] + [phrase + suffix for suffix in _PLURAL_SUFFIXES]
+
+
+class CategoryScoringIndex:
+    """Token n-gram index that scores every category against every ticket field in one pass
+
+    Keywords match anywhere in a field on token boundaries (not only at the start of the
+    field), and each distinct keyword counts once per weight tier.
+    """
+
+    def __init__(self, keyword_groups: Dict[str, List[str]], tier_weights: Dict[str, float]):
+        self.categories = list(keyword_groups)
+        self.tier_weights = dict(tier_weights)
+        self.max_ngram = 1
+
+        index: Dict[str, List[Tuple[str, str]]] = {}
+        for category, keywords in keyword_groups.items():
+            for keyword in keywords:
+                tokens = tokenize(keyword)
+                if not tokens:
+                    continue
+                self.max_ngram = max(self.max_ngram, len(tokens))
+                for form in _surface_forms(tokens):
+                    entries = index.setdefault(form, [])
+                    if (category, keyword) not in entries:
+                        entries.append((category, keyword))
+        self._index = {form: tuple(entries) for form, entries in index.items()}
+        self._sparse_model = None
+
+    def matches(self, text: str) -> Set[Tuple[str, str]]:
+        """(category, keyword) pairs whose keyword occurs in text"""
+        tokens = tokenize(text)
+        index = self._index
+        found = set()
+        for start in range(len(tokens)):
+            for size in range(1, min(self.max_ngram, len(tokens) - start) + 1):
+                entries = index.get(' '.join(tokens[start:start + size]))
+                if entries:
+                    found.update(entries)
+        return found
+
+    def score(self, tier_values: Dict[str, Iterable[str]]) -> Dict[str, float]:
+        """Weighted score for every category; tiers without a weight are not scanned"""
+        scores = dict.fromkeys(self.categories, 0.0)
+        for tier, values in tier_values.items():
+            weight = self.tier_weights.get(tier)
+            if not weight:
+                continue
+            matched = set()
+            for value in values:
+                matched |= self.matches(value)
+            for category, _ in matched:
+                scores[category] += weight
+        return scores
+
+    def rank(self, tier_values: Dict[str, Iterable[str]]) -> List[Tuple[str, float]]:
+        """Categories with a positive score, best first (ties keep category order)"""
+        return self._ranking(self.score(tier_values))
+
+    def rank_many(self, tier_values_list: List[Dict[str, Iterable[str]]]) -> List[List[Tuple[str, float]]]:
+        """rank() for many tickets, scoring every ticket and category in one sparse matrix product"""
+        if not SPARSE_SCORING_AVAILABLE:
+            return [self.rank(tier_values) for tier_values in tier_values_list]
+        if not tier_values_list:
+            return []
+        if self._sparse_model is None:
+            self._sparse_model = self._build_sparse_model()
+        form_columns, form_keywords, keyword_categories = self._sparse_model
+
+        # One row per field value, grouped per (ticket, weighted tier) so keywords count once per tier
+        texts, row_groups, group_tickets, group_weights = [], [], [], []
+        for ticket_index, tier_values in enumerate(tier_values_list):
+            for tier, values in tier_values.items():
+                weight = self.tier_weights.get(tier)
+                if not weight or not values:
+                    continue
+                group = len(group_weights)
+                group_tickets.append(ticket_index)
+                group_weights.append(weight)
+                for value in values:
+                    texts.append(value)
+                    row_groups.append(group)
+
+        if not texts:
+            return [[] for _ in tier_values_list]
+
+        field_forms = self._vectorize(texts, form_columns)
+        grouping = sparse.csr_matrix((np.ones(len(texts)), (row_groups, np.arange(len(texts)))),
+                                     shape=(len(group_weights), len(texts)))
+        group_keywords = (grouping @ field_forms @ form_keywords).sign()
+        weighting = sparse.csr_matrix((group_weights, (group_tickets, np.arange(len(group_weights)))),
+                                      shape=(len(tier_values_list), len(group_weights)))
+        scores = (weighting @ group_keywords @ keyword_categories).toarray()
+
+        # Stable descending sort keeps category order on ties, as in _ranking
+        order = np.argsort(-scores, axis=1, kind='stable')
+        ranked_scores = np.take_along_axis(scores, order, axis=1)
+        positive_counts = (ranked_scores > 0).sum(axis=1).tolist()
+        ranked_categories = np.array(self.categories, dtype=object)[order].tolist()
+        return [
+            list(zip(categories[:count], row_scores[:count]))
+            for categories, row_scores, count in zip(ranked_categories, ranked_scores.tolist(), positive_counts)
+        ]
+
+    def _vectorize(self, texts: List[str], form_columns: Dict[str, int]):
+        """Binary texts x n-gram forms matrix; tokens and n-grams are looked up in C-level passes over the whole batch"""
+        texts = [text.replace(_BATCH_SEPARATOR, ' ') for text in texts] \
+            if any(_BATCH_SEPARATOR in text for text in texts) else texts
+        tokens = _BATCH_TOKEN_PATTERN.findall(_BATCH_SEPARATOR.join(texts).lower())
+
+        # Row of every token position: the number of separators before it
+        separators = np.fromiter(map(_BATCH_SEPARATOR.__eq__, tokens), dtype=bool, count=len(tokens))
+        token_rows = np.cumsum(separators)
+
+        rows, columns = [], []
+        for size in range(1, self.max_ngram + 1):
+            # N-grams spanning a separator never match a form, so each row only sees its own n-grams
+            grams = map(' '.join, zip(*(tokens[offset:] for offset in range(size)))) if size > 1 else tokens
+            count = max(len(tokens) - size + 1, 0)
+            ids = np.fromiter(map(form_columns.get, grams, repeat(-1)), dtype=np.int64, count=count)
+            hits = ids >= 0
+            rows.append(token_rows[:count][hits])
+            columns.append(ids[hits])
+
+        rows = np.concatenate(rows)
+        return sparse.csr_matrix((np.ones(len(rows)), (rows, np.concatenate(columns))),
+                                 shape=(len(texts), len(form_columns)))
+
+    def _build_sparse_model(self):
+        """Column of every indexed n-gram form plus form->keyword and keyword->category matrices"""
+        forms = list(self._index)
+        form_columns = {form: column for column, form in enumerate(forms)}
+        keywords = sorted({entry for entries in self._index.values() for entry in entries})
+        keyword_columns = {entry: column for column, entry in enumerate(keywords)}
+        category_columns = {category: column for column, category in enumerate(self.categories)}
+
+        form_rows, form_cols = zip(*[
+            (row, keyword_columns[entry]) for row, form in enumerate(forms) for entry in self._index[form]
+        ])
+        form_keywords = sparse.csr_matrix((np.ones(len(form_rows)), (form_rows, form_cols)),
+                                          shape=(len(forms), len(keywords)))
+        keyword_categories = sparse.csr_matrix(
+            (np.ones(len(keywords)), (np.arange(len(keywords)), [category_columns[c] for c, _ in keywords])),
+            shape=(len(keywords), len(self.categories))
+        )
+        return form_columns, form_keywords, keyword_categories
+
+    @staticmethod
+    def _ranking(scores: Dict[str, float]) -> List[Tuple[str, float]]:
+        """Positive scores sorted best first, ties keeping category order"""
+        return sorted(((category, score) for category, score in scores.items() if score > 0),
+                      key=lambda item: -item[1])
@@ -0,0 +1,170 @@
+
+import atexit
+import queue
+import threading
+import time
+import weakref
+from typing import Any, Dict, List, Optional
+
+from .prompt_store import PromptStore
+
+_STOP = object()
+
+# Live writers, closed by one exit hook; the set does not keep a writer alive on its own
+_writers: 'weakref.WeakSet' = weakref.WeakSet()
+
+
+class PromptExportWriter:
+    """Background writer for prompt exports
+
+    Requests hand over (store, name, document) and return immediately; a single worker thread
+    serializes the documents and appends them to their PromptStore in batches. The queue is
+    bounded: when it is full a request waits up to block_timeout seconds for room, and the export
+    is dropped if none frees up. Pending exports are flushed when the process exits.
+    """
+
+    def __init__(self, max_queue: int = 1000, batch_size: int = 50, block_timeout: float = 0.05):
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.block_timeout = block_timeout
+        self._queue: 'queue.Queue' = queue.Queue(maxsize=max_queue)
+        self._pending = 0
+        self._pending_names: Dict[str, int] = {}
+        self._pending_done = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stats = {'submitted': 0, 'written': 0, 'blocked': 0, 'dropped': 0, 'errors': 0, 'batches': 0}
+        _writers.add(self)
+
+    def submit(self, store: PromptStore, name: str, document: Dict[str, Any]) -> bool:
+        """Queue a document to be stored under name; False if it was dropped because the queue stayed full"""
+        self._ensure_worker()
+        with self._pending_done:
+            self._pending += 1
+            self._pending_names[name] = self._pending_names.get(name, 0) + 1
+        try:
+            try:
+                self._queue.put_nowait((store, name, document))
+            except queue.Full:
+                self._count('blocked')
+                self._queue.put((store, name, document), timeout=self.block_timeout)
+        except queue.Full:
+            self._count('dropped')
+            self._finish([name])
+            return False
+        self._count('submitted')
+        return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued export is on disk; False if timeout expired first"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._pending_done:
+            while self._pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._pending_done.wait(remaining)
+        return True
+
+    def wait_for(self, name: str, timeout: Optional[float] = None) -> bool:
+        """Wait until no export named name is queued (returns at once if none is); False if timeout expired first"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._pending_done:
+            while name in self._pending_names:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._pending_done.wait(remaining)
+        return True
+
+    def close(self, timeout: float = 10.0):
+        """Flush pending exports and stop the worker"""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self.flush(timeout)
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue depth and export counters"""
+        with self._pending_done:
+            stats = dict(self._stats)
+        stats['queue_depth'] = self._queue.qsize()
+        stats['max_queue'] = self.max_queue
+        return stats
+
+    def _ensure_worker(self):
+        """Start the worker on first use (and again in a forked child, where the thread does not survive)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='prompt-export-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        """Worker loop: take what is queued (up to batch_size) and write it in one pass"""
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = _STOP in batch
+            items = [item for item in batch if item is not _STOP]
+            self._write_batch(items)
+            if stop:
+                return
+
+    def _write_batch(self, items):
+        """Encode one batch of exports and append them to their stores, one append per store"""
+        encoded: Dict[int, list] = {}
+        stores = {}
+        errors = 0
+        for store, name, document in items:
+            try:
+                encoded.setdefault(id(store), []).append(store.encode(name, document))
+                stores[id(store)] = store
+            except Exception as e:
+                errors += 1
+                print(f"⚠️  Prompt export {name} could not be encoded: {e}")
+            # Hand the GIL back between exports so request threads wait for at most one serialization
+            time.sleep(0)
+        written = 0
+        for key, records in encoded.items():
+            try:
+                stores[key].append_encoded(records)
+                written += len(records)
+            except Exception as e:
+                errors += len(records)
+                print(f"⚠️  Prompt export to {stores[key].root} failed: {e}")
+        with self._pending_done:
+            self._stats['written'] += written
+            self._stats['errors'] += errors
+            self._stats['batches'] += 1 if items else 0
+        self._finish([name for _, name, _ in items])
+
+    def _count(self, name: str):
+        """Increment an export counter"""
+        with self._pending_done:
+            self._stats[name] += 1
+
+    def _finish(self, names: List[str]):
+        """Mark the named exports as no longer pending and wake flush() and wait_for() waiters"""
+        with self._pending_done:
+            self._pending -= len(names)
+            for name in names:
+                if self._pending_names.get(name, 0) > 1:
+                    self._pending_names[name] -= 1
+                else:
+                    self._pending_names.pop(name, None)
+            self._pending_done.notify_all()
+
+
+@atexit.register
+def _close_writers():
+    """Flush the exports of every writer still alive when the process exits"""
+    for writer in list(_writers):
+        writer.close()
@@ -0,0 +1,327 @@
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+# Job states; a job ends completed, failed or cancelled and keeps its results
+FINISHED_STATUSES = ('completed', 'failed', 'cancelled')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    options TEXT,
+    total INTEGER NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    processing_seconds REAL NOT NULL DEFAULT 0,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    claim TEXT,
+    owner_pid INTEGER,
+    heartbeat REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS job_items (
+    job_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    result TEXT,
+    PRIMARY KEY (job_id, position)
+) WITHOUT ROWID;
+"""
+
+_JOB_COLUMNS = ('id', 'kind', 'status', 'options', 'total', 'done', 'failed', 'processing_seconds',
+                'cancel_requested', 'error', 'created_at', 'started_at', 'finished_at')
+
+
+class JobQueue:
+    """SQLite-backed background jobs: items processed a chunk at a time by worker threads
+
+    handlers maps a job kind to a function taking (items, options) and returning one result per
+    item. Each chunk's results are committed together with the job's progress, so a job interrupted
+    by a restart resumes at its first unfinished item. A running job whose process has exited, or
+    that has not reported progress for lease seconds, is queued again by the next worker looking
+    for work, in this process or another one sharing the database.
+    """
+
+    def __init__(self, path: str, handlers: Dict[str, Callable[[List[Any], Dict[str, Any]], List[Any]]],
+                 workers: int = 2, chunk_size: int = 25, lease: float = 300, poll_interval: float = 1.0):
+        self.path = path
+        self.handlers = handlers
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self._lock = threading.RLock()
+        self._conn = None
+        self._conn_pid = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._threads_pid = None
+
+    def submit(self, kind: str, items: List[Any], options: Optional[Dict[str, Any]] = None) -> str:
+        """Queue a job over items and return its id"""
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job type '{kind}'")
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("INSERT INTO jobs (id, kind, status, options, total, created_at) VALUES (?, ?, 'queued', ?, ?, ?)",
+                             (job_id, kind, json.dumps(options or {}), len(items), time.time()))
+                conn.executemany("INSERT INTO job_items (job_id, position, payload) VALUES (?, ?, ?)",
+                                 ((job_id, position, json.dumps(item, default=str)) for position, item in enumerate(items)))
+        self.start()
+        self._wake.set()
+        return job_id
+
+    def get(self, job_id: str, offset: int = 0, limit: int = 100) -> Optional[Dict[str, Any]]:
+        """Progress, ETA and up to limit finished results from item position offset on; None for an unknown job
+
+        Poll again with next_offset to receive only the results finished since.
+        """
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(f"SELECT {', '.join(_JOB_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            results = conn.execute(
+                "SELECT position, result FROM job_items WHERE job_id = ? AND position >= ? AND result IS NOT NULL "
+                "ORDER BY position LIMIT ?", (job_id, offset, limit)).fetchall()
+        job = dict(zip(_JOB_COLUMNS, row))
+        remaining = job['total'] - job['done']
+        eta = None
+        if job['status'] not in FINISHED_STATUSES and job['done']:
+            eta = round(remaining * job['processing_seconds'] / job['done'], 1)
+        return {
+            'job_id': job['id'],
+            'type': job['kind'],
+            'status': job['status'],
+            'cancel_requested': bool(job['cancel_requested']),
+            'total': job['total'],
+            'done': job['done'],
+            'failed': job['failed'],
+            'progress': round(job['done'] * 100 / job['total'], 1) if job['total'] else 100.0,
+            'eta_seconds': eta,
+            'error': job['error'],
+            'options': json.loads(job['options'] or '{}'),
+            'created_at': _isoformat(job['created_at']),
+            'started_at': _isoformat(job['started_at']),
+            'finished_at': _isoformat(job['finished_at']),
+            'results': [json.loads(result) for _, result in results],
+            'next_offset': results[-1][0] + 1 if results else offset
+        }
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """Cancel a job: a queued job at once, a running one after its current chunk
+
+        Returns the job's status afterwards, or None for an unknown job.
+        """
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("UPDATE jobs SET status = 'cancelled', cancel_requested = 1, finished_at = ? "
+                             "WHERE id = ? AND status = 'queued'", (time.time(), job_id))
+                conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,))
+                row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Number of jobs in each state"""
+        with self._lock:
+            counts = dict(self._connection().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {'jobs': counts, 'workers': self.workers}
+
+    def start(self):
+        """Start the worker threads (again in a forked child, where they do not survive)"""
+        with self._lock:
+            if self._threads_pid == os.getpid() and all(thread.is_alive() for thread in self._threads):
+                return
+            self._stop.clear()
+            self._threads = [threading.Thread(target=self._run, name=f'job-worker-{number}', daemon=True)
+                             for number in range(self.workers)]
+            self._threads_pid = os.getpid()
+            for thread in self._threads:
+                thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Stop the workers; jobs they were running go back to the queue after their current chunk"""
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def close(self):
+        """Stop the workers and close this process's connection"""
+        self.stop()
+        with self._lock:
+            if self._conn is not None and self._conn_pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+    def run_pending(self):
+        """Process queued jobs in the calling thread until none is left"""
+        while True:
+            job = self._claim()
+            if job is None:
+                return
+            self._process(job)
+
+    def _run(self):
+        """Worker loop: claim the oldest queued job and process it, or wait for one"""
+        while not self._stop.is_set():
+            try:
+                job = self._claim()
+                if job is not None:
+                    self._process(job)
+                    continue
+            except Exception as e:
+                print(f"⚠️  Job worker error: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        """Take the oldest queued job for this worker, after requeueing abandoned ones"""
+        self._requeue_abandoned()
+        claim = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                # One statement, so two workers (or processes) never claim the same job
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', claim = ?, owner_pid = ?, heartbeat = ?, "
+                    "started_at = COALESCE(started_at, ?) "
+                    "WHERE id = (SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1)",
+                    (claim, os.getpid(), now, now))
+            row = conn.execute("SELECT id, kind, options FROM jobs WHERE claim = ? AND status = 'running'",
+                               (claim,)).fetchone()
+        if row is None:
+            return None
+        return {'id': row[0], 'kind': row[1], 'options': json.loads(row[2] or '{}'), 'claim': claim}
+
+    def _requeue_abandoned(self):
+        """Queue again running jobs whose process has exited or whose lease has expired"""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            running = conn.execute("SELECT id, claim, owner_pid, heartbeat FROM jobs WHERE status = 'running'").fetchall()
+            abandoned = [(job_id, claim) for job_id, claim, pid, heartbeat in running
+                         if (heartbeat or 0) < now - self.lease or not _process_alive(pid)]
+            if abandoned:
+                with conn:
+                    conn.executemany("UPDATE jobs SET status = 'queued', claim = NULL WHERE id = ? AND claim = ?",
+                                     abandoned)
+                print(f"⚠️  Requeued {len(abandoned)} interrupted jobs")
+
+    def _process(self, job: Dict[str, Any]):
+        """Run a claimed job a chunk at a time until it finishes, is cancelled or this worker stops"""
+        handler = self.handlers.get(job['kind'])
+        if handler is None:
+            self._finish(job, 'failed', f"Unknown job type '{job['kind']}'")
+            return
+        while True:
+            with self._lock:
+                conn = self._connection()
+                cancel = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job['id'],)).fetchone()
+                chunk = conn.execute(
+                    "SELECT position, payload FROM job_items WHERE job_id = ? AND result IS NULL ORDER BY position LIMIT ?",
+                    (job['id'], self.chunk_size)).fetchall()
+            if cancel is None or cancel[0]:
+                self._finish(job, 'cancelled')
+                return
+            if not chunk:
+                self._finish(job, 'completed')
+                return
+            if self._stop.is_set():
+                self._release(job)
+                return
+            started = time.perf_counter()
+            try:
+                results = handler([json.loads(payload) for _, payload in chunk], job['options'])
+                if len(results) != len(chunk):
+                    raise ValueError(f"Handler returned {len(results)} results for {len(chunk)} items")
+            except Exception as e:
+                self._finish(job, 'failed', str(e))
+                return
+            if not self._commit_chunk(job, [position for position, _ in chunk], results,
+                                      time.perf_counter() - started):
+                return  # Requeued and claimed by another worker in the meantime
+
+    def _commit_chunk(self, job: Dict[str, Any], positions: List[int], results: List[Any], elapsed: float) -> bool:
+        """Store a chunk's results and the job's progress in one transaction; False if the job is no longer ours"""
+        failed = sum(1 for result in results if isinstance(result, dict) and 'error' in result)
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                updated = conn.execute(
+                    "UPDATE jobs SET done = done + ?, failed = failed + ?, processing_seconds = processing_seconds + ?, "
+                    "heartbeat = ? WHERE id = ? AND claim = ?",
+                    (len(results), failed, elapsed, time.time(), job['id'], job['claim'])).rowcount
+                if not updated:
+                    return False
+                conn.executemany("UPDATE job_items SET result = ? WHERE job_id = ? AND position = ?",
+                                 [(json.dumps(result, default=str), job['id'], position)
+                                  for position, result in zip(positions, results)])
+        return True
+
+    def _finish(self, job: Dict[str, Any], status: str, error: Optional[str] = None):
+        """Mark a claimed job finished"""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("UPDATE jobs SET status = ?, error = ?, finished_at = ?, claim = NULL "
+                             "WHERE id = ? AND claim = ?", (status, error, time.time(), job['id'], job['claim']))
+
+    def _release(self, job: Dict[str, Any]):
+        """Put a claimed job back in the queue"""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("UPDATE jobs SET status = 'queued', claim = NULL WHERE id = ? AND claim = ?",
+                             (job['id'], job['claim']))
+
+    def _connection(self) -> sqlite3.Connection:
+        """Connection for this process, opened on first use (and again in a forked child)"""
+        if self._conn is None or self._conn_pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            # WAL lets request threads poll progress while a worker commits results
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn, self._conn_pid = conn, os.getpid()
+        return self._conn
+
+
+def _process_alive(pid: Optional[int]) -> bool:
+    """Whether a process with this pid is running on this host"""
+    if not pid:
+        return False
+    if os.name == 'nt':
+        return True  # os.kill(pid, 0) would send CTRL_C_EVENT there; rely on the lease
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # Exists but belongs to another user
+    return True
+
+
+def _isoformat(timestamp: Optional[float]) -> Optional[str]:
+    """ISO time of a stored timestamp"""
+    return datetime.fromtimestamp(timestamp).isoformat() if timestamp else None
@@ -0,0 +1,122 @@
+
+import re
+from collections import namedtuple
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Optional C Aho-Corasick automaton (pyahocorasick); the compiled regex is used when unavailable
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    ahocorasick = None
+    AHOCORASICK_AVAILABLE = False
+
+# A single keyword occurrence; start/end index into the lower-cased text
+KeywordHit = namedtuple('KeywordHit', ['keyword', 'start', 'end', 'groups'])
+
+
+def _build_trie_pattern(keywords: Iterable[str]) -> str:
+    """Build a trie-shaped alternation so the regex engine walks shared prefixes only once"""
+    trie: Dict[str, dict] = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def render(node: Dict[str, dict]) -> str:
+        branches = [re.escape(char) + render(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # Greedy optional tail: the longest keyword at a position wins, shorter ones are prefixes of it
+        return f'(?:{body})?' if '' in node else body
+
+    return render(trie)
+
+
+class KeywordMatcher:
+    """Multi-pattern keyword matcher compiled once (Aho-Corasick automaton or trie-shaped regex)
+
+    Every keyword occurrence (including overlapping ones) is reported with its position
+    in one scan of the text, instead of one substring search per keyword.
+    """
+
+    def __init__(self, keyword_groups: Dict[str, List[str]], use_automaton: bool = True):
+        self.keyword_groups = {
+            group: [keyword.lower() for keyword in keywords if keyword]
+            for group, keywords in keyword_groups.items()
+        }
+
+        groups_by_keyword: Dict[str, List[str]] = {}
+        for group, keywords in self.keyword_groups.items():
+            for keyword in keywords:
+                groups_by_keyword.setdefault(keyword, [])
+                if group not in groups_by_keyword[keyword]:
+                    groups_by_keyword[keyword].append(group)
+        self._groups_by_keyword = {keyword: tuple(groups) for keyword, groups in groups_by_keyword.items()}
+
+        # Keywords that also match wherever a longer keyword matches (proper prefixes of it)
+        keywords = sorted(self._groups_by_keyword, key=len, reverse=True)
+        self._prefix_keywords: Dict[str, Tuple[str, ...]] = {
+            keyword: tuple(other for other in keywords if len(other) < len(keyword) and keyword.startswith(other))
+            for keyword in keywords
+        }
+
+        self._longest = len(keywords[0]) if keywords else 0
+        self._pattern: Optional[re.Pattern] = None
+        self._automaton = None
+        if keywords and use_automaton and AHOCORASICK_AVAILABLE:
+            self._automaton = ahocorasick.Automaton()
+            for keyword in keywords:
+                self._automaton.add_word(keyword, keyword)
+            self._automaton.make_automaton()
+        elif keywords:
+            self._pattern = re.compile(_build_trie_pattern(keywords))
+        self.backend = 'aho-corasick' if self._automaton is not None else 'regex'
+
+    def _hits_at(self, keyword: str, start: int) -> List[KeywordHit]:
+        """The longest keyword matched at start plus every shorter keyword that is a prefix of it"""
+        hits = [KeywordHit(keyword, start, start + len(keyword), self._groups_by_keyword[keyword])]
+        for shorter in self._prefix_keywords[keyword]:
+            hits.append(KeywordHit(shorter, start, start + len(shorter), self._groups_by_keyword[shorter]))
+        return hits
+
+    def find_all(self, text: str) -> List[KeywordHit]:
+        """Return every keyword hit in text (case-insensitive, overlaps included), ordered by position"""
+        if not text or self._longest == 0:
+            return []
+        text = text.lower()
+        if self._automaton is not None:
+            hits = [
+                KeywordHit(keyword, end - len(keyword) + 1, end + 1, self._groups_by_keyword[keyword])
+                for end, keyword in self._automaton.iter(text)
+            ]
+            hits.sort(key=lambda hit: (hit.start, -len(hit.keyword)))
+            return hits
+        search = self._pattern.search
+        hits = []
+        match = search(text)
+        while match:
+            start = match.start()
+            hits.extend(self._hits_at(match.group(), start))
+            # Resume one character later so overlapping keywords are also reported
+            match = search(text, start + 1)
+        return hits
+
+    def groups_found(self, text: str) -> Dict[str, List[str]]:
+        """Return, per group, the group's keywords present in text (in the group's keyword order)"""
+        if not text or self._longest == 0:
+            return {}
+        if self._automaton is not None:
+            found = {keyword for _, keyword in self._automaton.iter(text.lower())}
+        else:
+            found = {hit.keyword for hit in self.find_all(text)}
+        if not found:
+            return {}
+        groups = {}
+        for group, keywords in self.keyword_groups.items():
+            present = [keyword for keyword in keywords if keyword in found]
+            if present:
+                groups[group] = present
+        return groups
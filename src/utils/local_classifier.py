@@ -0,0 +1,234 @@
+
+import json
+import os
+import sqlite3
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+# Optional scikit-learn model; the local classifier tier is disabled without it
+try:
+    import joblib
+    import numpy as np
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    SKLEARN_AVAILABLE = True
+except ImportError:
+    joblib = np = TfidfVectorizer = LogisticRegression = None
+    SKLEARN_AVAILABLE = False
+
+from .structured_output import GIS_CATEGORY_NAMES, PRIORITY_LEVELS
+from .xml_ticket_parser import XMLTicketParser
+
+MODEL_FORMAT_VERSION = 1
+
+# Free-text fields the model reads; XML category fields are left out because they are training labels
+TEXT_FIELDS = ['subject', 'description', 'description_no_html', 'additional_info', 'manual_subject', 'manual_description']
+
+
+def ticket_text(ticket_data: Dict[str, Any]) -> str:
+    """Concatenated free-text fields of a ticket"""
+    return ' '.join(str(ticket_data[field]) for field in TEXT_FIELDS if ticket_data.get(field))
+
+
+def load_tickets(path: str) -> List[Dict[str, Any]]:
+    """Tickets from a JSON list, or from a ticket/incident XML export read as /api/import_xml reads it"""
+    if path.lower().endswith('.xml'):
+        with open(path, 'rb') as f:
+            return XMLTicketParser.parse_xml_file(f.read())
+    with open(path, 'r', encoding='utf-8') as f:
+        tickets = json.load(f)
+    return tickets if isinstance(tickets, list) else tickets.get('tickets', [])
+
+
+def _label(value: Any, allowed: List[str]) -> Optional[str]:
+    """Normalized label if value is one of the allowed GIS categories/priorities"""
+    if not value:
+        return None
+    label = str(value).strip().lower().replace(' ', '_')
+    return label if label in allowed else None
+
+
+def build_training_set(tickets: List[Dict[str, Any]], db_path: Optional[str] = None, min_rating: int = 3,
+                       categories: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """Labelled, weighted examples from historical tickets and ProductivityTracker history
+
+    Label sources, most trusted first:
+    1. The final category/priority logged for the ticket in ticket_actions (weight 1.0)
+    2. Category/priority fields carried by the ticket itself (weight 1.0)
+    3. The AI suggestion in automation_feedback, if its average rating is at least
+       min_rating (weight rating / 5); lower-rated suggestions are not used as labels
+
+    Category labels must be one of categories (the active ruleset's categories; default
+    GIS_CATEGORY_NAMES). Each example is {'ticket', 'category'?, 'priority'?, 'weights': {target: weight}}.
+    """
+    categories = list(categories or GIS_CATEGORY_NAMES)
+    final_labels: Dict[str, Dict[str, str]] = {}
+    feedback: Dict[str, Dict[str, Any]] = {}
+    if db_path and os.path.exists(db_path):
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT ticket_id, category, priority FROM ticket_actions
+            WHERE category IS NOT NULL OR priority IS NOT NULL
+            ORDER BY timestamp, id
+        ''')
+        for ticket_id, category, priority in cursor.fetchall():
+            labels = final_labels.setdefault(str(ticket_id), {})
+            if _label(category, categories):
+                labels['category'] = _label(category, categories)
+            if _label(priority, PRIORITY_LEVELS):
+                labels['priority'] = _label(priority, PRIORITY_LEVELS)
+
+        cursor.execute('''
+            SELECT ticket_id, ai_suggestion, AVG(user_rating) FROM automation_feedback
+            WHERE user_rating IS NOT NULL
+            GROUP BY ticket_id, ai_suggestion
+            ORDER BY MAX(timestamp)
+        ''')
+        for ticket_id, suggestion, rating in cursor.fetchall():
+            # Latest rated suggestion per ticket wins
+            feedback[str(ticket_id)] = {'suggestion': suggestion, 'rating': rating}
+        conn.close()
+
+    examples = []
+    for ticket in tickets:
+        if not ticket_text(ticket):
+            continue
+        ticket_id = str(ticket.get('id', ''))
+        labels = dict(final_labels.get(ticket_id, {}))
+        for field in ('category', 'priority'):
+            allowed = categories if field == 'category' else PRIORITY_LEVELS
+            if field not in labels and _label(ticket.get(field), allowed):
+                labels[field] = _label(ticket.get(field), allowed)
+        weights = dict.fromkeys(labels, 1.0)
+
+        rated = feedback.get(ticket_id)
+        if rated and rated['rating'] >= min_rating:
+            for field, value in _parse_suggestion(rated['suggestion'], categories).items():
+                if field not in labels:
+                    labels[field] = value
+                    weights[field] = rated['rating'] / 5.0
+
+        if labels:
+            examples.append(dict(labels, ticket=ticket, weights=weights))
+    return examples
+
+
+def _parse_suggestion(suggestion: Any, categories: List[str]) -> Dict[str, str]:
+    """Category/priority from a stored AI suggestion (analysis JSON or a bare category name)"""
+    try:
+        parsed = json.loads(suggestion) if suggestion else {}
+    except (TypeError, ValueError):
+        parsed = {'category': suggestion}
+    if not isinstance(parsed, dict):
+        parsed = {'category': parsed}
+    labels = {}
+    if _label(parsed.get('category'), categories):
+        labels['category'] = _label(parsed.get('category'), categories)
+    if _label(parsed.get('priority'), PRIORITY_LEVELS):
+        labels['priority'] = _label(parsed.get('priority'), PRIORITY_LEVELS)
+    return labels
+
+
+class LocalTicketClassifier:
+    """TF-IDF + logistic regression category/priority classifier trained on historical tickets"""
+
+    def __init__(self, vectorizer=None, category_model=None, priority_model=None, metadata: Dict[str, Any] = None):
+        self.vectorizer = vectorizer
+        self.category_model = category_model
+        self.priority_model = priority_model
+        self.metadata = metadata or {}
+        if vectorizer is not None:
+            self._compile()
+
+    def _compile(self):
+        """Precompute per-term idf and model weights so predict avoids sklearn's per-call overhead"""
+        self._analyzer = self.vectorizer.build_analyzer()
+        self._vocabulary = self.vectorizer.vocabulary_
+        self._idf = self.vectorizer.idf_
+        self._heads = {
+            target: (model.classes_, np.ascontiguousarray(model.coef_.T), model.intercept_)
+            for target, model in (('category', self.category_model), ('priority', self.priority_model))
+        }
+
+    @classmethod
+    def train(cls, examples: List[Dict[str, Any]]) -> 'LocalTicketClassifier':
+        """Fit the shared TF-IDF vocabulary and one weighted linear model per target"""
+        if not SKLEARN_AVAILABLE:
+            raise RuntimeError("scikit-learn is required to train the local classifier")
+
+        vectorizer = TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True, min_df=1)
+        vectorizer.fit([ticket_text(example['ticket']) for example in examples])
+
+        models = {}
+        counts = {}
+        for target in ('category', 'priority'):
+            rows = [example for example in examples if example.get(target)]
+            labels = [example[target] for example in rows]
+            if len(set(labels)) < 2:
+                raise ValueError(f"Need examples of at least two {target} values to train, got {sorted(set(labels))}")
+            model = LogisticRegression(max_iter=1000, class_weight='balanced')
+            model.fit(vectorizer.transform([ticket_text(example['ticket']) for example in rows]), labels,
+                      sample_weight=[example['weights'][target] for example in rows])
+            models[target] = model
+            counts[target] = {label: labels.count(label) for label in sorted(set(labels))}
+
+        metadata = {
+            'format_version': MODEL_FORMAT_VERSION,
+            'trained_at': datetime.now().isoformat(),
+            'training_examples': len(examples),
+            'label_counts': counts
+        }
+        return cls(vectorizer, models['category'], models['priority'], metadata)
+
+    def predict(self, ticket_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Most likely category and priority with their probabilities; None for tickets without text"""
+        text = ticket_text(ticket_data)
+        if not text:
+            return None
+
+        # Sublinear, l2-normalized TF-IDF over the terms in the fitted vocabulary (as TfidfVectorizer.transform)
+        counts = Counter(term for term in self._analyzer(text) if term in self._vocabulary)
+        columns = np.fromiter((self._vocabulary[term] for term in counts), dtype=np.int64, count=len(counts))
+        weights = (1.0 + np.log(np.fromiter(counts.values(), dtype=np.float64, count=len(counts)))) * self._idf[columns]
+        norm = np.sqrt(weights @ weights)
+        if norm:
+            weights /= norm
+
+        prediction = {}
+        for target, (classes, coefficients, intercept) in self._heads.items():
+            probabilities = self._probabilities(weights @ coefficients[columns] + intercept)
+            best = int(probabilities.argmax())
+            prediction[target] = str(classes[best])
+            prediction[f'{target}_confidence'] = float(probabilities[best])
+        return prediction
+
+    @staticmethod
+    def _probabilities(decision):
+        """LogisticRegression.predict_proba from decision values (sigmoid for binary, softmax otherwise)"""
+        if len(decision) == 1:
+            positive = 1.0 / (1.0 + np.exp(-decision[0]))
+            return np.array([1.0 - positive, positive])
+        exp = np.exp(decision - decision.max())
+        return exp / exp.sum()
+
+    def save(self, path: str):
+        """Persist the fitted models and metadata"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        joblib.dump({
+            'metadata': self.metadata,
+            'vectorizer': self.vectorizer,
+            'category_model': self.category_model,
+            'priority_model': self.priority_model
+        }, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'LocalTicketClassifier':
+        """Load a classifier saved by save()"""
+        if not SKLEARN_AVAILABLE:
+            raise RuntimeError("scikit-learn is required to load the local classifier")
+        payload = joblib.load(path)
+        if payload.get('metadata', {}).get('format_version') != MODEL_FORMAT_VERSION:
+            raise ValueError(f"Unsupported local classifier format in {path}")
+        return cls(payload['vectorizer'], payload['category_model'], payload['priority_model'], payload['metadata'])
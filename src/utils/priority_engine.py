@@ -0,0 +1,65 @@
+
+import re
+from typing import Dict, Iterable, List, Tuple
+
+from .keyword_matcher import _build_trie_pattern
+
+# Inflections accepted after a keyword ("errors", "urgently")
+_SUFFIXES = ('s', 'ly')
+
+
+class PriorityEngine:
+    """Priority keyword engine compiled once into a single word-boundary-aware alternation regex
+
+    Keywords only match as whole words or phrases ("down" does not fire inside "download"),
+    phrase words may be separated by any whitespace, and a trailing "s" or "ly" is accepted
+    ("errors" is evidence for "error", "urgently" for "urgent").
+    """
+
+    def __init__(self, keyword_groups: Dict[str, List[str]], group_order: Iterable[str] = ('high', 'low')):
+        self.group_order = tuple(group_order)
+        self._keyword_groups: Dict[str, Tuple[str, ...]] = {}
+        for group, keywords in keyword_groups.items():
+            for keyword in keywords:
+                normalized = ' '.join(keyword.lower().split())
+                if normalized and group not in self._keyword_groups.get(normalized, ()):
+                    self._keyword_groups[normalized] = self._keyword_groups.get(normalized, ()) + (group,)
+
+        # Trie-shaped alternation over the lower-cased text: shared prefixes are tried once and the
+        # longest keyword at a position wins; phrase words may be separated by any whitespace
+        alternation = _build_trie_pattern(self._keyword_groups).replace(re.escape(' '), r'\s+')
+        suffixes = '|'.join(_SUFFIXES)
+        self._pattern = re.compile(rf'\b(?:{alternation})(?:{suffixes})?\b') if alternation else None
+
+    def _keyword_of(self, matched: str) -> str:
+        """Canonical keyword for a matched span (whitespace collapsed, accepted suffix removed)"""
+        normalized = ' '.join(matched.split())
+        if normalized not in self._keyword_groups:
+            for suffix in _SUFFIXES:
+                if normalized.endswith(suffix) and normalized[:-len(suffix)] in self._keyword_groups:
+                    return normalized[:-len(suffix)]
+        return normalized
+
+    def evidence(self, *texts: str) -> Dict[str, List[str]]:
+        """Matched keywords per group, in order of first appearance across texts"""
+        found: Dict[str, List[str]] = {}
+        if not self._pattern:
+            return found
+        for text in texts:
+            if not text:
+                continue
+            for matched in self._pattern.findall(text.lower()):
+                keyword = self._keyword_of(matched)
+                for group in self._keyword_groups[keyword]:
+                    terms = found.setdefault(group, [])
+                    if keyword not in terms:
+                        terms.append(keyword)
+        return found
+
+    def classify(self, *texts: str, default: str = 'medium') -> Tuple[str, List[str]]:
+        """First group in group_order with evidence (or default), plus that group's evidence terms"""
+        found = self.evidence(*texts)
+        for group in self.group_order:
+            if group in found:
+                return group, found[group]
+        return default, []
@@ -0,0 +1,107 @@
+
+import io
+import json
+import tarfile
+import time
+import zipfile
+from typing import Any, Dict, Iterator
+
+from .prompt_store import PromptStore
+
+# Archive formats and their MIME types
+ARCHIVE_FORMATS = {
+    'tar': 'application/x-tar',
+    'tar.gz': 'application/gzip',
+    'zip': 'application/zip'
+}
+
+
+class _ChunkSink:
+    """Write-only file object that collects what an archive writer produces until it is drained"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data: bytes) -> int:
+        if data:
+            self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        """Everything written since the last drain"""
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_prompt_archive(store: PromptStore, archive_format: str = 'tar', page_size: int = 200,
+                          **filters: Any) -> Iterator[bytes]:
+    """Yield a tar, tar.gz or zip archive of the exports matching filters, built as it is sent
+
+    Exports are read from the catalog a page at a time and written one by one as <name>
+    members holding the JSON document, so tar memory stays flat however many exports
+    the archive holds (zip keeps its small central directory entry per export until the end).
+    Filters are those of PromptStore.page.
+    """
+    if archive_format not in ARCHIVE_FORMATS:
+        raise ValueError(f"Unknown archive format '{archive_format}' (use tar, tar.gz or zip)")
+    # Validate the filters before the first byte is sent
+    store.page(limit=1, **filters)
+    return _generate(store, archive_format, page_size, filters)
+
+
+def _generate(store: PromptStore, archive_format: str, page_size: int, filters: Dict[str, Any]) -> Iterator[bytes]:
+    """Archive bytes, one drained chunk per export"""
+    sink = _ChunkSink()
+    if archive_format == 'zip':
+        # An unseekable sink makes zipfile write data descriptors instead of seeking back
+        archive = zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED)
+    else:
+        archive = tarfile.open(fileobj=sink, mode='w|gz' if archive_format == 'tar.gz' else 'w|')
+
+    def add(name: str, data: bytes, mtime: float):
+        if archive_format == 'zip':
+            archive.writestr(zipfile.ZipInfo(name, time.localtime(mtime)[:6]), data,
+                             compress_type=zipfile.ZIP_DEFLATED)
+        else:
+            _add_tar_member(archive, name, data, mtime)
+
+    cursor = None
+    while True:
+        entries, cursor = store.page(limit=page_size, cursor=cursor, **filters)
+        for entry in entries:
+            document = store.get(entry['name'])
+            if document is None:
+                continue
+            # Compact JSON (as /api/prompts/<name> serves it) keeps serialization on the C encoder
+            data = json.dumps(document, ensure_ascii=False).encode('utf-8')
+            add(entry['name'], data, _entry_mtime(entry))
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+        if cursor is None:
+            break
+    archive.close()
+    yield sink.drain()
+
+
+def _add_tar_member(archive: tarfile.TarFile, name: str, data: bytes, mtime: float):
+    """Append one file to a streaming tar archive"""
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = mtime
+    info.mode = 0o644
+    archive.addfile(info, io.BytesIO(data))
+    # A streamed tar needs no member list; dropping it keeps memory flat for any number of exports
+    archive.members.clear()
+
+
+def _entry_mtime(entry: Dict[str, Any]) -> float:
+    """Member modification time from the export timestamp (now if it cannot be parsed)"""
+    try:
+        return time.mktime(time.strptime(entry.get('timestamp') or '', '%Y%m%d_%H%M%S'))
+    except ValueError:
+        return time.time()
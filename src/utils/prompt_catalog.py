@@ -0,0 +1,213 @@
+
+import base64
+import json
+import os
+import re
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Listing metadata kept for every export, next to its size and location in the segments
+CATALOG_FIELDS = ('ticket_id', 'ticket_number', 'timestamp', 'analysis_type')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS prompts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE,
+    ticket_id,
+    ticket_number,
+    timestamp TEXT,
+    analysis_type TEXT,
+    size INTEGER,
+    encoding TEXT,
+    segment TEXT,
+    offset INTEGER,
+    length INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_prompts_time ON prompts (timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_prompts_ticket_id ON prompts (ticket_id, timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_prompts_ticket_number ON prompts (ticket_number, timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_prompts_analysis_type ON prompts (analysis_type, timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_prompts_segment ON prompts (segment, offset);
+CREATE TABLE IF NOT EXISTS segments (
+    segment TEXT PRIMARY KEY,
+    indexed_end INTEGER NOT NULL
+);
+"""
+
+_COLUMNS = ('name',) + CATALOG_FIELDS + ('size', 'encoding', 'segment', 'offset', 'length')
+
+
+class PromptCatalog:
+    """SQLite catalog of prompt exports: listing metadata, size, encoding and segment location per export
+
+    Pages are read newest first with a keyset cursor over (timestamp, id), so fetching a page
+    costs the same however many exports exist. The catalog also records how far each segment
+    has been indexed, which the store uses to find records whose catalog write was lost.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = None
+        self._conn_pid = None
+
+    def add(self, entries: Iterable[Dict[str, Any]]):
+        """Record exports (replacing any earlier export with the same name) in one transaction"""
+        rows = [tuple(entry.get(column) for column in _COLUMNS) for entry in entries]
+        # Entries without a timestamp sort last instead of dropping out of cursor comparisons
+        rows = [row[:3] + (row[3] or '',) + row[4:] for row in rows]
+        ends: Dict[str, int] = {}
+        for entry in rows:
+            segment, offset, length = entry[-3:]
+            ends[segment] = max(ends.get(segment, 0), offset + length)
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO prompts ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                    rows)
+                conn.executemany(
+                    "INSERT INTO segments (segment, indexed_end) VALUES (?, ?) "
+                    "ON CONFLICT(segment) DO UPDATE SET indexed_end = MAX(indexed_end, excluded.indexed_end)",
+                    list(ends.items()))
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        """Catalog entry for a name"""
+        with self._lock:
+            row = self._connection().execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM prompts WHERE name = ?", (name,)).fetchone()
+        return dict(zip(_COLUMNS, row)) if row else None
+
+    def page(self, limit: int = 50, cursor: Optional[str] = None, **filters) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """One page of entries, newest first, and the cursor of the next page (None on the last page)
+
+        Filters: ticket (ticket id or number, or a list of them), since/until (dates or timestamps, inclusive) and analysis_type.
+        """
+        where, params = self._where(filters)
+        if cursor:
+            timestamp, row_id = _decode_cursor(cursor)
+            where.append("(timestamp < ? OR (timestamp = ? AND id < ?))")
+            params += [timestamp, timestamp, row_id]
+        sql = f"SELECT id, {', '.join(_COLUMNS)} FROM prompts"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+        with self._lock:
+            rows = self._connection().execute(sql, params + [limit + 1]).fetchall()
+        next_cursor = _encode_cursor(rows[limit - 1][4], rows[limit - 1][0]) if len(rows) > limit else None
+        return [dict(zip(_COLUMNS, row[1:])) for row in rows[:limit]], next_cursor
+
+    def count(self, **filters) -> int:
+        """Number of entries matching the page() filters"""
+        where, params = self._where(filters)
+        sql = "SELECT COUNT(*) FROM prompts" + (" WHERE " + " AND ".join(where) if where else "")
+        with self._lock:
+            return self._connection().execute(sql, params).fetchone()[0]
+
+    def segment_ends(self) -> Dict[str, int]:
+        """Byte offset up to which each segment's records are catalogued"""
+        with self._lock:
+            return dict(self._connection().execute("SELECT segment, indexed_end FROM segments").fetchall())
+
+    def entries_in_segments(self, segments: List[str]) -> List[Dict[str, Any]]:
+        """Entries stored in the given segments, in segment and offset order"""
+        marks = ', '.join('?' * len(segments))
+        with self._lock:
+            rows = self._connection().execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM prompts WHERE segment IN ({marks}) ORDER BY segment, offset",
+                segments).fetchall()
+        return [dict(zip(_COLUMNS, row)) for row in rows]
+
+    def relocate(self, relocations: List[Tuple], segment: str, indexed_end: int):
+        """Point entries at their copy in a new segment, in one transaction
+
+        relocations holds (segment, offset, length, encoding, name, old segment, old offset) tuples; an
+        entry rewritten elsewhere in the meantime no longer matches its old location and is left alone.
+        """
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    "UPDATE prompts SET segment = ?, offset = ?, length = ?, encoding = ? "
+                    "WHERE name = ? AND segment = ? AND offset = ?", relocations)
+                conn.execute("INSERT OR REPLACE INTO segments (segment, indexed_end) VALUES (?, ?)",
+                             (segment, indexed_end))
+
+    def remove_segments(self, segments: List[str]):
+        """Forget the entries stored in the given segments"""
+        marks = ', '.join('?' * len(segments))
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute(f"DELETE FROM prompts WHERE segment IN ({marks})", segments)
+                conn.execute(f"DELETE FROM segments WHERE segment IN ({marks})", segments)
+
+    def close(self):
+        """Close this process's connection"""
+        with self._lock:
+            if self._conn is not None and self._conn_pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+    def _connection(self) -> sqlite3.Connection:
+        """Connection for this process, opened on first use (and again in a forked child)"""
+        if self._conn is None or self._conn_pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            # WAL lets other processes list exports while one is writing
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            # Catalogs created before records could be compressed lack the encoding column
+            if 'encoding' not in [row[1] for row in conn.execute("PRAGMA table_info(prompts)")]:
+                conn.execute("ALTER TABLE prompts ADD COLUMN encoding TEXT")
+            self._conn, self._conn_pid = conn, os.getpid()
+        return self._conn
+
+    @staticmethod
+    def _where(filters: Dict[str, Any]) -> Tuple[List[str], List[Any]]:
+        """SQL conditions and parameters for the listing filters"""
+        where, params = [], []
+        tickets = filters.get('ticket')
+        tickets = [tickets] if isinstance(tickets, (str, int)) else tickets or []
+        values = []
+        for ticket in (str(ticket) for ticket in tickets if ticket not in (None, '')):
+            values += [ticket, int(ticket)] if ticket.isdigit() else [ticket]
+        if values:
+            marks = ', '.join('?' * len(values))
+            where.append(f"(ticket_id IN ({marks}) OR ticket_number IN ({marks}))")
+            params += values + values
+        if filters.get('since'):
+            where.append("timestamp >= ?")
+            params.append(normalize_timestamp(filters['since']))
+        if filters.get('until'):
+            where.append("timestamp <= ?")
+            params.append(normalize_timestamp(filters['until'], end_of_day=True))
+        if filters.get('analysis_type'):
+            where.append("analysis_type = ?")
+            params.append(filters['analysis_type'])
+        return where, params
+
+
+def normalize_timestamp(value: str, end_of_day: bool = False) -> str:
+    """Export timestamp form (YYYYMMDD_HHMMSS) of a date or datetime string; raises ValueError if unrecognised"""
+    digits = re.sub(r'\D', '', value)
+    if len(digits) == 8:
+        return f"{digits}_235959" if end_of_day else f"{digits}_000000"
+    if len(digits) >= 14:
+        return f"{digits[:8]}_{digits[8:14]}"
+    raise ValueError(f"Unrecognised date '{value}' (use YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS)")
+
+
+def _encode_cursor(timestamp: str, row_id: int) -> str:
+    """Opaque cursor pointing just past an entry"""
+    return base64.urlsafe_b64encode(json.dumps([timestamp, row_id]).encode('utf-8')).decode('ascii')
+
+
+def _decode_cursor(cursor: str) -> Tuple[str, int]:
+    """(timestamp, id) of a cursor; raises ValueError if it is malformed"""
+    try:
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return timestamp, int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
@@ -0,0 +1,137 @@
+
+import contextlib
+import os
+import threading
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+from .prompt_store import PromptStore
+
+# Cross-process lock so only one process applies retention to a store at a time (POSIX only)
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+RETENTION_LOCK_FILE = 'retention.lock'
+
+
+def apply_retention(store: PromptStore, max_age_days: int = 0, max_total_bytes: int = 0,
+                    compact: bool = False) -> Dict[str, Any]:
+    """Evict and compact closed prompt export segments; returns counters of what was done
+
+    In order: segments from days older than max_age_days are deleted, closed past days are
+    compacted into one gzip segment each (if compact is set), then the oldest closed segments are
+    deleted until all segments fit in max_total_bytes. Zero disables a limit. Only closed
+    segments are touched, so the current day's active segments can stay above the size cap.
+    """
+    stats = {'evicted_segments': 0, 'evicted_bytes': 0, 'compacted_days': 0, 'compacted_bytes_saved': 0,
+             'skipped': False}
+    with _exclusive(store) as acquired:
+        if not acquired:
+            stats['skipped'] = True  # Another process is applying retention to this store
+            return stats
+
+        if max_age_days > 0:
+            cutoff = date.today() - timedelta(days=max_age_days)
+            expired = [info for info in store.segments() if info['closed'] and info['day'] < cutoff]
+            _evict(store, expired, stats)
+
+        if compact:
+            days = sorted({info['day'] for info in store.segments() if info['closed'] and info['day'] < date.today()})
+            for day in days:
+                result = store.compact_day(day)
+                if result:
+                    stats['compacted_days'] += 1
+                    stats['compacted_bytes_saved'] += result['bytes_before'] - result['bytes_after']
+
+        if max_total_bytes > 0:
+            segments = store.segments()
+            excess = sum(info['size'] for info in segments) - max_total_bytes
+            oldest = []
+            for info in segments:
+                if excess <= 0:
+                    break
+                if info['closed']:
+                    oldest.append(info)
+                    excess -= info['size']
+            _evict(store, oldest, stats)
+    return stats
+
+
+def _evict(store: PromptStore, segments, stats: Dict[str, Any]):
+    """Delete segments and count them"""
+    if segments:
+        stats['evicted_bytes'] += store.remove_segments([info['segment'] for info in segments])
+        stats['evicted_segments'] += len(segments)
+
+
+@contextlib.contextmanager
+def _exclusive(store: PromptStore):
+    """Hold the store's retention lock if no other process does; yields whether it was acquired"""
+    if fcntl is None:
+        yield True
+        return
+    with open(os.path.join(store.root, RETENTION_LOCK_FILE), 'a') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class PromptRetentionWorker:
+    """Background thread applying the retention policy to a prompt store every interval seconds"""
+
+    def __init__(self, store_provider: Callable[[], PromptStore], interval: float = 3600, max_age_days: int = 0,
+                 max_total_bytes: int = 0, compact: bool = False):
+        self.store_provider = store_provider
+        self.interval = interval
+        self.max_age_days = max_age_days
+        self.max_total_bytes = max_total_bytes
+        self.compact = compact
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {'runs': 0, 'failures': 0, 'evicted_segments': 0, 'evicted_bytes': 0, 'compacted_days': 0,
+                       'last_run': None, 'last_error': None}
+
+    def start(self):
+        """Start the worker thread (first run after one interval)"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='prompt-retention', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the worker thread"""
+        self._stop.set()
+
+    def run_once(self) -> Dict[str, Any]:
+        """Apply the policy now"""
+        try:
+            result = apply_retention(self.store_provider(), self.max_age_days, self.max_total_bytes, self.compact)
+        except Exception as e:
+            self._stats['failures'] += 1
+            self._stats['last_error'] = str(e)
+            print(f"⚠️  Prompt export retention failed: {e}")
+            return {}
+        self._stats['runs'] += 1
+        self._stats['last_error'] = None
+        self._stats['last_run'] = datetime.now().isoformat()
+        for key in ('evicted_segments', 'evicted_bytes', 'compacted_days'):
+            self._stats[key] += result[key]
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Policy and totals of the runs so far"""
+        return dict(self._stats, interval=self.interval, max_age_days=self.max_age_days,
+                    max_total_bytes=self.max_total_bytes, compact=self.compact)
+
+    def _run(self):
+        """Worker loop"""
+        while not self._stop.wait(self.interval):
+            self.run_once()
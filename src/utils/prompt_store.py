@@ -0,0 +1,497 @@
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .prompt_catalog import CATALOG_FIELDS, PromptCatalog
+
+# zstd frames are optional; gzip (standard library) is always available
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+# Segments are sharded by the day they were opened: segments/YYYY/MM/DD/<segment>
+SEGMENTS_DIR = 'segments'
+SECTIONS_DIR = 'sections'
+CATALOG_FILE = 'catalog.db'
+# Offset index used before the SQLite catalog; imported into the catalog when a store opens
+LEGACY_INDEX_FILE = 'index.jsonl'
+
+# Export sections that are identical across exports; stored once by content hash and referenced from records
+SHARED_SECTIONS = ('system_prompt', 'processing_notes', 'suggested_models', 'usage_instructions')
+
+# Record encodings and the segment file suffix of each; a segment holds records of one encoding
+SEGMENT_SUFFIXES = {'none': '.jsonl', 'gzip': '.jsonl.gz', 'zstd': '.jsonl.zst'}
+DEFAULT_COMPRESSION_LEVELS = {'none': 0, 'gzip': 6, 'zstd': 3}
+
+# An encoded record: (name, catalog fields, stored bytes)
+EncodedRecord = Tuple[str, Dict[str, Any], bytes]
+
+
+def compress_record(line: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    """One record as stored: the JSON line itself, or a self-contained gzip member / zstd frame"""
+    level = DEFAULT_COMPRESSION_LEVELS[encoding] if level is None else level
+    if encoding == 'gzip':
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        return compressor.compress(line) + compressor.flush()
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=level).compress(line)
+    return line
+
+
+def decompress_record(data: bytes, encoding: Optional[str]) -> bytes:
+    """JSON line of one stored record"""
+    if encoding == 'gzip':
+        return zlib.decompress(data, 31)
+    if encoding == 'zstd':
+        return zstandard.ZstdDecompressor().decompress(data)
+    return data
+
+
+def iter_records(data: bytes, encoding: Optional[str]) -> Iterator[Tuple[int, int, bytes]]:
+    """(offset, stored length, JSON line) of each complete record in a run of segment bytes
+
+    Stops at the first incomplete record, e.g. the tail of a segment whose write was cut short.
+    """
+    offset = 0
+    while offset < len(data):
+        if encoding in ('gzip', 'zstd'):
+            decompressor = zlib.decompressobj(31) if encoding == 'gzip' \
+                else zstandard.ZstdDecompressor().decompressobj()
+            try:
+                line = decompressor.decompress(data[offset:])
+            except (zlib.error, getattr(zstandard, 'ZstdError', zlib.error)):
+                return
+            if not decompressor.eof:
+                return
+            length = len(data) - offset - len(decompressor.unused_data)
+        else:
+            end = data.find(b'\n', offset)
+            if end < 0:
+                return
+            length = end + 1 - offset
+            line = data[offset:offset + length]
+        yield offset, length, line
+        offset += length
+
+
+def _segment_opened_at(filename: str) -> Optional[datetime]:
+    """When a segment_<timestamp>_<pid> file was opened (None for other names)"""
+    match = re.match(r'segment_(\d{8}T\d{12})_', filename)
+    return datetime.strptime(match.group(1), '%Y%m%dT%H%M%S%f') if match else None
+
+
+def _segment_day(segment: str, opened: Optional[datetime], mtime: float) -> date:
+    """Day shard of a segment path (pre-sharding segments: the day they were opened, else modified)"""
+    parts = segment.split('/')
+    if len(parts) == 4:
+        try:
+            return date(int(parts[0]), int(parts[1]), int(parts[2]))
+        except ValueError:
+            pass
+    return opened.date() if opened else date.fromtimestamp(mtime)
+
+
+def segment_encoding(segment: str) -> str:
+    """Record encoding of a segment file, from its suffix"""
+    for encoding, suffix in sorted(SEGMENT_SUFFIXES.items(), key=lambda item: -len(item[1])):
+        if segment.endswith(suffix):
+            return encoding
+    return 'none'
+
+
+class PromptStore:
+    """Append-only prompt export store: JSONL segments plus a SQLite catalog
+
+    Each export is one JSON line in a segment file under segments/, and a row in catalog.db
+    (see PromptCatalog) records its name, listing metadata, size and segment location. Every
+    process appends to its own segment, rotated once it reaches max_segment_bytes or
+    max_segment_age seconds, so the directory holds a handful of segments instead of one file
+    per export. The catalog is shared, so exports written by other processes are visible
+    immediately. A name written twice resolves to its latest record.
+
+    The SHARED_SECTIONS of an export (system prompt, notes, instructions) are the same for every
+    export, so a record holds only their content hash; each distinct section is written once to
+    sections/<hash>.json and put back in place when the export is read.
+
+    With compression 'gzip' or 'zstd' each record is stored as its own gzip member or zstd frame,
+    so it can still be read on its own by offset, and a whole segment is a valid .gz/.zst file.
+
+    Segments live in per-day directories and rotate at midnight, so a past day's segments are
+    closed for good; retention (utils/prompt_retention.py) evicts or compacts only closed segments.
+    """
+
+    def __init__(self, root: str, max_segment_bytes: int = 64 * 1024 * 1024, max_segment_age: float = 3600,
+                 compression: str = 'none', compression_level: Optional[int] = None):
+        if compression not in SEGMENT_SUFFIXES:
+            raise ValueError(f"Unknown prompt export compression '{compression}' (use none, gzip or zstd)")
+        if compression == 'zstd' and not ZSTD_AVAILABLE:
+            print("⚠️  zstandard is not installed; prompt exports will use gzip")
+            compression = 'gzip'
+        self.root = root
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_age = max_segment_age
+        self.compression = compression
+        self.compression_level = compression_level
+        self.segments_dir = os.path.join(root, SEGMENTS_DIR)
+        self.sections_dir = os.path.join(root, SECTIONS_DIR)
+        os.makedirs(self.segments_dir, exist_ok=True)
+        os.makedirs(self.sections_dir, exist_ok=True)
+        self.catalog = PromptCatalog(os.path.join(root, CATALOG_FILE))
+
+        self._lock = threading.RLock()
+        self._sections: Dict[str, bytes] = {}
+        self._segment = None
+        self._segment_name = None
+        self._segment_size = 0
+        self._segment_opened = 0.0
+        self._segment_day = None
+        self._segment_pid = None
+        self._import_legacy_index()
+        self._recover_unindexed()
+
+    def encode(self, name: str, document: Dict[str, Any]) -> EncodedRecord:
+        """Serialize (and compress) one export for append_encoded, storing any new shared section
+
+        Safe to call outside the store lock, so the export writer encodes without blocking readers.
+        """
+        metadata = document.get('metadata', {})
+        document = dict(document)
+        shared = [key for key in SHARED_SECTIONS if key in document]
+        for key in shared:
+            document[key] = self._store_section(document[key])
+        line = json.dumps({'name': name, 'document': document, 'sections': shared},
+                          ensure_ascii=False).encode('utf-8') + b'\n'
+        fields = {field: metadata.get(field) for field in CATALOG_FIELDS}
+        fields.update(size=len(line), encoding=self.compression)
+        return name, fields, compress_record(line, self.compression, self.compression_level)
+
+    def append(self, name: str, document: Dict[str, Any]):
+        """Append one export"""
+        self.append_encoded([self.encode(name, document)])
+
+    def append_encoded(self, records: Iterable[EncodedRecord]):
+        """Append encoded exports to this process's segment, then catalog them in one transaction"""
+        with self._lock:
+            entries = []
+            for name, fields, data in records:
+                self._rotate_if_needed(len(data), fields['encoding'])
+                offset = self._segment_size
+                self._segment.write(data)
+                self._segment_size += len(data)
+                entries.append(dict(fields, name=name, segment=self._segment_name, offset=offset, length=len(data)))
+            if not entries:
+                return
+            # Segment bytes reach the file before the catalog points at them
+            self._segment.flush()
+            self.catalog.add(entries)
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        """Export document by name, or None if the store has no such export"""
+        entry = self.entry(name)
+        if entry is None:
+            return None
+        try:
+            data = self._read(entry)
+        except FileNotFoundError:
+            # Compacted or evicted between the catalog lookup and the read; look it up again
+            entry = self.entry(name)
+            if entry is None:
+                return None
+            data = self._read(entry)
+        record = json.loads(decompress_record(data, entry['encoding']))
+        document = record['document']
+        for key in record.get('sections', ()):
+            document[key] = self._load_section(document[key])
+        return document
+
+    def _read(self, entry: Dict[str, Any]) -> bytes:
+        """Stored bytes of a catalog entry"""
+        with open(os.path.join(self.segments_dir, entry['segment']), 'rb') as f:
+            f.seek(entry['offset'])
+            return f.read(entry['length'])
+
+    def entry(self, name: str) -> Optional[Dict[str, Any]]:
+        """Catalog entry (metadata, size and location) for a name"""
+        return self.catalog.get(name)
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """Catalog entries of every export, newest first"""
+        entries, cursor = [], None
+        while True:
+            page, cursor = self.catalog.page(limit=1000, cursor=cursor)
+            entries += page
+            if cursor is None:
+                return entries
+
+    def page(self, limit: int = 50, cursor: Optional[str] = None, **filters) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """One page of catalog entries, newest first, and the next page's cursor (see PromptCatalog.page)"""
+        return self.catalog.page(limit, cursor, **filters)
+
+    def count(self, **filters) -> int:
+        """Number of exports matching the page() filters"""
+        return self.catalog.count(**filters)
+
+    def __contains__(self, name: str) -> bool:
+        return self.entry(name) is not None
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def segments(self) -> List[Dict[str, Any]]:
+        """Segment files, oldest first: path under segments/, day, size and whether writing to it has ended
+
+        A segment is closed once its day is over or it is older than max_segment_age, after which
+        no process appends to it any more.
+        """
+        today = date.today()
+        now = datetime.now()
+        with self._lock:
+            active = self._segment_name if self._segment and self._segment_pid == os.getpid() else None
+        found = []
+        for directory, _, files in os.walk(self.segments_dir):
+            for filename in files:
+                if segment_encoding(filename) == 'none' and not filename.endswith(SEGMENT_SUFFIXES['none']):
+                    continue  # Temporary files of an unfinished compaction
+                path = os.path.join(directory, filename)
+                segment = os.path.relpath(path, self.segments_dir).replace(os.sep, '/')
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                opened = _segment_opened_at(filename)
+                day = _segment_day(segment, opened, stat.st_mtime)
+                closed = segment != active and (
+                    day < today or opened is None or (now - opened).total_seconds() > self.max_segment_age)
+                found.append({'segment': segment, 'day': day, 'size': stat.st_size, 'closed': closed,
+                              'opened': opened})
+        found.sort(key=lambda info: (info['day'], info['opened'] or datetime.min, info['segment']))
+        return found
+
+    def remove_segments(self, segments: List[str]) -> int:
+        """Delete closed segments and their exports from the catalog; returns the bytes freed"""
+        freed = 0
+        with self._lock:
+            self.catalog.remove_segments(segments)
+            for segment in segments:
+                path = os.path.join(self.segments_dir, segment)
+                try:
+                    freed += os.path.getsize(path)
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        return freed
+
+    def compact_day(self, day: date, level: int = 9) -> Optional[Dict[str, Any]]:
+        """Merge a past day's closed segments into one gzip segment holding only their live exports
+
+        The new segment is written under a temporary name, renamed, and the catalog repointed in one
+        transaction before the old segments are deleted, so an interrupted compaction loses nothing.
+        Returns what was done, or None if the day is already a single compacted segment.
+        """
+        if day >= date.today():
+            raise ValueError(f"Only days before today can be compacted, not {day}")
+        sources = [info for info in self.segments() if info['day'] == day and info['closed']]
+        if not sources or (len(sources) == 1 and os.path.basename(sources[0]['segment']).startswith('compacted_')):
+            return None
+        segment = f"{day:%Y/%m/%d}/compacted_{day:%Y%m%d}_{os.getpid()}_{time.time_ns()}{SEGMENT_SUFFIXES['gzip']}"
+        path = os.path.join(self.segments_dir, segment)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        relocations = []
+        offset = 0
+        handles = {}
+        try:
+            with open(path + '.tmp', 'wb') as out:
+                for entry in self.catalog.entries_in_segments([info['segment'] for info in sources]):
+                    if entry['segment'] not in handles:
+                        handles[entry['segment']] = open(os.path.join(self.segments_dir, entry['segment']), 'rb')
+                    source = handles[entry['segment']]
+                    source.seek(entry['offset'])
+                    line = decompress_record(source.read(entry['length']), entry['encoding'])
+                    data = compress_record(line, 'gzip', level)
+                    out.write(data)
+                    relocations.append((segment, offset, len(data), 'gzip', entry['name'], entry['segment'], entry['offset']))
+                    offset += len(data)
+                out.flush()
+                os.fsync(out.fileno())
+        finally:
+            for handle in handles.values():
+                handle.close()
+        if relocations:
+            os.replace(path + '.tmp', path)
+            self.catalog.relocate(relocations, segment, offset)
+        else:
+            os.remove(path + '.tmp')
+        before = sum(info['size'] for info in sources)
+        self.remove_segments([info['segment'] for info in sources])
+        return {'day': day.isoformat(), 'segments': len(sources), 'exports': len(relocations),
+                'bytes_before': before, 'bytes_after': offset}
+
+    def close(self):
+        """Close the active segment and catalog connection; the next append starts a new segment"""
+        with self._lock:
+            if self._segment:
+                self._segment.close()
+                self._segment = None
+            self.catalog.close()
+
+    def _store_section(self, value: Any) -> str:
+        """Content hash of a shared section, writing the section file the first time the hash is seen"""
+        data = json.dumps(value, ensure_ascii=False).encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        if digest in self._sections:
+            return digest
+        path = os.path.join(self.sections_dir, f'{digest}.json')
+        if not os.path.exists(path):
+            # Written under a temporary name and renamed, so readers never see a partial section
+            temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        self._sections[digest] = data
+        return digest
+
+    def _load_section(self, digest: str) -> Any:
+        """Shared section content by hash"""
+        if digest not in self._sections:
+            with open(os.path.join(self.sections_dir, f'{digest}.json'), 'rb') as f:
+                self._sections[digest] = f.read()
+        return json.loads(self._sections[digest])
+
+    def _rotate_if_needed(self, incoming: int, encoding: str):
+        """Open a new segment when there is none, the current one is too large, too old, from an earlier
+        day or of another encoding, or it was opened before a fork"""
+        now = datetime.now()
+        if self._segment and self._segment_pid == os.getpid() \
+                and self._segment_day == now.date() \
+                and segment_encoding(self._segment_name) == encoding \
+                and self._segment_size + incoming <= self.max_segment_bytes \
+                and time.monotonic() - self._segment_opened < self.max_segment_age:
+            return
+        if self._segment and self._segment_pid == os.getpid():
+            self._segment.close()
+        # Timestamp and pid keep names unique and sortable across processes
+        self._segment_name = (f"{now:%Y/%m/%d}/segment_{now:%Y%m%dT%H%M%S%f}_{os.getpid()}"
+                              f"{SEGMENT_SUFFIXES[encoding]}")
+        path = os.path.join(self.segments_dir, self._segment_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._segment = open(path, 'ab')
+        self._segment_day = now.date()
+        # Normally 0; a name reused within the same microsecond appends after what is already there
+        self._segment_size = self._segment.tell()
+        self._segment_opened = time.monotonic()
+        self._segment_pid = os.getpid()
+
+    def _import_legacy_index(self):
+        """Move the entries of a pre-catalog index.jsonl into the catalog"""
+        path = os.path.join(self.root, LEGACY_INDEX_FILE)
+        if not os.path.exists(path):
+            return
+        entries = {}
+        with open(path, 'rb') as f:
+            for line in f:
+                if line.endswith(b'\n'):
+                    entry = json.loads(line)
+                    entries[entry['name']] = dict(entry, size=entry.get('size', entry['length']), encoding='none')
+        self.catalog.add(entries.values())
+        try:
+            os.replace(path, path + '.imported')
+        except FileNotFoundError:
+            pass  # Another process imported it first
+
+    def _recover_unindexed(self):
+        """Catalog records written to a segment whose catalog write was lost (e.g. the process died in between)"""
+        indexed_end = self.catalog.segment_ends()
+        recovered = []
+        for info in self.segments():
+            segment = info['segment']
+            path = os.path.join(self.segments_dir, segment)
+            start = indexed_end.get(segment, 0)
+            if os.path.getsize(path) <= start:
+                continue
+            encoding = segment_encoding(segment)
+            if encoding == 'zstd' and not ZSTD_AVAILABLE:
+                print(f"⚠️  Cannot recover {segment}: zstandard is not installed")
+                continue
+            with open(path, 'rb') as f:
+                f.seek(start)
+                tail = f.read()
+            for offset, length, line in iter_records(tail, encoding):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                metadata = record['document'].get('metadata', {})
+                recovered.append(dict({field: metadata.get(field) for field in CATALOG_FIELDS},
+                                      name=record['name'], size=len(line), encoding=encoding,
+                                      segment=segment, offset=start + offset, length=length))
+        if recovered:
+            self.catalog.add(recovered)
+
+
+def migrate_legacy_exports(store: PromptStore, source: str, delete: bool = False,
+                           batch_size: int = 500) -> Tuple[int, int]:
+    """Import one-file-per-export *_prompt.json files from source into store
+
+    Files are appended in batches under their filename; names already in the store are skipped,
+    so an interrupted migration can simply be run again. With delete=True each imported (or
+    already present) file is removed once its batch is stored. Returns (imported, skipped).
+    """
+    imported = skipped = 0
+    batch: List[EncodedRecord] = []
+    batch_paths: List[str] = []
+
+    def store_batch():
+        store.append_encoded(batch)
+        if delete:
+            for path in batch_paths:
+                os.remove(path)
+        batch.clear()
+        batch_paths.clear()
+
+    with os.scandir(source) as entries:
+        paths = sorted(entry.path for entry in entries if entry.is_file() and entry.name.endswith('_prompt.json'))
+    for path in paths:
+        name = os.path.basename(path)
+        if name in store:
+            skipped += 1
+            if delete:
+                os.remove(path)
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            batch.append(store.encode(name, json.load(f)))
+        batch_paths.append(path)
+        imported += 1
+        if len(batch) >= batch_size:
+            store_batch()
+    store_batch()
+    return imported, skipped
+
+
+_stores: Dict[str, PromptStore] = {}
+_stores_lock = threading.Lock()
+
+
+def open_prompt_store(root: str) -> PromptStore:
+    """Process-wide PromptStore for a directory, opened on first use"""
+    root = os.path.abspath(root)
+    with _stores_lock:
+        if root not in _stores:
+            level = os.getenv('PROMPT_EXPORT_COMPRESSION_LEVEL')
+            _stores[root] = PromptStore(
+                root,
+                max_segment_bytes=int(os.getenv('PROMPT_SEGMENT_MAX_BYTES', str(64 * 1024 * 1024))),
+                max_segment_age=float(os.getenv('PROMPT_SEGMENT_MAX_AGE', '3600')),
+                compression=os.getenv('PROMPT_EXPORT_COMPRESSION', 'none').lower(),
+                compression_level=int(level) if level else None
+            )
+        return _stores[root]
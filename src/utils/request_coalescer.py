@@ -0,0 +1,61 @@
+
+import hashlib
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict
+
+
+class RequestCoalescer:
+    """Single-flight coalescing: concurrent calls with the same key share one in-flight future"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self.stats = {
+            'executed': 0,
+            'coalesced': 0
+        }
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        """Hash the request parts (model, prompts, ...) into a stable coalescing key"""
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(str(part).encode('utf-8'))
+            digest.update(b'\x00')
+        return digest.hexdigest()
+
+    def run(self, key: str, func: Callable[[], Any]) -> Any:
+        """Run func once per key at a time; callers arriving while it is in flight wait for its result"""
+        with self._lock:
+            future = self._inflight.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._inflight[key] = future
+                self.stats['executed'] += 1
+            else:
+                self.stats['coalesced'] += 1
+
+        if not is_leader:
+            return future.result()
+
+        try:
+            result = func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            # Later identical requests start a fresh call once this one has settled
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Snapshot of coalescing counters"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['in_flight'] = len(self._inflight)
+        return stats
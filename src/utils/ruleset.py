@@ -0,0 +1,260 @@
+
+import functools
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from .category_index import CategoryScoringIndex
+from .keyword_matcher import KeywordMatcher
+from .priority_engine import PriorityEngine
+from .structured_output import StructuredOutputParser, analysis_schemas
+
+# Ruleset shipped with the repository (config/gis_ruleset.json)
+DEFAULT_RULESET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'config', 'gis_ruleset.json')
+
+# Top-level sections every ruleset file must define, with their JSON types
+REQUIRED_SECTIONS = {
+    'version': str,
+    'categories': dict,
+    'category_field_tiers': dict,
+    'category_tier_weights': dict,
+    'xml_category_mapping': dict,
+    'xml_priority_values': dict,
+    'rule_priority_keywords': dict,
+    'priority_keywords': dict,
+    'response_templates': dict,
+    'analysis_action_plan': dict,
+    'resolution_times': dict,
+    'required_skills': dict,
+    'action_plans': dict,
+    'ticket_keywords': dict
+}
+
+
+class CompiledRuleset:
+    """Immutable snapshot of a ruleset file with its keyword matchers compiled once at load
+
+    Requests take one snapshot and use it throughout, so a hot reload never changes the rules
+    half-way through an analysis.
+    """
+
+    def __init__(self, data: Dict[str, Any], source: Optional[str] = None, memo_size: int = 1024):
+        _validate(data)
+        self.data = data
+        self.version = data['version']
+        self.source = source
+        self.loaded_at = datetime.now().isoformat()
+
+        # Category keywords scored per ticket field tier
+        self.categories: Dict[str, List[str]] = data['categories']
+        self.field_tiers = list(data['category_field_tiers'].items())
+        self.tier_weights: Dict[str, float] = data['category_tier_weights']
+        self.category_index = CategoryScoringIndex(self.categories, self.tier_weights)
+        # LLM output schema (requested in structured mode and validated locally) allows exactly these categories
+        self.output_parser = StructuredOutputParser(*analysis_schemas(list(self.categories)))
+
+        # XML category/subcategory vocabulary, with a bounded memo of mapped (category, subcategory) pairs
+        self.xml_category_mapping: Dict[str, str] = data['xml_category_mapping']
+        self.xml_priority_values: Dict[str, List[str]] = data['xml_priority_values']
+        self.map_xml_category = functools.lru_cache(maxsize=memo_size)(self.lookup_xml_category)
+
+        # Priority keywords for the rule-based analysis and for determine_priority
+        self.rule_priority_keywords: Dict[str, List[str]] = data['rule_priority_keywords']
+        self.priority_keywords: Dict[str, List[str]] = data['priority_keywords']
+        self.rule_priority_engine = PriorityEngine(self.rule_priority_keywords)
+        self.priority_engine = PriorityEngine(self.priority_keywords)
+
+        # Response text and plans
+        self.response_templates: Dict[str, str] = data['response_templates']
+        self.analysis_action_plan: Dict[str, List[str]] = data['analysis_action_plan']
+        self.resolution_times: Dict[str, str] = data['resolution_times']
+        self.required_skills: Dict[str, List[str]] = data['required_skills']
+        self.action_plans: Dict[str, Any] = data['action_plans']
+
+        # TicketProcessor keyword groups
+        self.ticket_keywords: Dict[str, List[str]] = data['ticket_keywords']
+        self.ticket_keyword_matcher = KeywordMatcher(self.ticket_keywords)
+
+    def lookup_xml_category(self, xml_category: str, xml_subcategory: str) -> Optional[str]:
+        """Uncached XML category/subcategory lookup against the mapping (exact match, then containment)"""
+        category_mapping = self.xml_category_mapping
+        for term_lower in (xml_category, xml_subcategory):
+            if not term_lower:
+                continue
+            if term_lower in category_mapping:
+                return category_mapping[term_lower]
+            for key, gis_cat in category_mapping.items():
+                if key in term_lower or term_lower in key:
+                    return gis_cat
+        return None
+
+    def memo_info(self) -> Dict[str, int]:
+        """Hit/miss counters of the XML category memo"""
+        memo = self.map_xml_category.cache_info()
+        return {'hits': memo.hits, 'misses': memo.misses, 'size': memo.currsize, 'max_size': memo.maxsize}
+
+    def xml_priority(self, value: str) -> Optional[str]:
+        """Priority named by an XML priority/status/state value, if it is a known one"""
+        for priority in ('high', 'low', 'medium'):
+            if value in self.xml_priority_values.get(priority, ()):
+                return priority
+        return None
+
+    def response_template(self, category: str) -> str:
+        """Base response text for a category"""
+        return self.response_templates.get(category, self.response_templates['default'])
+
+    def resolution_time(self, priority: str) -> str:
+        """Estimated resolution time for a priority"""
+        return self.resolution_times.get(priority, self.resolution_times['default'])
+
+    def skills_for(self, category: str) -> List[str]:
+        """Skills needed to work a ticket in category"""
+        return list(self.required_skills.get(category, self.required_skills['default']))
+
+    def analysis_plan(self, priority: str) -> List[str]:
+        """Analysis action plan; high priority inserts the escalation steps after the first step"""
+        plan = list(self.analysis_action_plan['base'])
+        if priority == 'high':
+            plan[1:1] = self.analysis_action_plan['high_priority_steps']
+        return plan
+
+    def ticket_action_plan(self, category: str, priority: str) -> List[str]:
+        """Technician action plan for a ticket: base steps, category steps, then the priority deadline"""
+        plans = self.action_plans
+        deadlines = plans['priority_deadlines']
+        return (list(plans['base']) + list(plans['categories'].get(category, plans['default']))
+                + [deadlines.get(priority, deadlines['default'])])
+
+
+def _validate(data: Dict[str, Any]):
+    """Raise ValueError if a ruleset is missing sections or refers to unknown categories/tiers"""
+    if not isinstance(data, dict):
+        raise ValueError("Ruleset must be a JSON object")
+    for section, expected_type in REQUIRED_SECTIONS.items():
+        if not isinstance(data.get(section), expected_type):
+            raise ValueError(f"Ruleset section '{section}' is missing or not a {expected_type.__name__}")
+
+    categories = data['categories']
+    unknown = sorted({category for category in data['xml_category_mapping'].values() if category not in categories})
+    if unknown:
+        raise ValueError(f"xml_category_mapping refers to unknown categories: {unknown}")
+    unknown = sorted(set(data['category_tier_weights']) - set(data['category_field_tiers']))
+    if unknown:
+        raise ValueError(f"category_tier_weights refers to unknown field tiers: {unknown}")
+    for section in ('response_templates', 'resolution_times', 'required_skills'):
+        if 'default' not in data[section]:
+            raise ValueError(f"Ruleset section '{section}' needs a 'default' entry")
+    for key in ('base', 'high_priority_steps'):
+        if not isinstance(data['analysis_action_plan'].get(key), list):
+            raise ValueError(f"analysis_action_plan.{key} must be a list")
+    plans = data['action_plans']
+    if not isinstance(plans.get('base'), list) or not isinstance(plans.get('categories'), dict) \
+            or not isinstance(plans.get('default'), list) or 'default' not in plans.get('priority_deadlines', {}):
+        raise ValueError("action_plans needs base, categories, default and priority_deadlines.default")
+
+
+def load_ruleset(path: str, memo_size: int = 1024) -> CompiledRuleset:
+    """Read, validate and compile a ruleset file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return CompiledRuleset(data, source=path, memo_size=memo_size)
+
+
+class RulesetManager:
+    """Holds the active compiled ruleset and hot-swaps it when the ruleset file changes
+
+    current() checks the file's modification stamp at most once per reload_interval seconds.
+    A changed file is compiled off to the side and swapped in with a single reference
+    assignment; a file that fails to load or validate is reported and the previous ruleset
+    stays active. A negative reload_interval disables hot reloading.
+    """
+
+    def __init__(self, path: Optional[str] = None, reload_interval: Optional[float] = None,
+                 memo_size: Optional[int] = None):
+        self.path = path or os.getenv('RULESET_PATH') or DEFAULT_RULESET_PATH
+        self.reload_interval = float(os.getenv('RULESET_RELOAD_INTERVAL', '2')) \
+            if reload_interval is None else reload_interval
+        self.memo_size = int(os.getenv('XML_CATEGORY_MEMO_SIZE', '1024')) if memo_size is None else memo_size
+
+        self._lock = threading.Lock()
+        self._stats = {'reloads': 0, 'reload_failures': 0, 'last_error': None}
+        self._file_stamp = self._stamp()
+        # The initial load has no previous ruleset to fall back to, so errors propagate
+        self._ruleset = load_ruleset(self.path, self.memo_size)
+        self._next_check = time.monotonic() + max(self.reload_interval, 0)
+
+    def current(self) -> CompiledRuleset:
+        """Active ruleset, reloading first if the file changed since the last check"""
+        if self.reload_interval >= 0 and time.monotonic() >= self._next_check:
+            self._check_for_changes()
+        return self._ruleset
+
+    def reload(self) -> bool:
+        """Recompile the ruleset file now; False (previous ruleset kept) if it fails to load"""
+        with self._lock:
+            return self._reload()
+
+    def swap(self, ruleset: CompiledRuleset):
+        """Make an already compiled ruleset the active one"""
+        self._ruleset = ruleset
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Active ruleset version and reload counters"""
+        ruleset = self._ruleset
+        return dict(self._stats, version=ruleset.version, source=ruleset.source, loaded_at=ruleset.loaded_at)
+
+    def _check_for_changes(self):
+        """Reload if the file's modification stamp changed (one thread checks, the others keep serving)"""
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._next_check = time.monotonic() + self.reload_interval
+            if self._stamp() != self._file_stamp:
+                self._reload()
+        finally:
+            self._lock.release()
+
+    def _reload(self) -> bool:
+        """Compile the file and swap it in; caller holds the lock"""
+        # Stamp before reading so a write landing during the load is picked up by the next check
+        self._file_stamp = self._stamp()
+        try:
+            ruleset = load_ruleset(self.path, self.memo_size)
+        except Exception as e:
+            self._stats['reload_failures'] += 1
+            self._stats['last_error'] = str(e)
+            print(f"⚠️  Ruleset reload from {self.path} failed, keeping version {self._ruleset.version}: {e}")
+            return False
+        self.swap(ruleset)
+        self._stats['reloads'] += 1
+        self._stats['last_error'] = None
+        print(f"🔄 Ruleset {ruleset.version} loaded from {self.path}")
+        return True
+
+    def _stamp(self):
+        """Modification time and size of the ruleset file (None if it cannot be read)"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+
+_shared_managers: Dict[Tuple[str, int], RulesetManager] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_ruleset_manager(path: Optional[str] = None, memo_size: Optional[int] = None) -> RulesetManager:
+    """Process-wide RulesetManager for a ruleset path and memo size, created on first use"""
+    path = os.path.abspath(path or os.getenv('RULESET_PATH') or DEFAULT_RULESET_PATH)
+    if memo_size is None:
+        memo_size = int(os.getenv('XML_CATEGORY_MEMO_SIZE', '1024'))
+    key = (path, memo_size)
+    with _shared_lock:
+        if key not in _shared_managers:
+            _shared_managers[key] = RulesetManager(path, memo_size=memo_size)
+        return _shared_managers[key]
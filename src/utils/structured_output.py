@@ -0,0 +1,226 @@
+
+import json
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+GIS_CATEGORY_NAMES = ['arcgis_pro', 'web_mapping', 'data_issues', 'permissions', 'printing', 'mobile', 'geocoding', 'general']
+PRIORITY_LEVELS = ['high', 'medium', 'low']
+
+# JSON schema for the analysis dict returned by the LLM (strict-mode compatible)
+ANALYSIS_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'category': {'type': 'string', 'enum': GIS_CATEGORY_NAMES},
+        'priority': {'type': 'string', 'enum': PRIORITY_LEVELS},
+        'confidence': {'type': 'number', 'minimum': 0, 'maximum': 1},
+        'suggested_response': {'type': 'string'},
+        'action_plan': {'type': 'array', 'items': {'type': 'string'}},
+        'estimated_resolution_time': {'type': 'string'},
+        'required_skills': {'type': 'array', 'items': {'type': 'string'}}
+    },
+    'required': ['category', 'priority', 'confidence', 'suggested_response', 'action_plan',
+                 'estimated_resolution_time', 'required_skills'],
+    'additionalProperties': False
+}
+
+# Local validation is lenient about optional fields so unstructured-mode responses are not discarded
+ANALYSIS_VALIDATION_SCHEMA = dict(ANALYSIS_SCHEMA, required=['category', 'priority'], additionalProperties=True)
+
+
+def analysis_schemas(categories: Optional[List[str]] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """(request schema, validation schema) for an analysis whose category is one of categories
+    (default GIS_CATEGORY_NAMES)"""
+    schema = json.loads(json.dumps(ANALYSIS_SCHEMA))
+    schema['properties']['category']['enum'] = list(categories or GIS_CATEGORY_NAMES)
+    return schema, dict(schema, required=['category', 'priority'], additionalProperties=True)
+
+
+_JSON_TYPES = {
+    'object': dict,
+    'array': list,
+    'string': str,
+    'boolean': bool,
+    'null': type(None)
+}
+
+Validator = Callable[[Any, str], List[str]]
+
+
+def compile_schema(schema: Dict[str, Any]) -> Validator:
+    """Compile a JSON schema subset (type, enum, min/max, properties, required, items) into a validator"""
+    schema_type = schema.get('type')
+    enum_values = schema.get('enum')
+    minimum = schema.get('minimum')
+    maximum = schema.get('maximum')
+
+    if schema_type == 'object':
+        property_validators = {name: compile_schema(sub) for name, sub in schema.get('properties', {}).items()}
+        required = list(schema.get('required', []))
+        allow_extra = schema.get('additionalProperties', True) is not False
+
+        def validate_object(value: Any, path: str = '$') -> List[str]:
+            if not isinstance(value, dict):
+                return [f"{path}: expected object"]
+            errors = [f"{path}: missing required property '{name}'" for name in required if name not in value]
+            for name, item in value.items():
+                if name in property_validators:
+                    errors.extend(property_validators[name](item, f"{path}.{name}"))
+                elif not allow_extra:
+                    errors.append(f"{path}: unexpected property '{name}'")
+            return errors
+
+        return validate_object
+
+    if schema_type == 'array':
+        item_validator = compile_schema(schema['items']) if 'items' in schema else None
+
+        def validate_array(value: Any, path: str = '$') -> List[str]:
+            if not isinstance(value, list):
+                return [f"{path}: expected array"]
+            errors = []
+            if item_validator:
+                for index, item in enumerate(value):
+                    errors.extend(item_validator(item, f"{path}[{index}]"))
+            return errors
+
+        return validate_array
+
+    def validate_scalar(value: Any, path: str = '$') -> List[str]:
+        if schema_type == 'number':
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                return [f"{path}: expected number"]
+        elif schema_type == 'integer':
+            if isinstance(value, bool) or not isinstance(value, int):
+                return [f"{path}: expected integer"]
+        elif schema_type in _JSON_TYPES and not isinstance(value, _JSON_TYPES[schema_type]):
+            return [f"{path}: expected {schema_type}"]
+        if enum_values is not None and value not in enum_values:
+            return [f"{path}: {value!r} is not one of {enum_values}"]
+        if minimum is not None and value < minimum:
+            return [f"{path}: {value} is below minimum {minimum}"]
+        if maximum is not None and value > maximum:
+            return [f"{path}: {value} is above maximum {maximum}"]
+        return []
+
+    return validate_scalar
+
+
+def strip_markdown_fences(content: str) -> str:
+    """Remove ```json fences that models sometimes wrap around JSON"""
+    content = content.strip()
+    if content.startswith('```json'):
+        return content.split('```json', 1)[1].split('```')[0].strip()
+    if content.startswith('```'):
+        return content.split('```', 1)[1].split('```')[0].strip()
+    return content
+
+
+def repair_json(content: str) -> str:
+    """Repair common near-miss JSON: surrounding prose, trailing commas, truncated closing brackets/strings"""
+    start = content.find('{')
+    if start == -1:
+        raise ValueError("No JSON object found in response")
+    text = content[start:]
+
+    output = []
+    stack = []
+    in_string = False
+    escaped = False
+    index = 0
+    while index < len(text):
+        char = text[index]
+        if in_string:
+            output.append(char)
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+            output.append(char)
+        elif char in '{[':
+            stack.append('}' if char == '{' else ']')
+            output.append(char)
+        elif char in '}]':
+            if stack and stack[-1] == char:
+                stack.pop()
+            output.append(char)
+            if not stack:
+                break  # Ignore anything after the top-level object closes
+        elif char == ',':
+            # Drop trailing commas before a closing bracket or at the truncated end
+            rest = text[index + 1:].lstrip()
+            if rest and rest[0] not in '}]':
+                output.append(char)
+        else:
+            output.append(char)
+        index += 1
+
+    if in_string:
+        output.append('"')
+    repaired = ''.join(output).rstrip()
+    if repaired.endswith(','):
+        repaired = repaired[:-1]
+    if repaired.endswith(':'):
+        repaired += ' null'
+    return repaired + ''.join(reversed(stack))
+
+
+class StructuredOutputParser:
+    """Parse and validate LLM JSON output locally against a compiled schema"""
+
+    def __init__(self, schema: Dict[str, Any] = None, validation_schema: Dict[str, Any] = None):
+        self.schema = schema or ANALYSIS_SCHEMA
+        self.validation_schema = validation_schema or (ANALYSIS_VALIDATION_SCHEMA if schema is None else schema)
+        self.validator = compile_schema(self.validation_schema)
+        self._enum_properties = {
+            name: prop['enum'] for name, prop in self.validation_schema.get('properties', {}).items() if 'enum' in prop
+        }
+
+    def response_format(self, name: str = 'gis_ticket_analysis') -> Dict[str, Any]:
+        """OpenAI response_format payload requesting schema-constrained JSON"""
+        return {
+            'type': 'json_schema',
+            'json_schema': {
+                'name': name,
+                'strict': True,
+                'schema': self.schema
+            }
+        }
+
+    def parse(self, content: str) -> Tuple[Optional[Dict[str, Any]], str, List[str]]:
+        """Parse content; returns (result, status, errors) with status ok|repaired|invalid_json|schema_violation"""
+        text = strip_markdown_fences(content)
+        status = 'ok'
+        try:
+            result = json.loads(text)
+        except json.JSONDecodeError as e:
+            try:
+                result = json.loads(repair_json(text))
+                status = 'repaired'
+            except (ValueError, json.JSONDecodeError):
+                return None, 'invalid_json', [str(e)]
+
+        if self._normalize_enums(result):
+            status = 'repaired'
+
+        errors = self.validator(result, '$')
+        if errors:
+            return None, 'schema_violation', errors
+        return result, status, []
+
+    def _normalize_enums(self, result: Any) -> bool:
+        """Map near-miss enum values such as 'High' or 'Web Mapping' onto the allowed value"""
+        if not isinstance(result, dict):
+            return False
+        changed = False
+        for name, allowed in self._enum_properties.items():
+            value = result.get(name)
+            if isinstance(value, str) and value not in allowed:
+                normalized = re.sub(r'[\s\-]+', '_', value.strip().lower())
+                if normalized in allowed:
+                    result[name] = normalized
+                    changed = True
+        return changed
@@ -3,18 +3,25 @@ import json
 import re
 from datetime import datetime
 from typing import Dict, List, Any, Optional
+from .keyword_matcher import KeywordMatcher
+from .ruleset import RulesetManager, shared_ruleset_manager
 
 class TicketProcessor:
     """Advanced ticket processing utilities for GIS workflow automation"""
     
-    def __init__(self):
-        self.gis_keywords = {
-            'software': ['arcgis', 'qgis', 'autocad', 'erdas', 'envi', 'global mapper'],
-            'data_formats': ['shapefile', 'geodatabase', 'kml', 'geojson', 'raster', 'feature class'],
-            'operations': ['buffer', 'clip', 'merge', 'dissolve', 'spatial join', 'geocoding'],
-            'errors': ['error', 'crash', 'freeze', 'slow', 'not responding', 'corrupt'],
-            'urgency': ['urgent', 'asap', 'critical', 'emergency', 'down', 'broken']
-        }
+    def __init__(self, ruleset_manager: Optional[RulesetManager] = None):
+        # Keyword groups live in the versioned ruleset file and follow its hot reloads
+        self.ruleset_manager = ruleset_manager or shared_ruleset_manager()
+
+    @property
+    def gis_keywords(self) -> Dict[str, List[str]]:
+        """Keyword groups of the active ruleset"""
+        return self.ruleset_manager.current().ticket_keywords
+
+    @property
+    def keyword_matcher(self) -> KeywordMatcher:
+        """Compiled matcher for the active ruleset's keyword groups"""
+        return self.ruleset_manager.current().ticket_keyword_matcher
     
     def extract_ticket_info(self, raw_text: str) -> Dict[str, Any]:
         """Extract structured information from raw ticket text"""
@@ -30,33 +37,17 @@ class TicketProcessor:
             'coordinates': []
         }
         
-        text_lower = raw_text.lower()
-        
-        # Extract software mentions
-        for software in self.gis_keywords['software']:
-            if software in text_lower:
-                info['software_mentioned'].append(software)
-        
-        # Extract data formats
-        for format_type in self.gis_keywords['data_formats']:
-            if format_type in text_lower:
-                info['data_formats'].append(format_type)
-        
-        # Extract operations
-        for operation in self.gis_keywords['operations']:
-            if operation in text_lower:
-                info['operations'].append(operation)
+        # Single scan of the text for every keyword group
+        found = self.keyword_matcher.groups_found(raw_text)
         
-        # Check for error indicators
-        for error in self.gis_keywords['errors']:
-            if error in text_lower:
-                info['error_indicators'].append(error)
+        info['software_mentioned'] = found.get('software', [])
+        info['data_formats'] = found.get('data_formats', [])
+        info['operations'] = found.get('operations', [])
+        info['error_indicators'] = found.get('errors', [])
         
         # Determine urgency
-        for urgent_word in self.gis_keywords['urgency']:
-            if urgent_word in text_lower:
-                info['urgency_level'] = 'high'
-                break
+        if 'urgency' in found:
+            info['urgency_level'] = 'high'
         
         # Extract email addresses
         email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
@@ -248,8 +239,8 @@ class WorkflowAutomator:
             'recommended_actions': []
         }
         
+        processor = TicketProcessor()
         for ticket in tickets:
-            processor = TicketProcessor()
             info = processor.extract_ticket_info(ticket.get('description', ''))
             
             # Determine automation potential
@@ -0,0 +1,207 @@
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from typing import Any, Dict, List
+
+# Ticket fields a flat incident export carries as plain child elements instead of the nested export's tags
+_FLAT_INCIDENT_FIELDS = ('subject', 'description', 'status', 'created_date', 'updated_date', 'due_date',
+                         'requester', 'requester_email', 'assigned_to', 'assigned_to_email',
+                         'category', 'subcategory', 'group', 'additional_info')
+
+
+class XMLTicketParser:
+    """Parse ticket information from XML files"""
+    
+    @staticmethod
+    def parse_xml_file(xml_content: str) -> List[Dict[str, Any]]:
+        """Parse XML content and extract ticket information"""
+        try:
+            root = ET.fromstring(xml_content)
+            tickets = []
+            
+            # Handle different XML structures
+            # Structure 1: <tickets><ticket>...</ticket></tickets>
+            if root.tag == 'tickets':
+                for ticket_elem in root.findall('ticket'):
+                    ticket = XMLTicketParser._extract_ticket_data(ticket_elem)
+                    if ticket:
+                        tickets.append(ticket)
+            
+            # Structure 2: <incidents><incident>...</incident></incidents>
+            elif root.tag == 'incidents':
+                for ticket_elem in root.findall('incident'):
+                    ticket = XMLTicketParser._extract_incident_data(ticket_elem)
+                    if ticket:
+                        tickets.append(ticket)
+            
+            # Structure 3: <ticket>...</ticket> (single ticket)
+            elif root.tag == 'ticket':
+                ticket = XMLTicketParser._extract_ticket_data(root)
+                if ticket:
+                    tickets.append(ticket)
+            
+            # Structure 4: <incident>...</incident> (single incident)
+            elif root.tag == 'incident':
+                ticket = XMLTicketParser._extract_incident_data(root)
+                if ticket:
+                    tickets.append(ticket)
+            
+            # Structure 5: Custom root with ticket/incident elements
+            else:
+                for ticket_elem in root.iter('ticket'):
+                    ticket = XMLTicketParser._extract_ticket_data(ticket_elem)
+                    if ticket:
+                        tickets.append(ticket)
+                for ticket_elem in root.iter('incident'):
+                    ticket = XMLTicketParser._extract_incident_data(ticket_elem)
+                    if ticket:
+                        tickets.append(ticket)
+            
+            return tickets
+            
+        except ET.ParseError as e:
+            raise ValueError(f"Invalid XML format: {str(e)}")
+        except Exception as e:
+            raise ValueError(f"Error parsing XML: {str(e)}")
+    
+    @staticmethod
+    def _extract_ticket_data(ticket_elem) -> Dict[str, Any]:
+        """Extract ticket data from XML element"""
+        ticket = {}
+        
+        # Common field mappings
+        field_mappings = {
+            'id': ['id', 'ticket_id', 'ticketId'],
+            'number': ['number', 'ticket_number'],
+            'subject': ['subject', 'title', 'summary'],
+            'description': ['description', 'details', 'body', 'content'],
+            'priority': ['priority', 'urgency', 'severity'],
+            'category': ['category', 'type', 'classification'],
+            'requester': ['requester', 'user', 'customer', 'reporter'],
+            'status': ['status', 'state'],
+            'created_date': ['created', 'date_created', 'timestamp', 'submitted'],
+            'assigned_to': ['assigned_to', 'assignee', 'owner']
+        }
+        
+        # Extract data using multiple possible field names
+        for field, possible_names in field_mappings.items():
+            for name in possible_names:
+                elem = ticket_elem.find(name)
+                if elem is not None and elem.text:
+                    ticket[field] = elem.text.strip()
+                    break
+                # Try as attribute
+                if ticket_elem.get(name):
+                    ticket[field] = ticket_elem.get(name).strip()
+                    break
+        
+        # Ensure required fields
+        if not ticket.get('id'):
+            ticket['id'] = f"XML-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        
+        # If no number field found, use id as fallback for display
+        if not ticket.get('number') and ticket.get('id'):
+            ticket['number'] = ticket['id']
+        
+        if not ticket.get('subject') and not ticket.get('description'):
+            return None  # Skip invalid tickets
+        
+        return ticket
+
+    @staticmethod
+    def _extract_incident_data(incident_elem) -> Dict[str, Any]:
+        """Extract incident data from XML element (ServiceNow/Samanage format)"""
+        ticket = {}
+        
+        # Direct field mappings for incident XML structure
+        field_mappings = {
+            'id': 'id',
+            'number': 'number', 
+            'subject': 'name',
+            'description': 'description_no_html',
+            'priority': 'priority',
+            'status': 'state',
+            'created_date': 'created_at',
+            'updated_date': 'updated_at',
+            'due_date': 'due_at'
+        }
+        
+        # Extract basic fields
+        for field, xml_tag in field_mappings.items():
+            elem = incident_elem.find(xml_tag)
+            if elem is not None and elem.text:
+                ticket[field] = elem.text.strip()
+        
+        # Extract requester information
+        requester_elem = incident_elem.find('requester')
+        if requester_elem is not None:
+            name_elem = requester_elem.find('name')
+            email_elem = requester_elem.find('email')
+            if name_elem is not None and name_elem.text:
+                ticket['requester'] = name_elem.text.strip()
+            if email_elem is not None and email_elem.text:
+                ticket['requester_email'] = email_elem.text.strip()
+        
+        # Extract assignee information  
+        assignee_elem = incident_elem.find('assignee')
+        if assignee_elem is not None:
+            name_elem = assignee_elem.find('name')
+            email_elem = assignee_elem.find('email')
+            if name_elem is not None and name_elem.text:
+                ticket['assigned_to'] = name_elem.text.strip()
+            if email_elem is not None and email_elem.text:
+                ticket['assigned_to_email'] = email_elem.text.strip()
+        
+        # Extract category information
+        category_elem = incident_elem.find('category')
+        if category_elem is not None:
+            name_elem = category_elem.find('name')
+            if name_elem is not None and name_elem.text:
+                ticket['category'] = name_elem.text.strip()
+        
+        # Extract subcategory information
+        subcategory_elem = incident_elem.find('subcategory')
+        if subcategory_elem is not None:
+            name_elem = subcategory_elem.find('name')
+            if name_elem is not None and name_elem.text:
+                ticket['subcategory'] = name_elem.text.strip()
+        
+        # Extract group assignee
+        group_elem = incident_elem.find('group_assignee')
+        if group_elem is not None:
+            name_elem = group_elem.find('name')
+            if name_elem is not None and name_elem.text:
+                ticket['group'] = name_elem.text.strip()
+        
+        # Extract custom fields for additional information
+        custom_fields_elem = incident_elem.find('custom_fields_values')
+        if custom_fields_elem is not None:
+            additional_info = []
+            for custom_field in custom_fields_elem.findall('custom_fields_value'):
+                name_elem = custom_field.find('name')
+                value_elem = custom_field.find('value')
+                if name_elem is not None and value_elem is not None:
+                    if name_elem.text and value_elem.text:
+                        additional_info.append(f"{name_elem.text.strip()}: {value_elem.text.strip()}")
+            if additional_info:
+                ticket['additional_info'] = '; '.join(additional_info)
+        
+        # Flat incident exports (<subject>, <category>, ... as text elements)
+        for field in _FLAT_INCIDENT_FIELDS:
+            elem = incident_elem.find(field)
+            if field not in ticket and elem is not None and elem.text and elem.text.strip():
+                ticket[field] = elem.text.strip()
+        
+        # Ensure required fields
+        if not ticket.get('id'):
+            ticket['id'] = f"INC-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        
+        if not ticket.get('subject') and not ticket.get('description'):
+            return None  # Skip invalid incidents
+        
+        # Set default values for missing fields
+        if not ticket.get('priority'):
+            ticket['priority'] = 'Medium'
+        if not ticket.get('status'):
+            ticket['status'] = 'Open'
+            
+        return ticket
@@ -66,12 +66,11 @@ def test_weighted_xml_processing():
     
     # Test 5: Export with weighted context
     print("\n5. Testing Export with Weighted Context:")
-    export_file = agent.export_prompt_context(sample_ticket)
-    print(f"Export file created: {export_file}")
+    export_name = agent.export_prompt_context(sample_ticket)
+    print(f"Export created: {export_name}")
     
-    # Load and display key parts of exported file
-    with open(export_file, 'r') as f:
-        exported_data = json.load(f)
+    # Load and display key parts of the export
+    exported_data = agent.read_prompt_export(export_name)
     
     print("\nExported metadata:")
     print(json.dumps(exported_data['metadata'], indent=2))
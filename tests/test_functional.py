@@ -1,13 +1,19 @@
 import unittest
+import gzip
+import io
 import json
+import tarfile
 import time
 import tempfile
 import os
+import zipfile
 import requests
+import shutil
 import sys
+from unittest.mock import patch
 sys.path.append('src')
 
-from app import app
+from app import app, gis_agent
 
 # Optional selenium imports for UI testing (if available)
 try:
@@ -138,6 +144,210 @@ class TestFunctionalWorkflows(unittest.TestCase):
         
         print(f"✅ Bulk processing workflow completed: {len(set(categories_found))} categories found")
     
+    def test_bulk_analyze_deduplicates_and_reports_errors_per_ticket(self):
+        """Test a bulk batch with duplicates and a malformed ticket still succeeds for the valid tickets"""
+        ticket = {'id': 'BULK-DUP', 'subject': 'Survey123 form will not sync', 'description': 'Field app sync fails'}
+        response = self.client.post('/api/bulk_analyze',
+                                  data=json.dumps({'tickets': [ticket, 'not a ticket', ticket], 'mode': 'rules'}),
+                                  content_type='application/json')
+        
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(data['total_processed'], 3)
+        self.assertEqual(data['total_failed'], 1)
+        self.assertIn('error', data['results'][1])
+        self.assertEqual(data['results'][0]['analysis']['category'], data['results'][2]['analysis']['category'])
+        self.assertTrue(all(result['latency_ms'] >= 0 for result in data['results']))
+        self.assertIn('elapsed_ms', data)
+        
+        # Unknown analysis modes are rejected up front
+        response = self.client.post('/api/bulk_analyze',
+                                  data=json.dumps({'tickets': [ticket], 'mode': 'guess'}),
+                                  content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+    
+    def test_process_tickets_analyzes_each_ticket_once(self):
+        """Test response, action plan and priority all come from one analysis per ticket"""
+        tickets = [
+            {'ticket_data': {'id': 'ONCE-1', 'subject': 'Printer offline', 'description': 'Large format plot fails'},
+             'analysis': {'category': 'general'}},
+            {'ticket_data': {'id': 'ONCE-2', 'subject': 'Portal login', 'description': 'Urgent: cannot access maps'}}
+        ]
+        with patch.object(gis_agent, 'iter_analyze_tickets', wraps=gis_agent.iter_analyze_tickets) as analyze_tickets, \
+                patch.object(gis_agent, 'analyze_ticket', side_effect=AssertionError('second analysis')), \
+                patch.object(gis_agent, 'generate_response', side_effect=AssertionError('second analysis')), \
+                patch.object(gis_agent, 'determine_priority', side_effect=AssertionError('second scan')):
+            response = self.client.post('/api/process_tickets',
+                                      data=json.dumps({'tickets': tickets}),
+                                      content_type='application/json')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(analyze_tickets.call_count, 1)
+        for result in json.loads(response.data)['processed_tickets']:
+            analysis = result['enhanced_analysis']
+            self.assertEqual(result['response'], analysis['suggested_response'])
+            self.assertEqual(result['assigned_priority'], analysis['priority'])
+            self.assertEqual(result['action_plan'][-1],
+                             gis_agent.rules.ticket_action_plan(analysis['category'], analysis['priority'])[-1])
+    
+    def test_process_tickets_job_reports_progress_and_results(self):
+        """Test an async import returns a job id at once and /api/jobs/<id> reports progress, results and cancel"""
+        import app as app_module
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir, True)
+        queue = app_module.JobQueue(os.path.join(temp_dir, 'jobs.db'), app_module.job_queue.handlers,
+                                    workers=1, chunk_size=2, poll_interval=0.05)
+        self.addCleanup(queue.close)
+        tickets = [{'ticket_data': {'id': f'JOB-{number}', 'subject': 'Portal login', 'description': f'Case {number}'}}
+                   for number in range(5)]
+        with patch.object(app_module, 'job_queue', queue):
+            response = self.client.post('/api/process_tickets',
+                                      data=json.dumps({'tickets': tickets, 'async': True,
+                                                       'processing_options': {'generate_responses': False}}),
+                                      content_type='application/json')
+            self.assertEqual(response.status_code, 202)
+            job_id = json.loads(response.data)['job_id']
+            
+            deadline = time.time() + 10
+            while True:
+                job = json.loads(self.client.get(f'/api/jobs/{job_id}').data)
+                if job['status'] == 'completed' or time.time() > deadline:
+                    break
+                time.sleep(0.05)
+            self.assertEqual((job['status'], job['done'], job['total'], job['progress']), ('completed', 5, 5, 100.0))
+            self.assertEqual([result['ticket_id'] for result in job['results']], [f'JOB-{number}' for number in range(5)])
+            self.assertEqual(job['results'][0]['response'], '')
+            self.assertIn('assigned_priority', job['results'][0])
+            
+            page = json.loads(self.client.get(f'/api/jobs/{job_id}?offset=3&limit=1').data)
+            self.assertEqual(([result['ticket_id'] for result in page['results']], page['next_offset']), (['JOB-3'], 4))
+            self.assertEqual(self.client.post(f'/api/jobs/{job_id}/cancel').status_code, 409)
+            self.assertEqual(self.client.get('/api/jobs/missing').status_code, 404)
+            self.assertEqual(self.client.post('/api/jobs/missing/cancel').status_code, 404)
+    
+    def test_bulk_endpoints_stream_results_as_they_complete(self):
+        """Test ?stream=ndjson sends each result as its ticket finishes, without waiting for slower ones, and sse frames events"""
+        import threading
+        from unittest.mock import MagicMock
+        tickets = [{'id': f'STREAM-{number}', 'subject': 'Portal login', 'description': f'Case {number}'}
+                   for number in range(5)] + ['not a ticket']
+        release = threading.Event()
+        self.addCleanup(release.set)
+        
+        def completion(**kwargs):
+            if 'Case 0' in kwargs['messages'][1]['content']:
+                release.wait(5)
+            response = MagicMock()
+            response.choices[0].message.content = json.dumps({'category': 'printing', 'priority': 'low', 'confidence': 0.9})
+            return response
+        
+        client = MagicMock()
+        client.chat.completions.create.side_effect = completion
+        with patch.object(gis_agent, 'client', client), patch.object(gis_agent, 'ai_enabled', True), \
+                patch.object(gis_agent, 'local_classifier', None), patch.object(gis_agent, 'export_prompts', False):
+            response = self.client.post('/api/bulk_analyze?stream=ndjson', buffered=False,
+                                      data=json.dumps({'tickets': tickets, 'mode': 'ai_first'}),
+                                      content_type='application/json')
+            self.assertEqual(response.mimetype, 'application/x-ndjson')
+            lines = iter(response.response)
+            # Every other ticket arrives while the first one's LLM call is still running
+            events = [json.loads(next(lines)) for _ in range(5)]
+            self.assertFalse(release.is_set())
+            release.set()
+            events += [json.loads(line) for line in lines]
+            response.close()
+        self.assertEqual(events[0]['index'], 5)
+        self.assertIn('error', events[0])
+        self.assertEqual(sorted(event['index'] for event in events[:5]), [1, 2, 3, 4, 5])
+        self.assertEqual((events[5]['index'], events[5]['ticket_id']), (0, 'STREAM-0'))
+        self.assertEqual(events[5]['analysis']['category'], 'printing')
+        self.assertEqual(events[-1]['type'], 'summary')
+        self.assertEqual((events[-1]['total_processed'], events[-1]['total_failed']), (6, 1))
+        
+        response = self.client.post('/api/process_tickets',
+                                  data=json.dumps({'tickets': [{'ticket_data': ticket} for ticket in tickets[:2]]}),
+                                  content_type='application/json', headers={'Accept': 'text/event-stream'})
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        frames = response.get_data(as_text=True).strip().split('\n\n')
+        self.assertEqual([frame.split('\n')[0] for frame in frames], ['event: result', 'event: result', 'event: summary'])
+        self.assertEqual(json.loads(frames[1].split('data: ', 1)[1])['ticket_id'], 'STREAM-1')
+        
+        response = self.client.post('/api/bulk_analyze?stream=xml', data=json.dumps({'tickets': tickets}),
+                                  content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+    
+    def test_health_reports_warmed_up_worker(self):
+        """Test /api/health reports the worker once warm_up has prepared it, and job workers start only then"""
+        import app as app_module
+        self.assertEqual(app_module.job_queue._threads, [])
+        with patch.dict(app_module.worker_state, {'warmed_up': False}), \
+                patch.object(app_module.job_queue, 'start') as start_jobs:
+            self.assertFalse(json.loads(self.client.get('/api/health').data)['warmed_up'])
+            app_module.warm_up()
+            health = json.loads(self.client.get('/api/health').data)
+        start_jobs.assert_called_once_with()
+        self.assertEqual((health['status'], health['pid'], health['warmed_up']), ('ok', os.getpid(), True))
+        self.assertEqual(health['ruleset_version'], gis_agent.rules.version)
+    
+    def test_prompt_listing_pages_and_filters(self):
+        """Test /api/prompts pages through the catalog with a cursor and applies filters"""
+        temp_dir = tempfile.mkdtemp()
+        tickets = [{'id': f'PAGE-{index}', 'subject': 'Printer offline', 'description': 'Plot fails'} for index in range(6)]
+        with patch.object(gis_agent, 'prompts_dir', temp_dir):
+            gis_agent.export_prompt_contexts(tickets[:5])
+            gis_agent.export_prompt_contexts(tickets[5:], analysis_type='categorize_only')
+            
+            first = json.loads(self.client.get('/api/prompts?limit=4').data)
+            self.assertEqual((len(first['prompts']), first['total_count']), (4, 6))
+            second = json.loads(self.client.get(f"/api/prompts?limit=4&cursor={first['next_cursor']}").data)
+            self.assertEqual(len(second['prompts']), 2)
+            self.assertIsNone(second['next_cursor'])
+            self.assertEqual(len({p['filename'] for p in first['prompts'] + second['prompts']}), 6)
+            
+            filtered = json.loads(self.client.get('/api/prompts?analysis_type=categorize_only').data)
+            self.assertEqual([p['ticket_id'] for p in filtered['prompts']], ['PAGE-5'])
+            filtered = json.loads(self.client.get('/api/prompts?ticket=PAGE-2').data)
+            self.assertEqual([p['ticket_id'] for p in filtered['prompts']], ['PAGE-2'])
+            self.assertEqual(json.loads(self.client.get('/api/prompts?until=2000-01-01').data)['total_count'], 0)
+            self.assertEqual(self.client.get('/api/prompts?since=yesterday').status_code, 400)
+    
+    def test_prompt_export_streams_gzip_when_accepted(self):
+        """Test /api/prompts/<name> streams gzip to clients that accept it and plain JSON otherwise"""
+        ticket = {'id': 'GZIP-1', 'subject': 'Printer offline', 'description': 'Plot fails'}
+        with patch.object(gis_agent, 'prompts_dir', tempfile.mkdtemp()):
+            name = gis_agent.export_prompt_context(ticket)
+            plain = self.client.get(f'/api/prompts/{name}')
+            compressed = self.client.get(f'/api/prompts/{name}', headers={'Accept-Encoding': 'gzip'})
+        
+        self.assertNotIn('Content-Encoding', plain.headers)
+        self.assertEqual(compressed.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', compressed.headers['Vary'])
+        self.assertEqual(json.loads(gzip.decompress(compressed.data)), json.loads(plain.data))
+        self.assertEqual(json.loads(plain.data)['prompt_data']['ticket_data'], ticket)
+    
+    def test_prompt_archive_streams_matching_exports(self):
+        """Test /api/prompts/archive streams tar and zip archives of the filtered exports"""
+        tickets = [{'id': f'ARCH-{index}', 'subject': 'Printer offline', 'description': 'Plot fails'} for index in range(4)]
+        with patch.object(gis_agent, 'prompts_dir', tempfile.mkdtemp()):
+            names = gis_agent.export_prompt_contexts(tickets)
+            tar_response = self.client.get('/api/prompts/archive?ticket=ARCH-1,ARCH-2&ticket=ARCH-3')
+            zip_response = self.client.get('/api/prompts/archive?format=zip&ticket=ARCH-0')
+            empty_response = self.client.get('/api/prompts/archive?until=2000-01-01')
+            bad_response = self.client.get('/api/prompts/archive?format=rar')
+        
+        self.assertTrue(tar_response.is_streamed)
+        self.assertIn('attachment', tar_response.headers['Content-Disposition'])
+        with tarfile.open(fileobj=io.BytesIO(tar_response.data)) as archive:
+            self.assertEqual(sorted(archive.getnames()), sorted(names[1:]))
+            document = json.load(archive.extractfile(names[2]))
+        self.assertEqual(document['ticket_data'], tickets[2])
+        with zipfile.ZipFile(io.BytesIO(zip_response.data)) as archive:
+            self.assertEqual(archive.namelist(), names[:1])
+            self.assertEqual(json.loads(archive.read(names[0]))['metadata']['ticket_id'], 'ARCH-0')
+        with tarfile.open(fileobj=io.BytesIO(empty_response.data)) as archive:
+            self.assertEqual(archive.getnames(), [])
+        self.assertEqual(bad_response.status_code, 400)
+    
     def test_xml_import_and_processing_workflow(self):
         """Test complete workflow: XML import and processing"""
         # Step 1: Create test XML file
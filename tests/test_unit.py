@@ -1,13 +1,30 @@
 import unittest
+import gc
+import gzip
 import json
 import os
+import shutil
 import tempfile
+import threading
+import time
+import weakref
 from unittest.mock import Mock, patch, MagicMock
-from datetime import datetime
+from datetime import date, datetime, timedelta
 import sys
 sys.path.append('src')
 
 from ai_agent import EnhancedGISTicketAgent
+from utils import export_writer
+from utils.export_writer import PromptExportWriter
+from utils.job_queue import JobQueue
+from utils.keyword_matcher import KeywordMatcher
+from utils.local_classifier import LocalTicketClassifier, build_training_set, load_tickets, ticket_text
+from utils.productivity_tracker import ProductivityTracker
+from utils.prompt_retention import PromptRetentionWorker, _exclusive, apply_retention
+from utils.prompt_store import PromptStore, migrate_legacy_exports
+from utils.ruleset import DEFAULT_RULESET_PATH, RulesetManager, shared_ruleset_manager
+from utils.structured_output import StructuredOutputParser
+from utils.ticket_processor import TicketProcessor
 from app import app, XMLTicketParser
 
 class TestEnhancedGISTicketAgent(unittest.TestCase):
@@ -94,16 +111,1239 @@ class TestEnhancedGISTicketAgent(unittest.TestCase):
         """Test prompt context export functionality"""
         with tempfile.TemporaryDirectory() as temp_dir:
             self.agent.prompts_dir = temp_dir
-            filepath = self.agent.export_prompt_context(self.sample_ticket)
-            self.assertTrue(os.path.exists(filepath))
+            name = self.agent.export_prompt_context(self.sample_ticket)
+            self.assertIn(name, self.agent.prompt_store)
             
             # Verify JSON structure
-            with open(filepath, 'r') as f:
-                data = json.load(f)
-                self.assertIn('metadata', data)
-                self.assertIn('system_prompt', data)
-                self.assertIn('user_prompt', data)
-                self.assertEqual(data['metadata']['ticket_id'], 'TEST-001')
+            data = self.agent.read_prompt_export(name)
+            self.assertIn('metadata', data)
+            self.assertIn('system_prompt', data)
+            self.assertIn('user_prompt', data)
+            self.assertEqual(data['metadata']['ticket_id'], 'TEST-001')
+
+    def test_warm_up_and_shutdown(self):
+        """Test warm-up runs each first-request step once and shutdown writes queued exports and stops the pool"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            self.agent.prompts_dir = temp_dir
+            self.agent.client = MagicMock()
+            timings = self.agent.warm_up()
+            self.assertEqual(set(timings), {'rules', 'prompts', 'local_model', 'prompt_store', 'batch_pool', 'llm_client'})
+            self.agent.client.models.list.assert_not_called()
+            self.agent.warm_up(connect=True)
+            self.agent.client.models.list.assert_called_once()
+
+            name = self.agent.export_prompt_contexts([self.sample_ticket], background=True)[0]
+            pool = self.agent._batch_pool()
+            self.agent.shutdown(timeout=5)
+            self.assertIn(name, self.agent.prompt_store)
+            self.assertTrue(pool._shutdown)
+            self.assertIsNot(self.agent._batch_pool(), pool)
+
+
+class TestRequestCoalescing(unittest.TestCase):
+    """Unit tests for single-flight coalescing of LLM requests"""
+
+    def setUp(self):
+        """Set up an agent with a slow mocked OpenAI client"""
+        self.agent = EnhancedGISTicketAgent()
+        self.agent.client = MagicMock()
+
+        def slow_completion(**kwargs):
+            time.sleep(0.2)
+            response = MagicMock()
+            response.choices[0].message.content = '{"category": "arcgis_pro", "priority": "high", "confidence": 0.9}'
+            return response
+
+        self.agent.client.chat.completions.create.side_effect = slow_completion
+        self.ticket = {
+            'id': 'COALESCE-001',
+            'subject': 'ArcGIS Pro crashes',
+            'description': 'Crash when opening a project'
+        }
+
+    def _analyze_concurrently(self, tickets):
+        """Run analyze_with_openai for each ticket on its own thread"""
+        results = [None] * len(tickets)
+
+        def worker(index, ticket):
+            results[index] = self.agent.analyze_with_openai(ticket)
+
+        threads = [threading.Thread(target=worker, args=(i, t)) for i, t in enumerate(tickets)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_identical_concurrent_prompts_share_one_request(self):
+        """Test concurrent identical prompts make a single provider call"""
+        results = self._analyze_concurrently([self.ticket] * 5)
+
+        self.assertEqual(self.agent.client.chat.completions.create.call_count, 1)
+        self.assertTrue(all(r['category'] == 'arcgis_pro' for r in results))
+        # Each caller gets its own result dict
+        self.assertEqual(len({id(r) for r in results}), 5)
+
+        stats = self.agent.get_metrics()['request_coalescing']
+        self.assertEqual(stats['executed'], 1)
+        self.assertEqual(stats['coalesced'], 4)
+        self.assertEqual(stats['in_flight'], 0)
+
+    def test_different_prompts_are_not_coalesced(self):
+        """Test distinct tickets each get their own provider call"""
+        other = dict(self.ticket, id='COALESCE-002')
+        self._analyze_concurrently([self.ticket, other])
+        self.assertEqual(self.agent.client.chat.completions.create.call_count, 2)
+
+    def test_sequential_calls_are_not_cached(self):
+        """Test a settled request is not reused by later calls"""
+        self.agent.analyze_with_openai(self.ticket)
+        self.agent.analyze_with_openai(self.ticket)
+        self.assertEqual(self.agent.client.chat.completions.create.call_count, 2)
+
+
+class TestStructuredOutput(unittest.TestCase):
+    """Unit tests for schema-validated LLM output parsing"""
+
+    def setUp(self):
+        """Set up parser and an agent with a mocked OpenAI client"""
+        self.parser = StructuredOutputParser()
+        self.agent = EnhancedGISTicketAgent()
+        self.agent.client = MagicMock()
+        self.ticket = {'id': 'SCHEMA-001', 'subject': 'Portal login fails', 'description': 'Cannot sign in'}
+
+    def _mock_content(self, content):
+        """Make the mocked client return the given message content"""
+        response = MagicMock()
+        response.choices[0].message.content = content
+        self.agent.client.chat.completions.create.return_value = response
+
+    def test_valid_json_parses(self):
+        """Test well-formed JSON passes validation untouched"""
+        result, status, errors = self.parser.parse('```json\n{"category": "permissions", "priority": "high", "confidence": 0.9}\n```')
+        self.assertEqual(status, 'ok')
+        self.assertEqual(result['category'], 'permissions')
+        self.assertEqual(errors, [])
+
+    def test_repairs_truncated_brace_and_trailing_comma(self):
+        """Test near-miss JSON is repaired without another request"""
+        result, status, _ = self.parser.parse('{"category": "printing", "priority": "low", "action_plan": ["a", "b",],')
+        self.assertEqual(status, 'repaired')
+        self.assertEqual(result['action_plan'], ['a', 'b'])
+
+        result, status, _ = self.parser.parse('{"category": "mobile", "priority": "medium", "suggested_response": "Update the ap')
+        self.assertEqual(status, 'repaired')
+        self.assertEqual(result['suggested_response'], 'Update the ap')
+
+    def test_normalizes_enum_near_misses(self):
+        """Test enum values like 'High' or 'Web Mapping' are normalized"""
+        result, status, _ = self.parser.parse('{"category": "Web Mapping", "priority": "High"}')
+        self.assertEqual(status, 'repaired')
+        self.assertEqual(result['category'], 'web_mapping')
+        self.assertEqual(result['priority'], 'high')
+
+    def test_schema_violation_rejected(self):
+        """Test JSON that violates the schema is rejected"""
+        result, status, errors = self.parser.parse('{"category": "astrology", "priority": "high", "confidence": 4}')
+        self.assertIsNone(result)
+        self.assertEqual(status, 'schema_violation')
+        self.assertEqual(len(errors), 2)
+
+    def test_parse_failure_rate_metric(self):
+        """Test parse failures are counted in agent metrics"""
+        self._mock_content('{"category": "permissions", "priority": "high"')
+        self.assertIsNotNone(self.agent.analyze_with_openai(self.ticket))
+        self._mock_content('Sorry, I cannot help with that.')
+        self.assertIsNone(self.agent.analyze_with_openai(self.ticket))
+
+        metrics = self.agent.get_metrics()
+        self.assertEqual(metrics['llm_parse_attempts'], 2)
+        self.assertEqual(metrics['llm_parse_repaired'], 1)
+        self.assertEqual(metrics['llm_parse_failures'], 1)
+        self.assertEqual(metrics['llm_parse_failure_rate'], 0.5)
+
+    def test_structured_mode_requests_json_schema(self):
+        """Test structured-output mode sends a json_schema response_format"""
+        self._mock_content('{"category": "permissions", "priority": "high"}')
+        self.agent.structured_output = True
+        self.agent.analyze_with_openai(self.ticket)
+        kwargs = self.agent.client.chat.completions.create.call_args.kwargs
+        self.assertEqual(kwargs['response_format']['type'], 'json_schema')
+        self.assertTrue(kwargs['response_format']['json_schema']['strict'])
+
+
+class TestPromptPrefixLayout(unittest.TestCase):
+    """Unit tests for the cache-friendly prompt layout"""
+
+    def setUp(self):
+        """Set up agent and two unrelated tickets"""
+        self.agent = EnhancedGISTicketAgent()
+        self.ticket_a = {'id': 'A-1', 'subject': 'Print fails', 'description': 'Plotter error', 'priority': 'High'}
+        self.ticket_b = {'id': 'B-2', 'subject': 'Login issue', 'description': 'Portal access denied'}
+
+    def test_static_instructions_form_shared_prefix(self):
+        """Test prompts for different tickets share the full static instruction block"""
+        for analysis_type in ('full', 'categorize_only'):
+            instructions = self.agent._create_prompt_instructions(analysis_type)
+            prompt_a = self.agent.create_user_prompt(self.ticket_a, analysis_type)
+            prompt_b = self.agent.create_user_prompt(self.ticket_b, analysis_type)
+            self.assertTrue(prompt_a.startswith(instructions))
+            self.assertTrue(prompt_b.startswith(instructions))
+            self.assertGreaterEqual(len(os.path.commonprefix([prompt_a, prompt_b])), len(instructions))
+
+    def test_ticket_data_at_end(self):
+        """Test the per-ticket data follows the output format"""
+        prompt = self.agent.create_user_prompt(self.ticket_a)
+        self.assertLess(prompt.index('"required_skills"'), prompt.index('Ticket ID: A-1'))
+        self.assertLess(prompt.index('Ticket ID: A-1'), prompt.index('MAXIMUM PRIORITY XML JSON'))
+
+    def test_cached_token_usage_recorded(self):
+        """Test cached prompt tokens from API usage are recorded"""
+        self.agent.client = MagicMock()
+        response = MagicMock()
+        response.choices[0].message.content = '{"category": "printing", "priority": "high"}'
+        response.usage.prompt_tokens = 1200
+        response.usage.completion_tokens = 300
+        response.usage.prompt_tokens_details.cached_tokens = 1024
+        self.agent.client.chat.completions.create.return_value = response
+
+        self.agent.analyze_with_openai(self.ticket_a)
+        metrics = self.agent.get_metrics()
+        self.assertEqual(metrics['llm_prompt_tokens'], 1200)
+        self.assertEqual(metrics['llm_cached_prompt_tokens'], 1024)
+        self.assertEqual(metrics['llm_completion_tokens'], 300)
+        self.assertAlmostEqual(metrics['llm_prompt_cache_hit_rate'], 1024 / 1200, places=3)
+
+
+class TestCascadeAnalysis(unittest.TestCase):
+    """Unit tests for the confidence-gated rules -> LLM cascade"""
+
+    def setUp(self):
+        """Set up a cascade-mode agent with a mocked OpenAI client"""
+        self.agent = EnhancedGISTicketAgent()
+        self.agent.export_prompts = False
+        self.agent.ai_enabled = True
+        self.agent.analysis_mode = 'cascade'
+        self.agent.cascade_rules_threshold = 0.9
+        self.agent.cascade_fast_model = 'fast-model'
+        self.agent.cascade_strong_model = 'strong-model'
+        self.agent.cascade_fast_threshold = 0.8
+        self.agent.client = MagicMock()
+        self.confidences = {'fast-model': 0.6, 'strong-model': 0.95}
+
+        def completion(**kwargs):
+            response = MagicMock()
+            confidence = self.confidences[kwargs['model']]
+            response.choices[0].message.content = json.dumps(
+                {'category': 'mobile', 'priority': 'medium', 'confidence': confidence})
+            return response
+
+        self.agent.client.chat.completions.create.side_effect = completion
+
+    def test_high_confidence_rules_skip_llm(self):
+        """Test tickets with mapped XML categories never reach the LLM"""
+        ticket = {'id': 'CAS-1', 'subject': 'Layer missing', 'description': 'Help', 'category': 'geodatabase'}
+        result = self.agent.analyze_ticket(ticket)
+        self.assertEqual(result['cascade_tier'], 'rules')
+        self.agent.client.chat.completions.create.assert_not_called()
+
+    def test_low_confidence_escalates_through_models(self):
+        """Test low-confidence tickets go to the fast model, then the strong model"""
+        ticket = {'id': 'CAS-2', 'subject': 'Something odd', 'description': 'Not sure what happened'}
+        result = self.agent.analyze_ticket(ticket)
+        self.assertEqual(result['cascade_tier'], 'strong_model')
+        self.assertEqual(result['ai_model'], 'strong-model')
+        models = [c.kwargs['model'] for c in self.agent.client.chat.completions.create.call_args_list]
+        self.assertEqual(models, ['fast-model', 'strong-model'])
+
+    def test_confident_fast_model_stops_cascade(self):
+        """Test a confident fast-model answer is used without the strong model"""
+        self.confidences['fast-model'] = 0.85
+        result = self.agent.analyze_ticket({'id': 'CAS-3', 'subject': 'Odd', 'description': 'Unclear'})
+        self.assertEqual(result['cascade_tier'], 'fast_model')
+        self.assertEqual(self.agent.client.chat.completions.create.call_count, 1)
+
+    def test_tier_counts_reported(self):
+        """Test how many tickets each tier handled is reported in metrics"""
+        self.agent.analyze_ticket({'id': 'CAS-4', 'subject': 'x', 'description': 'y', 'category': 'printing'})
+        self.agent.analyze_ticket({'id': 'CAS-5', 'subject': 'Odd', 'description': 'Unclear'})
+        self.agent.client.chat.completions.create.side_effect = Exception('provider down')
+        self.agent.analyze_ticket({'id': 'CAS-6', 'subject': 'Odd', 'description': 'Still unclear'})
+
+        tiers = self.agent.get_metrics()['cascade_tiers']
+        self.assertEqual(tiers, {'rules': 1, 'local_model': 0, 'fast_model': 0, 'strong_model': 1,
+                                 'fast_model_fallback': 0, 'rules_fallback': 1})
+
+    def test_failed_strong_model_keeps_fast_model_answer(self):
+        """Test a below-threshold fast-model answer is used when the strong model fails"""
+        def completion(**kwargs):
+            if kwargs['model'] == 'strong-model':
+                raise Exception('provider down')
+            response = MagicMock()
+            response.choices[0].message.content = json.dumps(
+                {'category': 'mobile', 'priority': 'medium', 'confidence': self.confidences['fast-model']})
+            return response
+
+        self.agent.client.chat.completions.create.side_effect = completion
+        result = self.agent.analyze_ticket({'id': 'CAS-7', 'subject': 'Odd', 'description': 'Unclear'})
+        self.assertEqual(result['cascade_tier'], 'fast_model_fallback')
+        self.assertEqual(result['ai_model'], 'fast-model')
+        self.assertEqual(self.agent.get_metrics()['cascade_tiers']['fast_model_fallback'], 1)
+
+
+class TestKeywordMatcher(unittest.TestCase):
+    """Unit tests for the compiled multi-pattern keyword matcher"""
+
+    def setUp(self):
+        """Set up matchers for both backends"""
+        groups = {
+            'arcgis_pro': ['arcgis pro', 'pro software', 'desktop'],
+            'data_issues': ['data', 'geodatabase'],
+            'general': ['issue']
+        }
+        self.matchers = [KeywordMatcher(groups), KeywordMatcher(groups, use_automaton=False)]
+
+    def test_finds_overlapping_hits_with_positions(self):
+        """Test every hit, including overlaps and substrings, is returned with its position"""
+        for matcher in self.matchers:
+            hits = matcher.find_all('ArcGIS Pro software opens the Geodatabase')
+            found = [(hit.keyword, hit.start, hit.end) for hit in hits]
+            self.assertEqual(found, [('arcgis pro', 0, 10), ('pro software', 7, 19),
+                                     ('geodatabase', 30, 41), ('data', 33, 37)], matcher.backend)
+
+    def test_groups_found_keeps_keyword_order(self):
+        """Test groups_found lists keywords in the group's configured order"""
+        for matcher in self.matchers:
+            found = matcher.groups_found('geodatabase issue with data')
+            self.assertEqual(found, {'data_issues': ['data', 'geodatabase'], 'general': ['issue']})
+
+    def test_call_sites_use_compiled_matchers(self):
+        """Test ticket processor results come from the shared matcher"""
+        info = TicketProcessor().extract_ticket_info('ArcGIS crash while clipping a shapefile, urgent')
+        self.assertEqual(info['software_mentioned'], ['arcgis'])
+        self.assertEqual(info['data_formats'], ['shapefile'])
+        self.assertEqual(info['error_indicators'], ['crash'])
+        self.assertEqual(info['urgency_level'], 'high')
+
+
+class TestCategoryScoringIndex(unittest.TestCase):
+    """Unit tests for field-scoped category scoring in the rule-based analysis"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.agent = EnhancedGISTicketAgent()
+
+    def test_keyword_in_middle_of_description_counts(self):
+        """Test keywords are matched anywhere in a field, not only at its start"""
+        ticket = {'id': 'IDX-001', 'subject': 'Help needed', 'description': 'Our batch job cannot geocode the new parcels'}
+        result = self.agent.analyze_with_rules(ticket)
+        self.assertEqual(result['category'], 'geocoding')
+
+    def test_highest_score_wins_over_category_order(self):
+        """Test the best scoring category is chosen rather than the first one with a hit"""
+        ticket = {'id': 'IDX-002', 'subject': 'Print layout export to PDF fails',
+                  'description': 'The layer prints blank in the map book layout'}
+        result = self.agent.analyze_with_rules(ticket)
+        self.assertEqual(result['category'], 'printing')
+        self.assertGreater(result['category_scores']['printing'], result['category_scores']['data_issues'])
+
+    def test_plural_forms_and_token_boundaries(self):
+        """Test simple plurals match while substrings inside other words do not"""
+        index = self.agent.rules.category_index
+        self.assertIn(('data_issues', 'layer'), index.matches('Two layers are missing'))
+        self.assertNotIn(('data_issues', 'data'), index.matches('The geodatabase is locked'))
+
+    def test_confidence_reflects_score_share(self):
+        """Test a clear winner gets higher confidence than a tie"""
+        clear = self.agent.analyze_with_rules({'id': 'IDX-003', 'subject': 'Survey123 and Collector sync',
+                                               'description': 'Field workers on android'})
+        tied = self.agent.analyze_with_rules({'id': 'IDX-004', 'subject': 'Portal', 'description': 'shapefile'})
+        self.assertGreater(clear['confidence'], tied['confidence'])
+        self.assertEqual(tied['category'], 'web_mapping')
+
+    def test_batch_matches_single_ticket_results(self):
+        """Test analyze_with_rules_batch returns the same result dicts as analyze_with_rules"""
+        tickets = [
+            {'id': 'B-1', 'subject': 'Printing layouts to PDF', 'description': 'Export of the map book fails'},
+            {'id': 'B-2', 'subject': 'Nothing relevant', 'description': ''},
+            {'id': 'B-3', 'subject': 'Portal layers', 'description': 'data\x00 geocode', 'category': 'Mobile'},
+            {'id': 'B-4', 'subject': 'ArcGIS-Pro  software crash', 'description': 'Survey123 on iOS',
+             'assigned_to': 'GIS Support Team', 'manual_description': 'access issue', 'priority': 'Low'}
+        ]
+        batch = self.agent.analyze_with_rules_batch(tickets)
+        for ticket, batch_result in zip(tickets, batch):
+            single_result = self.agent.analyze_with_rules(ticket)
+            single_result.pop('analysis_timestamp')
+            batch_result.pop('analysis_timestamp')
+            self.assertEqual(batch_result, single_result)
+        self.assertEqual(self.agent.analyze_with_rules_batch([]), [])
+
+
+class TestLocalClassifier(unittest.TestCase):
+    """Unit tests for the trained local classifier tier"""
+
+    def setUp(self):
+        """Train a small classifier on synthetic history"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        db_path = os.path.join(self.temp_dir.name, 'productivity.db')
+        tracker = ProductivityTracker(db_path)
+        topics = {
+            'printing': ('Plotter print of the layout fails', 'Large format PDF export from the map book times out'),
+            'mobile': ('Field app will not sync', 'Survey123 and Collector on android tablets lose edits'),
+            'geocoding': ('Addresses not matching', 'Batch geocode of customer addresses returns no locations')
+        }
+        self.tickets = []
+        for index in range(30):
+            category = list(topics)[index % 3]
+            subject, description = topics[category]
+            ticket_id = f'HIST-{index}'
+            self.tickets.append({'id': ticket_id, 'subject': f'{subject} #{index}', 'description': description})
+            if index % 2:
+                tracker.log_ticket_action(ticket_id, 'resolved', category=category,
+                                          priority='high' if category == 'mobile' else 'low')
+            else:
+                rating = 5 if index % 4 == 0 else 1
+                tracker.log_automation_feedback(ticket_id, json.dumps({
+                    'category': category, 'priority': 'high' if category == 'mobile' else 'low'
+                }), rating)
+        self.examples = build_training_set(self.tickets, db_path)
+        self.model_path = os.path.join(self.temp_dir.name, 'models', 'local.joblib')
+        LocalTicketClassifier.train(self.examples).save(self.model_path)
+
+    def tearDown(self):
+        """Remove the temporary database and model"""
+        self.temp_dir.cleanup()
+
+    def test_training_set_uses_final_labels_and_ratings(self):
+        """Test final labels are used, well-rated suggestions are down-weighted and poor ones dropped"""
+        by_id = {example['ticket']['id']: example for example in self.examples}
+        self.assertEqual(by_id['HIST-1']['weights'], {'category': 1.0, 'priority': 1.0})
+        self.assertEqual(by_id['HIST-0']['weights'], {'category': 1.0, 'priority': 1.0})
+        self.assertEqual(by_id['HIST-0']['category'], 'printing')
+        self.assertNotIn('HIST-2', by_id)
+        self.assertEqual(len(self.examples), 23)
+
+    def test_xml_history_keeps_nested_incident_fields(self):
+        """Test XML history is read like /api/import_xml, so nested category labels reach the training set"""
+        path = os.path.join(self.temp_dir.name, 'incidents.xml')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("""<incidents>
+  <incident><id>X-1</id><name>Plotter jam</name><description_no_html>Large format print fails</description_no_html>
+    <category><name>printing</name></category><assignee><name>GIS Team</name></assignee>
+    <custom_fields_values><custom_fields_value><name>Dept</name><value>Planning</value></custom_fields_value></custom_fields_values>
+  </incident>
+  <incident><id>X-2</id><subject>Survey123 sync</subject><description>Edits lost</description><category>mobile</category></incident>
+</incidents>""")
+        tickets = load_tickets(path)
+        self.assertEqual([(t['id'], t['category']) for t in tickets], [('X-1', 'printing'), ('X-2', 'mobile')])
+        self.assertEqual((tickets[0]['assigned_to'], tickets[0]['additional_info']), ('GIS Team', 'Dept: Planning'))
+        self.assertEqual([example['category'] for example in build_training_set(tickets)], ['printing', 'mobile'])
+
+    def test_agent_answers_locally_without_network(self):
+        """Test a warm-loaded model answers confident tickets before any LLM call"""
+        with patch.dict(os.environ, {'LOCAL_MODEL_PATH': self.model_path, 'LOCAL_MODEL_THRESHOLD': '0.5'}):
+            agent = EnhancedGISTicketAgent()
+        agent.export_prompts = False
+        agent.ai_enabled = True
+        agent.client = MagicMock()
+        result = agent.analyze_ticket({'id': 'NEW-1', 'subject': 'Survey123 will not sync',
+                                       'description': 'Collector edits lost on android'})
+        self.assertEqual(result['analysis_method'], 'local_classifier')
+        self.assertEqual(result['category'], 'mobile')
+        self.assertEqual(result['priority'], 'high')
+        agent.client.chat.completions.create.assert_not_called()
+        self.assertEqual(agent.get_metrics()['local_model_answered'], 1)
+
+    def test_low_confidence_defers_to_next_tier(self):
+        """Test predictions below the threshold fall through to the rule-based analysis"""
+        with patch.dict(os.environ, {'LOCAL_MODEL_PATH': self.model_path, 'LOCAL_MODEL_THRESHOLD': '0.999'}):
+            agent = EnhancedGISTicketAgent()
+        agent.export_prompts = False
+        result = agent.analyze_ticket({'id': 'NEW-2', 'subject': 'Something odd', 'description': 'Unclear issue'})
+        self.assertNotEqual(result['analysis_method'], 'local_classifier')
+        self.assertEqual(agent.get_metrics()['local_model_deferred'], 1)
+
+    def test_compiled_predict_matches_sklearn(self):
+        """Test the precompiled fast path returns sklearn's labels and probabilities"""
+        model = LocalTicketClassifier.load(self.model_path)
+        for ticket in self.tickets[:6] + [{'subject': 'unseen words only'}]:
+            prediction = model.predict(ticket)
+            features = model.vectorizer.transform([ticket_text(ticket)])
+            for target, sklearn_model in (('category', model.category_model), ('priority', model.priority_model)):
+                probabilities = sklearn_model.predict_proba(features)[0]
+                self.assertEqual(prediction[target], sklearn_model.classes_[probabilities.argmax()])
+                self.assertAlmostEqual(prediction[f'{target}_confidence'], probabilities.max(), places=9)
+
+    def test_missing_or_corrupt_model_disables_tier(self):
+        """Test the agent starts normally without a usable model file"""
+        corrupt_path = os.path.join(self.temp_dir.name, 'corrupt.joblib')
+        with open(corrupt_path, 'w') as f:
+            f.write('not a model')
+        for path in (os.path.join(self.temp_dir.name, 'missing.joblib'), corrupt_path):
+            with patch.dict(os.environ, {'LOCAL_MODEL_PATH': path}):
+                agent = EnhancedGISTicketAgent()
+            self.assertIsNone(agent.local_classifier)
+            self.assertIsNone(agent.analyze_with_local_model(self.tickets[0]))
+
+
+class TestXMLCategoryMemo(unittest.TestCase):
+    """Unit tests for the memoized XML category mapping"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.agent = EnhancedGISTicketAgent()
+        # The compiled ruleset is shared process-wide, so start every test from an empty memo
+        self.agent.rules.map_xml_category.cache_clear()
+
+    def test_memo_counts_hits_for_normalized_pairs(self):
+        """Test repeated pairs differing only in case/whitespace are served from the memo"""
+        self.assertEqual(self.agent._map_xml_category_to_gis('SR_GIS', 'Add / Change GIS Data'), 'general')
+        self.assertEqual(self.agent._map_xml_category_to_gis(' sr_gis ', 'add / change gis data'), 'general')
+        self.assertEqual(self.agent._map_xml_category_to_gis('Unknown', ''), None)
+        memo = self.agent.get_metrics()['xml_category_memo']
+        self.assertEqual((memo['hits'], memo['misses'], memo['size']), (1, 2, 2))
+
+    def test_memo_is_bounded_and_matches_uncached_lookup(self):
+        """Test the memo never exceeds its size and returns the same mapping as a direct lookup"""
+        with patch.dict(os.environ, {'XML_CATEGORY_MEMO_SIZE': '4'}):
+            agent = EnhancedGISTicketAgent()
+        pairs = [('printing', ''), ('portal access', 'x'), ('gis', 'web map'), ('', 'geocode'),
+                 ('mobile', 'survey123'), ('something else', 'layers')]
+        for category, subcategory in pairs * 2:
+            self.assertEqual(agent._map_xml_category_to_gis(category, subcategory),
+                             agent.rules.lookup_xml_category(category, subcategory))
+        self.assertEqual(agent.get_metrics()['xml_category_memo']['size'], 4)
+
+
+class TestPriorityEngine(unittest.TestCase):
+    """Unit tests for the compiled word-boundary priority engine"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.agent = EnhancedGISTicketAgent()
+
+    def test_keywords_inside_other_words_do_not_fire(self):
+        """Test substrings such as down in download no longer change the priority"""
+        self.assertEqual(self.agent.determine_priority('Download button in the dropdown is greyed out'), 'medium')
+        self.assertEqual(self.agent.determine_priority('Questionnaire layout for the reproduction map'), 'medium')
+
+    def test_phrases_suffixes_and_case(self):
+        """Test phrases across whitespace, plural/adverb suffixes and upper case still match"""
+        engine = self.agent.rules.priority_engine
+        self.assertEqual(engine.classify('SYSTEM\n  DOWN since 9am'), ('high', ['system down']))
+        self.assertEqual(engine.classify('Needed urgently, two errors'), ('high', ['urgent', 'error']))
+        self.assertEqual(engine.classify('How to  add a basemap?'), ('low', ['how to']))
+        self.assertEqual(engine.evidence('training question, errors'),
+                         {'low': ['training', 'question'], 'high': ['error']})
+
+    def test_rules_fallback_reports_priority_evidence(self):
+        """Test the rule-based analysis returns the evidence behind a keyword priority"""
+        result = self.agent.analyze_with_rules({'id': 'PRI-1', 'subject': 'Export failed',
+                                                'description': 'Critical: the download link is broken'})
+        self.assertEqual(result['priority'], 'high')
+        self.assertEqual(result['priority_evidence'], ['critical', 'failed'])
+        xml_result = self.agent.analyze_with_rules({'id': 'PRI-2', 'subject': 'Export failed', 'priority': 'Low'})
+        self.assertEqual((xml_result['priority'], xml_result['priority_evidence']), ('low', []))
+
+
+class TestRuleset(unittest.TestCase):
+    """Unit tests for the hot-reloadable versioned ruleset"""
+
+    def setUp(self):
+        """Copy the shipped ruleset to a temporary file the tests can edit"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'ruleset.json')
+        with open(DEFAULT_RULESET_PATH, 'r', encoding='utf-8') as f:
+            self.data = json.load(f)
+        self.writes = 0
+        self.write(self.data)
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def write(self, data):
+        """Write ruleset data and move the file's mtime forward so the change is always visible"""
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(data if isinstance(data, str) else json.dumps(data))
+        self.writes += 1
+        stamp = time.time() + self.writes
+        os.utime(self.path, (stamp, stamp))
+
+    def edited(self, version):
+        """Ruleset data with a new version that files 'zoning' tickets under printing"""
+        data = json.loads(json.dumps(self.data))
+        data['version'] = version
+        data['xml_category_mapping']['zoning'] = 'printing'
+        return data
+
+    def test_analysis_is_stamped_with_ruleset_version(self):
+        """Test rules analysis reports the version of the ruleset it used"""
+        with patch.dict(os.environ, {'RULESET_PATH': self.path}):
+            agent = EnhancedGISTicketAgent()
+        result = agent.analyze_with_rules({'id': 'R-1', 'subject': 'Print layout fails'})
+        self.assertEqual(result['ruleset_version'], self.data['version'])
+        self.assertEqual(agent.get_metrics()['ruleset']['version'], self.data['version'])
+
+    def test_agent_and_ticket_processor_share_one_manager(self):
+        """Test the agent and TicketProcessor compile and watch the ruleset file only once"""
+        with patch.dict(os.environ, {'RULESET_PATH': self.path}):
+            agent = EnhancedGISTicketAgent()
+            processor = TicketProcessor()
+        self.assertIs(agent.ruleset_manager, processor.ruleset_manager)
+        self.assertIs(agent.ruleset_manager, shared_ruleset_manager(self.path))
+
+    def test_changed_file_is_hot_reloaded(self):
+        """Test a saved ruleset change is picked up without restarting"""
+        manager = RulesetManager(self.path, reload_interval=0)
+        self.assertIsNone(manager.current().lookup_xml_category('zoning', ''))
+        self.write(self.edited('test-2'))
+        rules = manager.current()
+        self.assertEqual(rules.version, 'test-2')
+        self.assertEqual(rules.lookup_xml_category('zoning', ''), 'printing')
+        self.assertEqual(manager.get_stats()['reloads'], 1)
+
+    def test_invalid_file_keeps_previous_ruleset(self):
+        """Test broken JSON or an invalid ruleset is rejected and the last good version keeps serving"""
+        manager = RulesetManager(self.path, reload_interval=0)
+        bad = self.edited('test-bad')
+        bad['xml_category_mapping']['zoning'] = 'no_such_category'
+        for content in ('{"version": ', bad):
+            self.write(content)
+            self.assertEqual(manager.current().version, self.data['version'])
+        self.assertEqual(manager.get_stats()['reload_failures'], 2)
+
+    def test_in_flight_snapshot_is_not_changed_by_reload(self):
+        """Test a snapshot taken before a reload keeps answering with its own rules"""
+        manager = RulesetManager(self.path, reload_interval=0)
+        snapshot = manager.current()
+        self.write(self.edited('test-3'))
+        self.assertEqual(manager.current().version, 'test-3')
+        self.assertEqual(snapshot.version, self.data['version'])
+        self.assertIsNone(snapshot.lookup_xml_category('zoning', ''))
+
+    def test_reload_during_llm_call_keeps_the_analysis_snapshot(self):
+        """Test an LLM analysis reports the ruleset version it started with when a reload lands mid-call"""
+        with patch.dict(os.environ, {'RULESET_PATH': self.path, 'RULESET_RELOAD_INTERVAL': '0'}):
+            agent = EnhancedGISTicketAgent()
+        agent.export_prompts = False
+        agent.local_classifier = None
+        agent.ai_enabled = True
+        agent.client = MagicMock()
+
+        def completion(**kwargs):
+            self.write(self.edited('test-4'))
+            self.assertEqual(agent.rules.version, 'test-4')
+            response = MagicMock()
+            response.choices[0].message.content = json.dumps({'category': 'printing', 'priority': 'low', 'confidence': 0.9})
+            return response
+
+        agent.client.chat.completions.create.side_effect = completion
+        result = agent.analyze_ticket({'id': 'R-2', 'subject': 'Print layout fails'})
+        self.assertEqual(result['ai_model'], agent.openai_model)
+        self.assertEqual(result['ruleset_version'], self.data['version'])
+
+    def test_new_category_reaches_llm_schema_and_training_labels(self):
+        """Test a category added by a reload is allowed by the LLM schema and kept as a training label"""
+        manager = RulesetManager(self.path, reload_interval=0)
+        self.assertFalse(manager.current().output_parser.parse('{"category": "zoning", "priority": "low"}')[0])
+        data = self.edited('test-5')
+        data['categories']['zoning'] = ['zoning', 'setback']
+        self.write(data)
+        rules = manager.current()
+        schema = rules.output_parser.response_format()['json_schema']['schema']
+        self.assertIn('zoning', schema['properties']['category']['enum'])
+        self.assertEqual(rules.output_parser.parse('{"category": "Zoning", "priority": "low"}')[0]['category'], 'zoning')
+        ticket = {'id': 'Z-1', 'subject': 'Setback question', 'category': 'zoning'}
+        self.assertEqual(build_training_set([ticket]), [])
+        self.assertEqual(build_training_set([ticket], categories=list(rules.categories))[0]['category'], 'zoning')
+
+    def test_action_plans_come_from_ruleset(self):
+        """Test app action plans and ticket keywords are served from the ruleset"""
+        rules = RulesetManager(self.path).current()
+        plan = rules.ticket_action_plan('permissions', 'high')
+        self.assertEqual(plan[:2], ['Acknowledge receipt of ticket', 'Review ticket details and requirements'])
+        self.assertEqual(plan[-1], 'URGENT: Complete within 4 hours')
+        self.assertEqual(rules.ticket_action_plan('unknown', None)[-1], 'Low priority: Complete within 72 hours')
+        processor = TicketProcessor(RulesetManager(self.path))
+        self.assertIn('arcgis', processor.gis_keywords['software'])
+
+
+class TestBatchAnalysis(unittest.TestCase):
+    """Unit tests for batched analyze_tickets"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.agent = EnhancedGISTicketAgent()
+        self.agent.export_prompts = False
+        self.tickets = [
+            {'id': 'B-1', 'subject': 'Print layout fails', 'description': 'PDF export crashes'},
+            {'id': 'B-2', 'subject': 'Portal login', 'description': 'Cannot access the web map'},
+            {'id': 'B-1', 'subject': 'Print layout fails', 'description': 'PDF export crashes'}
+        ]
+
+    def test_results_keep_input_order_and_duplicates_share_analysis(self):
+        """Test identical tickets are analyzed once and every input gets its result in order"""
+        results = self.agent.analyze_tickets(self.tickets, mode='rules')
+        self.assertEqual([r['ticket_id'] for r in results], ['B-1', 'B-2', 'B-1'])
+        self.assertEqual(results[0]['analysis'], results[2]['analysis'])
+        self.assertIsNot(results[0]['analysis'], results[2]['analysis'])
+        self.assertEqual(results[0]['analysis'], dict(self.agent.analyze_with_rules(self.tickets[0]),
+                                                      analysis_timestamp=results[0]['analysis']['analysis_timestamp'],
+                                                      prompt_export_file=None))
+        self.assertEqual(self.agent.get_metrics()['batch_duplicates'], 1)
+
+    def test_failures_are_reported_per_item(self):
+        """Test a malformed ticket gets an error entry without failing the rest of the batch"""
+        results = self.agent.analyze_tickets([self.tickets[0], {'id': 'B-BAD', 'priority': 5}, 'not a ticket'],
+                                             mode='rules')
+        self.assertIn('analysis', results[0])
+        self.assertEqual(results[1]['ticket_id'], 'B-BAD')
+        self.assertIn('error', results[1])
+        self.assertEqual(results[2], {'ticket_id': 'unknown', 'error': 'Ticket must be a JSON object', 'latency_ms': 0.0})
+
+    def test_llm_calls_are_concurrent_and_reuse_prompts(self):
+        """Test distinct tickets reach the LLM concurrently with the prompts built for the batch"""
+        self.agent.ai_enabled = True
+        self.agent.client = MagicMock()
+        active = {'now': 0, 'max': 0}
+        lock = threading.Lock()
+
+        def completion(**kwargs):
+            with lock:
+                active['now'] += 1
+                active['max'] = max(active['max'], active['now'])
+            time.sleep(0.05)
+            with lock:
+                active['now'] -= 1
+            response = MagicMock()
+            response.choices[0].message.content = json.dumps({'category': 'printing', 'priority': 'low', 'confidence': 0.9})
+            return response
+
+        self.agent.client.chat.completions.create.side_effect = completion
+        with patch.object(self.agent, 'create_user_prompt', wraps=self.agent.create_user_prompt) as build_prompt:
+            results = self.agent.analyze_tickets(self.tickets * 2, mode='ai_first')
+        self.assertEqual(build_prompt.call_count, 2)
+        self.assertEqual(self.agent.client.chat.completions.create.call_count, 2)
+        self.assertEqual(active['max'], 2)
+        self.assertTrue(all(r['analysis']['ai_model'] == self.agent.openai_model for r in results))
+
+    def _slow_client_for(self, subject: str):
+        """Mocked client whose calls for tickets mentioning subject hang for 2s"""
+        self.agent.ai_enabled = True
+        self.agent.client = MagicMock()
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def completion(**kwargs):
+            if subject in kwargs['messages'][1]['content']:
+                release.wait(2)
+            response = MagicMock()
+            response.choices[0].message.content = json.dumps({'category': 'printing', 'priority': 'low', 'confidence': 0.9})
+            return response
+
+        self.agent.client.chat.completions.create.side_effect = completion
+
+    def test_slow_llm_call_times_out_without_holding_up_the_batch(self):
+        """Test a call past BATCH_ITEM_TIMEOUT falls back to rules while the others keep order and latency"""
+        self._slow_client_for('Portal login')
+        self.agent.batch_item_timeout = 0.3
+        started = time.perf_counter()
+        results = self.agent.analyze_tickets(self.tickets, mode='ai_first')
+        self.assertLess(time.perf_counter() - started, 1.5)
+        self.assertEqual([r['ticket_id'] for r in results], ['B-1', 'B-2', 'B-1'])
+        self.assertNotIn('error', results[1])
+        self.assertEqual(results[1]['analysis']['category'], self.agent.analyze_with_rules(self.tickets[1])['category'])
+        self.assertNotIn('ai_model', results[1]['analysis'])
+        self.assertGreaterEqual(results[1]['latency_ms'], 300)
+        self.assertEqual(results[0]['analysis']['category'], 'printing')
+        self.assertLess(results[0]['latency_ms'], 300)
+        self.assertEqual(self.agent.get_metrics()['batch_timeouts'], 1)
+
+    def test_timed_out_llm_call_falls_back_like_a_failed_one(self):
+        """Test a timed out ticket gets the same fallback as one whose LLM call raised"""
+        self.agent.batch_item_timeout = 0.3
+        self.agent.fallback_to_rules = False
+        self._slow_client_for('Portal login')
+        timed_out = self.agent.analyze_tickets(self.tickets[1:2], mode='ai_first')[0]['analysis']
+        self.agent.client.chat.completions.create.side_effect = Exception('provider down')
+        failed = self.agent.analyze_tickets(self.tickets[1:2], mode='ai_first')[0]['analysis']
+        self.assertEqual(timed_out['analysis_method'], 'manual_review_required')
+        self.assertEqual(failed['analysis_method'], 'manual_review_required')
+
+    def test_timed_out_cascade_keeps_its_rules_answer(self):
+        """Test a cascade past BATCH_ITEM_TIMEOUT returns the rules result it already computed"""
+        self.agent.batch_item_timeout = 0.3
+        self.agent.cascade_rules_threshold = 1.1
+        self._slow_client_for('Portal login')
+        results = self.agent.analyze_tickets(self.tickets, mode='cascade')
+        self.assertEqual(results[1]['analysis']['cascade_tier'], 'rules_fallback')
+        self.assertEqual(results[1]['analysis']['category'], self.agent.analyze_with_rules(self.tickets[1])['category'])
+        self.assertEqual(results[0]['analysis']['cascade_tier'], 'strong_model')
+        self.assertEqual(self.agent.get_metrics()['cascade_tiers']['rules_fallback'], 1)
+
+    def test_batches_share_one_pool(self):
+        """Test batches reuse the agent's pool instead of starting one per request"""
+        self.agent.ai_enabled = True
+        self.agent.client = MagicMock()
+        response = MagicMock()
+        response.choices[0].message.content = json.dumps({'category': 'printing', 'priority': 'low', 'confidence': 0.9})
+        self.agent.client.chat.completions.create.return_value = response
+        self.agent.analyze_tickets(self.tickets, mode='ai_first')
+        pool = self.agent._batch_pool()
+        self.agent.analyze_tickets(self.tickets[:2], mode='ai_first')
+        self.assertIs(self.agent._batch_pool(), pool)
+        self.assertEqual(pool._max_workers, self.agent.batch_max_concurrency)
+
+    def test_prompt_exports_written_once_per_distinct_ticket(self):
+        """Test duplicates share one exported prompt"""
+        self.agent.export_prompts = True
+        self.agent.prompts_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.agent.prompts_dir, True)
+        results = self.agent.analyze_tickets(self.tickets, mode='rules')
+        self.assertTrue(self.agent.flush_exports(timeout=5))
+        self.assertEqual(len(self.agent.prompt_store), 2)
+        self.assertEqual(results[0]['analysis']['prompt_export_file'], results[2]['analysis']['prompt_export_file'])
+        export = self.agent.read_prompt_export(results[1]['analysis']['prompt_export_file'])
+        self.assertEqual(export['user_prompt'], self.agent.create_user_prompt(self.tickets[1]))
+
+
+class TestResponseGeneration(unittest.TestCase):
+    """Unit tests for the template-first generate_response path"""
+
+    def setUp(self):
+        """Set up an agent with a mocked OpenAI client and a temporary export directory"""
+        self.agent = EnhancedGISTicketAgent()
+        self.agent.prompts_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.agent.prompts_dir, True)
+        self.agent.ai_enabled = True
+        self.agent.client = MagicMock()
+        response = MagicMock()
+        response.choices[0].message.content = json.dumps(
+            {'category': 'printing', 'priority': 'low', 'confidence': 0.9, 'suggested_response': 'Tailored answer'})
+        self.agent.client.chat.completions.create.return_value = response
+
+    def test_template_response_needs_no_analysis(self):
+        """Test responses come from the category template without an LLM call or prompt export"""
+        rules = self.agent.rules
+        self.assertEqual(self.agent.generate_response('printing', 'Plotter jams'), rules.response_template('printing'))
+        self.assertEqual(self.agent.generate_response('general', 'Survey123 will not sync on android'),
+                         rules.response_template('mobile'))
+        self.assertEqual(self.agent.generate_response('unknown_category', 'Some issue'), rules.response_template('general'))
+        self.agent.client.chat.completions.create.assert_not_called()
+        self.assertEqual(len(self.agent.prompt_store), 0)
+
+    def test_tailored_response_uses_llm(self):
+        """Test an explicitly tailored response calls the LLM and falls back to the template without AI"""
+        self.assertEqual(self.agent.generate_response('printing', 'Plotter jams', tailored=True), 'Tailored answer')
+        self.agent.client = None
+        self.assertEqual(self.agent.generate_response('printing', 'Plotter jams', tailored=True),
+                         self.agent.rules.response_template('printing'))
+        metrics = self.agent.get_metrics()
+        self.assertEqual((metrics['responses_llm'], metrics['responses_template']), (1, 1))
+
+
+class TestPromptExportWriter(unittest.TestCase):
+    """Unit tests for the background prompt export writer"""
+
+    def setUp(self):
+        """Set up a temporary export directory"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir, True)
+
+    def test_analysis_does_not_wait_for_export_and_flush_writes_it(self):
+        """Test analyze_ticket queues the export and flush puts it in the store"""
+        agent = EnhancedGISTicketAgent()
+        agent.export_prompts = True
+        agent.prompts_dir = self.temp_dir
+        result = agent.analyze_ticket({'id': 'EXP-1', 'subject': 'Print fails', 'description': 'Plotter error'})
+        self.assertTrue(agent.flush_exports(timeout=5))
+        self.assertEqual(agent.read_prompt_export(result['prompt_export_file'])['ticket_data']['id'], 'EXP-1')
+        stats = agent.get_metrics()['prompt_exports']
+        self.assertEqual((stats['written'], stats['dropped'], stats['queue_depth']), (1, 0, 0))
+
+    def test_full_queue_blocks_then_drops(self):
+        """Test a full queue counts blocked submissions and drops those that find no room"""
+        writer = PromptExportWriter(max_queue=1, block_timeout=0.01)
+        release = threading.Event()
+        original_write = writer._write_batch
+        writer._write_batch = lambda items: (release.wait(5), original_write(items))
+        store = PromptStore(self.temp_dir)
+        accepted = [writer.submit(store, 'export_0', {'n': 0})]
+        time.sleep(0.05)  # worker takes the first export and waits on release
+        accepted += [writer.submit(store, f'export_{index}', {'n': index}) for index in (1, 2)]
+        self.assertEqual(accepted, [True, True, False])
+        self.assertEqual(writer.get_stats()['queue_depth'], 1)
+        release.set()
+        self.assertTrue(writer.flush(timeout=5))
+        stats = writer.get_stats()
+        self.assertEqual((stats['written'], stats['blocked'], stats['dropped']), (2, 1, 1))
+        self.assertEqual(sorted(entry['name'] for entry in store.entries()), ['export_0', 'export_1'])
+        writer.close()
+
+    def test_wait_for_waits_only_on_a_queued_name(self):
+        """Test wait_for returns at once for a name that is not queued and waits for a queued one to be written"""
+        writer = PromptExportWriter()
+        release = threading.Event()
+        original_write = writer._write_batch
+        writer._write_batch = lambda items: (release.wait(5), original_write(items))
+        store = PromptStore(self.temp_dir)
+        writer.submit(store, 'export_0', {'n': 0})
+        started = time.perf_counter()
+        self.assertTrue(writer.wait_for('export_1', timeout=5))
+        self.assertLess(time.perf_counter() - started, 1)
+        self.assertFalse(writer.wait_for('export_0', timeout=0.05))
+        threading.Timer(0.05, release.set).start()
+        self.assertTrue(writer.wait_for('export_0', timeout=5))
+        self.assertEqual(store.get('export_0'), {'n': 0})
+        writer.close()
+
+    def test_exit_hook_flushes_live_writers_without_keeping_them_alive(self):
+        """Test the single exit hook flushes live writers, and an unused writer can still be collected"""
+        writer = PromptExportWriter()
+        store = PromptStore(self.temp_dir)
+        writer.submit(store, 'export_0', {'n': 0})
+        export_writer._close_writers()
+        self.assertEqual(store.get('export_0'), {'n': 0})
+        self.assertFalse(writer._thread.is_alive())
+
+        unused = weakref.ref(PromptExportWriter())
+        gc.collect()
+        self.assertIsNone(unused())
+
+
+class TestPromptStore(unittest.TestCase):
+    """Unit tests for the segmented prompt export store"""
+
+    def setUp(self):
+        """Set up a temporary store directory"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir, True)
+
+    def export(self, number, timestamp='20260101_120000'):
+        """Minimal prompt export document"""
+        return {'metadata': {'ticket_id': f'T-{number}', 'ticket_number': number, 'timestamp': timestamp,
+                             'analysis_type': 'full'}, 'user_prompt': f'prompt {number}'}
+
+    def test_append_get_and_listing(self):
+        """Test exports read back by name and list newest first from the index"""
+        store = PromptStore(self.temp_dir)
+        store.append('a_prompt.json', self.export(1, '20260101_120000'))
+        store.append_encoded([store.encode('b_prompt.json', self.export(2, '20260102_120000'))])
+        self.assertEqual(store.get('a_prompt.json'), self.export(1, '20260101_120000'))
+        self.assertIsNone(store.get('missing_prompt.json'))
+        entries = store.entries()
+        self.assertEqual([entry['name'] for entry in entries], ['b_prompt.json', 'a_prompt.json'])
+        self.assertEqual((entries[0]['ticket_id'], entries[0]['ticket_number']), ('T-2', 2))
+        self.assertEqual(len(store.segments()), 1)
+
+    def test_shared_sections_stored_once(self):
+        """Test static sections are written once by hash and put back in place on read"""
+        store = PromptStore(self.temp_dir)
+        notes = {'field_weighting': {'subject': 10}, 'fallback_method': 'rules'}
+        documents = [dict(self.export(number), system_prompt='You are a GIS expert', processing_notes=notes,
+                          ticket_data={'id': f'T-{number}'}) for number in range(3)]
+        for number, document in enumerate(documents):
+            store.append(f'{number}_prompt.json', document)
+        self.assertEqual(len(os.listdir(store.sections_dir)), 2)
+        with open(os.path.join(store.segments_dir, store.segments()[0]['segment']), 'rb') as f:
+            self.assertNotIn(b'GIS expert', f.read())
+        reread = PromptStore(self.temp_dir).get('2_prompt.json')
+        self.assertEqual(reread, documents[2])
+        self.assertEqual(list(reread), list(documents[2]))
+
+    def test_segments_rotate_by_size(self):
+        """Test a new segment starts once the active one would exceed max_segment_bytes"""
+        store = PromptStore(self.temp_dir, max_segment_bytes=300)
+        for number in range(6):
+            store.append(f'{number}_prompt.json', self.export(number))
+        self.assertGreater(len(store.segments()), 1)
+        self.assertEqual([store.get(f'{number}_prompt.json')['user_prompt'] for number in range(6)],
+                         [f'prompt {number}' for number in range(6)])
+
+    def test_other_store_sees_appends_and_recovers_unindexed_records(self):
+        """Test a second store sees appends through the shared catalog and catalogs records missing from it"""
+        writer = PromptStore(self.temp_dir)
+        reader = PromptStore(self.temp_dir)
+        writer.append('a_prompt.json', self.export(1))
+        self.assertEqual(reader.get('a_prompt.json')['user_prompt'], 'prompt 1')
+
+        # Simulate a crash between the segment write and the catalog write
+        name, metadata, line = writer.encode('b_prompt.json', self.export(2))
+        writer._segment.write(line)
+        writer._segment.flush()
+        writer.close()
+        self.assertNotIn('b_prompt.json', reader)
+        recovered = PromptStore(self.temp_dir)
+        self.assertEqual(recovered.get('b_prompt.json')['user_prompt'], 'prompt 2')
+        self.assertIn('b_prompt.json', reader)
+
+    def test_catalog_pages_and_filters(self):
+        """Test cursor pages cover every export once, newest first, and filters narrow the listing"""
+        store = PromptStore(self.temp_dir)
+        for number in range(7):
+            document = self.export(number, f'2026010{number % 3 + 1}_12000{number}')
+            document['metadata']['analysis_type'] = 'full' if number % 2 else 'categorize_only'
+            store.append(f'{number}_prompt.json', document)
+        names, cursor, pages = [], None, 0
+        while True:
+            page, cursor = store.page(limit=3, cursor=cursor)
+            names += [entry['name'] for entry in page]
+            pages += 1
+            if cursor is None:
+                break
+        self.assertEqual(pages, 3)
+        self.assertEqual(names, [entry['name'] for entry in store.entries()])
+        self.assertEqual(names[:3], ['5_prompt.json', '2_prompt.json', '4_prompt.json'])
+        self.assertEqual([entry['name'] for entry in store.page(ticket='4')[0]], ['4_prompt.json'])
+        self.assertEqual([entry['name'] for entry in store.page(ticket='T-4')[0]], ['4_prompt.json'])
+        self.assertEqual(store.count(since='2026-01-02', until='2026-01-02'), 2)
+        self.assertEqual(store.count(analysis_type='full'), 3)
+        self.assertEqual(store.entry('4_prompt.json')['size'], store.entry('4_prompt.json')['length'])
+        with self.assertRaises(ValueError):
+            store.page(cursor='not-a-cursor')
+
+    def test_legacy_index_imported_into_catalog(self):
+        """Test entries of a pre-catalog index.jsonl are moved into the catalog"""
+        store = PromptStore(self.temp_dir)
+        name, metadata, line = store.encode('a_prompt.json', self.export(1))
+        store._rotate_if_needed(len(line), 'none')
+        store._segment.write(line)
+        store.close()
+        with open(os.path.join(self.temp_dir, 'index.jsonl'), 'w', encoding='utf-8') as f:
+            f.write(json.dumps(dict(metadata, name=name, segment=store._segment_name, offset=0, length=len(line))) + '\n')
+        os.remove(os.path.join(self.temp_dir, 'catalog.db'))
+        reopened = PromptStore(self.temp_dir)
+        self.assertEqual(reopened.get('a_prompt.json')['user_prompt'], 'prompt 1')
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir, 'index.jsonl')))
+
+    def test_gzip_records_read_individually_and_recovered(self):
+        """Test gzip records are separate members of a valid .gz segment, readable next to plain records"""
+        PromptStore(self.temp_dir).append('plain_prompt.json', self.export(0))
+        store = PromptStore(self.temp_dir, compression='gzip')
+        documents = [dict(self.export(number), ticket_data={'description': 'Plotter error ' * 50}) for number in (1, 2)]
+        store.append('1_prompt.json', documents[0])
+        name, fields, data = store.encode('2_prompt.json', documents[1])
+        store._segment.write(data)  # catalog write lost
+        store.close()
+        entry = store.entry('1_prompt.json')
+        self.assertEqual(entry['encoding'], 'gzip')
+        self.assertLess(entry['length'], entry['size'])
+        gz_segment = [info['segment'] for info in store.segments() if info['segment'].endswith('.jsonl.gz')][0]
+        with gzip.open(os.path.join(store.segments_dir, gz_segment), 'rb') as f:
+            self.assertEqual(len(f.read().splitlines()), 2)
+
+        reopened = PromptStore(self.temp_dir)
+        self.assertEqual(reopened.get('1_prompt.json'), documents[0])
+        self.assertEqual(reopened.get('2_prompt.json'), documents[1])
+        self.assertEqual(reopened.get('plain_prompt.json'), self.export(0))
+        with self.assertRaises(ValueError):
+            PromptStore(self.temp_dir, compression='lz4')
+
+    def test_migrate_legacy_exports(self):
+        """Test one-file-per-export files are imported once and optionally removed"""
+        source = os.path.join(self.temp_dir, 'legacy')
+        os.makedirs(source)
+        for number in range(3):
+            with open(os.path.join(source, f'ticket_{number}_prompt.json'), 'w', encoding='utf-8') as f:
+                json.dump(self.export(number), f, indent=2)
+        store = PromptStore(os.path.join(self.temp_dir, 'store'))
+        self.assertEqual(migrate_legacy_exports(store, source, batch_size=2), (3, 0))
+        self.assertEqual(migrate_legacy_exports(store, source, delete=True), (0, 3))
+        self.assertEqual(os.listdir(source), [])
+        self.assertEqual(store.get('ticket_2_prompt.json'), self.export(2))
+
+
+class TestPromptRetention(unittest.TestCase):
+    """Unit tests for prompt export sharding, retention and compaction"""
+
+    def setUp(self):
+        """Set up a temporary store directory"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir, True)
+
+    def append_on(self, store, day, names):
+        """Append exports as if written on day, each day in its own closed segment"""
+        with patch('utils.prompt_store.datetime') as mock_datetime:
+            mock_datetime.now.return_value = datetime(day.year, day.month, day.day, 12)
+            for name in names:
+                store.append(name, {'metadata': {'ticket_id': name, 'timestamp': f'{day:%Y%m%d}_120000'},
+                                    'user_prompt': f'prompt {name} ' * 20})
+        store.close()
+
+    def test_segments_sharded_by_day(self):
+        """Test segments are written under segments/YYYY/MM/DD and today's active segment is open"""
+        store = PromptStore(self.temp_dir)
+        self.append_on(store, date(2026, 1, 2), ['old_prompt.json'])
+        store.append('new_prompt.json', {'metadata': {}, 'user_prompt': 'new'})
+        segments = store.segments()
+        self.assertTrue(segments[0]['segment'].startswith('2026/01/02/segment_20260102T12'))
+        self.assertTrue(segments[1]['segment'].startswith(f'{date.today():%Y/%m/%d}/'))
+        self.assertEqual([info['closed'] for info in segments], [True, False])
+
+    def test_age_eviction_removes_old_days(self):
+        """Test segments from days past max_age_days are deleted along with their catalog entries"""
+        store = PromptStore(self.temp_dir)
+        self.append_on(store, date.today() - timedelta(days=40), ['old_prompt.json'])
+        self.append_on(store, date.today() - timedelta(days=2), ['recent_prompt.json'])
+        stats = apply_retention(store, max_age_days=30)
+        self.assertEqual(stats['evicted_segments'], 1)
+        self.assertGreater(stats['evicted_bytes'], 0)
+        self.assertNotIn('old_prompt.json', store)
+        self.assertIsNone(store.get('old_prompt.json'))
+        self.assertIn('recent_prompt.json', store)
+        self.assertEqual(len(store.segments()), 1)
+
+    def test_compaction_merges_day_and_keeps_exports_readable(self):
+        """Test a past day's segments become one gzip segment that serves the same documents"""
+        store = PromptStore(self.temp_dir)
+        day = date.today() - timedelta(days=1)
+        self.append_on(store, day, ['a_prompt.json', 'b_prompt.json'])
+        self.append_on(store, day, ['c_prompt.json'])
+        before = {name: store.get(name) for name in ('a_prompt.json', 'b_prompt.json', 'c_prompt.json')}
+        self.assertEqual([before[name]['metadata']['ticket_id'] for name in before], list(before))
+        stats = apply_retention(store, compact=True)
+        self.assertEqual(stats['compacted_days'], 1)
+        self.assertGreater(stats['compacted_bytes_saved'], 0)
+        segments = store.segments()
+        self.assertEqual(len(segments), 1)
+        self.assertIn('/compacted_', segments[0]['segment'])
+        reopened = PromptStore(self.temp_dir)
+        self.assertEqual({name: reopened.get(name) for name in before}, before)
+        self.assertEqual(reopened.entry('a_prompt.json')['encoding'], 'gzip')
+        self.assertIsNone(store.compact_day(day))
+        with self.assertRaises(ValueError):
+            store.compact_day(date.today())
+
+    def test_size_cap_evicts_oldest_closed_segments(self):
+        """Test the oldest closed segments go first until the store fits and the active segment stays"""
+        store = PromptStore(self.temp_dir)
+        for days_ago in (3, 2, 1):
+            self.append_on(store, date.today() - timedelta(days=days_ago), [f'{days_ago}_prompt.json'])
+        store.append('today_prompt.json', {'metadata': {}, 'user_prompt': 'today'})
+        sizes = [info['size'] for info in store.segments()]
+        apply_retention(store, max_total_bytes=sum(sizes) - sizes[0])
+        self.assertEqual([name in store for name in ('3_prompt.json', '2_prompt.json', '1_prompt.json')],
+                         [False, True, True])
+        apply_retention(store, max_total_bytes=1)
+        self.assertEqual([info['closed'] for info in store.segments()], [False])
+        self.assertIn('today_prompt.json', store)
+
+    def test_retention_skipped_while_another_process_holds_lock(self):
+        """Test a run does nothing while the retention lock is held elsewhere"""
+        store = PromptStore(self.temp_dir)
+        self.append_on(store, date.today() - timedelta(days=40), ['old_prompt.json'])
+        with _exclusive(store) as acquired:
+            self.assertTrue(acquired)
+            stats = apply_retention(store, max_age_days=30)
+        self.assertTrue(stats['skipped'])
+        self.assertIn('old_prompt.json', store)
+        worker = PromptRetentionWorker(lambda: store, max_age_days=30)
+        self.assertEqual(worker.run_once()['evicted_segments'], 1)
+        self.assertEqual(worker.get_stats()['runs'], 1)
+
+
+class TestJobQueue(unittest.TestCase):
+    """Unit tests for the SQLite-backed background job queue"""
+
+    def setUp(self):
+        """Set up a queue without worker threads on a temporary database"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir, True)
+        self.path = os.path.join(self.temp_dir, 'jobs.db')
+        self.calls = []
+        self.queue = self.make_queue()
+
+    def make_queue(self, handler=None):
+        """Queue over the test database, processed with run_pending"""
+        def double(items, options):
+            self.calls.append(list(items))
+            return [{'value': item * options.get('factor', 2)} for item in items]
+        queue = JobQueue(self.path, {'double': handler or double}, workers=0, chunk_size=3)
+        self.addCleanup(queue.close)
+        return queue
+
+    def test_job_processed_in_chunks_with_ordered_results(self):
+        """Test a job runs a chunk at a time and reports progress and results from an offset"""
+        job_id = self.queue.submit('double', list(range(7)), {'factor': 3})
+        job = self.queue.get(job_id)
+        self.assertEqual((job['status'], job['done'], job['total'], job['progress'], job['results']),
+                         ('queued', 0, 7, 0.0, []))
+        self.queue.run_pending()
+        self.assertEqual(self.calls, [[0, 1, 2], [3, 4, 5], [6]])
+        job = self.queue.get(job_id, offset=2, limit=3)
+        self.assertEqual((job['status'], job['done'], job['progress'], job['eta_seconds']), ('completed', 7, 100.0, None))
+        self.assertEqual(job['results'], [{'value': 6}, {'value': 9}, {'value': 12}])
+        self.assertEqual(job['next_offset'], 5)
+        self.assertIsNone(self.queue.get('missing'))
+        with self.assertRaises(ValueError):
+            self.queue.submit('unknown', [1])
+
+    def test_cancel_queued_and_running_jobs(self):
+        """Test a queued job is cancelled at once and a running one after its current chunk"""
+        queued = self.queue.submit('double', [1, 2])
+        self.assertEqual(self.queue.cancel(queued), 'cancelled')
+        self.assertIsNone(self.queue.cancel('missing'))
+
+        def cancel_after_first_chunk(items, options):
+            self.queue.cancel(running)
+            return [{'value': item} for item in items]
+
+        self.queue.handlers['double'] = cancel_after_first_chunk
+        running = self.queue.submit('double', list(range(7)))
+        self.queue.run_pending()
+        job = self.queue.get(running)
+        self.assertEqual((job['status'], job['done'], job['cancel_requested']), ('cancelled', 3, True))
+        self.assertEqual(len(job['results']), 3)
+        self.assertEqual(self.queue.get(queued)['done'], 0)
+
+    def test_interrupted_job_resumes_after_restart(self):
+        """Test a job left running by a process that exited resumes at its first unfinished item"""
+        def crash_after_first_chunk(items, options):
+            if self.calls:
+                raise SystemExit
+            self.calls.append(list(items))
+            return [{'value': item} for item in items]
+
+        crashing = self.make_queue(crash_after_first_chunk)
+        job_id = crashing.submit('double', list(range(5)))
+        with self.assertRaises(SystemExit):
+            crashing.run_pending()
+        crashing._connection().execute("UPDATE jobs SET owner_pid = ? WHERE id = ?", (2 ** 22 + 1, job_id)).connection.commit()
+        self.assertEqual(crashing.get(job_id)['status'], 'running')
+
+        self.calls = []
+        restarted = self.make_queue()
+        restarted.run_pending()
+        job = restarted.get(job_id)
+        self.assertEqual(self.calls, [[3, 4]])
+        self.assertEqual((job['status'], job['done']), ('completed', 5))
+        self.assertEqual([result['value'] for result in job['results']], [0, 1, 2, 6, 8])
+
+    def test_handler_failure_fails_job_and_keeps_finished_results(self):
+        """Test an exception from the handler fails the job with its message"""
+        def fail_second_chunk(items, options):
+            if items[0] >= 3:
+                raise RuntimeError('provider down')
+            return [{'error': 'bad ticket'} if item == 1 else {'value': item} for item in items]
+
+        queue = self.make_queue(fail_second_chunk)
+        job_id = queue.submit('double', list(range(6)))
+        queue.run_pending()
+        job = queue.get(job_id)
+        self.assertEqual((job['status'], job['error'], job['done'], job['failed']), ('failed', 'provider down', 3, 1))
+
+    def test_workers_process_submitted_jobs(self):
+        """Test worker threads pick up a submitted job without polling delay"""
+        queue = JobQueue(self.path, {'double': lambda items, options: [item * 2 for item in items]},
+                         workers=2, poll_interval=5)
+        self.addCleanup(queue.close)
+        queue.start()
+        job_id = queue.submit('double', list(range(60)))
+        deadline = time.monotonic() + 5
+        while queue.get(job_id)['status'] != 'completed' and time.monotonic() < deadline:
+            time.sleep(0.02)
+        self.assertEqual(queue.get(job_id, limit=1000)['results'], [item * 2 for item in range(60)])
 
 
 class TestXMLTicketParser(unittest.TestCase):
@@ -210,6 +1450,22 @@ if __name__ == '__main__':
     
     # Add test classes
     test_suite.addTests(test_loader.loadTestsFromTestCase(TestEnhancedGISTicketAgent))
+    test_suite.addTests(test_loader.loadTestsFromTestCase(TestRequestCoalescing))
+    test_suite.addTests(test_loader.loadTestsFromTestCase(TestStructuredOutput))
+    test_suite.addTests(test_loader.loadTestsFromTestCase(TestPromptPrefixLayout))
+    test_suite.addTests(test_loader.loadTestsFromTestCase(TestCascadeAnalysis))
+    test_suite.addTests(test_loader.loadTestsFromTestCase(TestKeywordMatcher))
+    test_suite.addTests(test_loader.loadTestsFromTestCase(TestCategoryScoringIndex))
+    test_suite.addTests(test_loader.loadTestsFromTestCase(TestLocalClassifier))
+    test_suite.addTests(test_loader.loadTestsFromTestCase(TestXMLCategoryMemo))
+    test_suite.addTests(test_loader.loadTestsFromTestCase(TestPriorityEngine))
+    test_suite.addTests(test_loader.loadTestsFromTestCase(TestRuleset))
+    test_suite.addTests(test_loader.loadTestsFromTestCase(TestBatchAnalysis))
+    test_suite.addTests(test_loader.loadTestsFromTestCase(TestResponseGeneration))
+    test_suite.addTests(test_loader.loadTestsFromTestCase(TestPromptExportWriter))
+    test_suite.addTests(test_loader.loadTestsFromTestCase(TestPromptStore))
+    test_suite.addTests(test_loader.loadTestsFromTestCase(TestPromptRetention))
+    test_suite.addTests(test_loader.loadTestsFromTestCase(TestJobQueue))
     test_suite.addTests(test_loader.loadTestsFromTestCase(TestXMLTicketParser))
     test_suite.addTests(test_loader.loadTestsFromTestCase(TestFlaskApp))
     